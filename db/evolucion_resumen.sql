@@ -0,0 +1,20 @@
+CREATE TABLE evolucion_resumen (
+    id serial NOT NULL,
+    id_muestra integer,
+    codigo character varying(100),
+    dia integer,
+    id_colonia character varying(100),
+    estado character varying(100),
+    tipo_zona character varying(100),
+    temperatura double precision,
+    cantidad integer,
+    muertos integer,
+    hembras integer,
+    distancia_hembras double precision,
+    the_geom geometry(Point, 4326),
+    fecha timestamp without time zone,
+    CONSTRAINT evolucion_resumen_pkey PRIMARY KEY (id)
+);
+
+CREATE INDEX evolucion_resumen_codigo_dia_idx
+    ON evolucion_resumen (codigo, dia);
@@ -0,0 +1,23 @@
+CREATE TABLE trabajos (
+    id serial NOT NULL,
+    tipo character varying(100),
+    id_muestra integer,
+    codigo character varying(100),
+    parametros text,
+    estado character varying(100),
+    dia integer,
+    dias integer,
+    poblacion integer,
+    resultado text,
+    error text,
+    pid integer,
+    cancelar integer DEFAULT 0,
+    creado timestamp without time zone,
+    iniciado timestamp without time zone,
+    actualizado timestamp without time zone,
+    terminado timestamp without time zone,
+    CONSTRAINT trabajos_pkey PRIMARY KEY (id)
+);
+
+CREATE INDEX trabajos_estado_idx
+    ON trabajos (estado, id);
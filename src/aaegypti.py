@@ -6,14 +6,148 @@ Este módulo contiene la definición del AeAegypti
 @autors Maximiliano Báez
 @contact mxbg.py@gmail.com
 """
-from random import randint, uniform
+import numpy
+import config
+from aleatorio import FlujoAleatorio, FLUJO
 from datatype import *
 from models import *
 from config import *
 
 from db_manager import *
 
-COEF_SH_DE = CoefSarpeDemicheleModel()
+COEF_SH_DE = CoefSarpeDemicheleRegistry()
+
+
+def get_parametros(valores=None):
+    """
+    Retorna los parametros del modelo de una simulación (ver
+    PARAMETROS_MODELO), los parametros que no se especifican en `valores`
+    toman el valor actual de config.
+
+    @type valores : Dictionaries
+    @param valores: Los valores de los parametros, por nombre.
+
+    @rtype Dictionaries
+    """
+    parametros = dict((n, getattr(config, n)) for n in PARAMETROS_MODELO)
+    for nombre, valor in (valores or {}).items():
+        if nombre not in parametros:
+            raise ValueError("parametro desconocido : " + nombre)
+        parametros[nombre] = valor
+    return parametros
+
+
+def sharpe_demichele(temperatura, coef):
+    """
+    Modelo enzimático de Sharpe & DeMichele, retorna la tasa de desarrollo
+    diaria para la temperatura indicada.
+
+    @type  temperatura: Integer
+    @param temperatura: La temperatura en grados centigrados.
+
+    @type  coef: Dicionario
+    @param coef: Coeficientes para el modelo enzimatico
+    """
+    k = temperatura + 273.15
+    return coef["rh025"] * ((k / 298.15) * math.exp(
+        (coef["ha"] / 1.987) * (1 / 298.15 - 1 / k))
+    )\
+        / (1 + math.exp((coef["hh"] / 1.987) * (1 / coef["th"] - 1 / k)))
+
+
+class TablaSharpeDemichele:
+
+    """
+    Tabla precalculada de las tasas de desarrollo del modelo de
+    Sharpe & DeMichele para cada código de estado. Las tasas se evaluan
+    sobre una grilla de temperaturas y se interpolan linealmente entre los
+    puntos de la grilla. Fuera de la grilla se evalua el modelo.
+
+    Las tablas se vuelven a generar cuando cambia la versión del registro
+    de coeficientes.
+    """
+
+    def __init__(self, registro, t_min=-10.0, t_max=50.0, paso=0.01):
+        """
+        @type registro : CoefSarpeDemicheleRegistry
+        @param registro: El registro de los coeficientes.
+
+        @type t_min, t_max : Float
+        @param t_min, t_max: El rango de temperaturas de la grilla.
+
+        @type paso : Float
+        @param paso: La separación en grados entre los puntos de la grilla.
+        """
+        self.registro = registro
+        self.temperaturas = numpy.linspace(
+            t_min, t_max, int(round((t_max - t_min) / paso)) + 1)
+        self.__version = None
+        self.__tablas = {}
+        self.__memo = {}
+
+    def evaluar(self, codigo, temperaturas):
+        """
+        Evalua el modelo de Sharpe & DeMichele sobre un array de
+        temperaturas.
+        """
+        coef = self.registro.get(codigo)
+        k = numpy.asarray(temperaturas, dtype=float) + 273.15
+        with numpy.errstate(over='ignore'):
+            return coef["rh025"] * ((k / 298.15) * numpy.exp(
+                (coef["ha"] / 1.987) * (1 / 298.15 - 1 / k))
+            )\
+                / (1 + numpy.exp((coef["hh"] / 1.987) * (1 / coef["th"] - 1 / k)))
+
+    def get_tabla(self, codigo):
+        """
+        Retorna la tabla de tasas del estado, las tablas se generan en el
+        primer acceso a cada código.
+        """
+        if self.__version != self.registro.version:
+            self.__tablas = {}
+            self.__memo = {}
+        if codigo not in self.__tablas:
+            self.__tablas[codigo] = self.evaluar(codigo, self.temperaturas)
+            self.__version = self.registro.version
+        return self.__tablas[codigo]
+
+    def tasas(self, codigo, temperaturas):
+        """
+        Retorna las tasas de desarrollo para un array de temperaturas.
+
+        @type codigo : String
+        @param codigo: El código del estado.
+
+        @type temperaturas : ndarray
+        @param temperaturas: Las temperaturas en grados centigrados.
+
+        @rtype ndarray
+        """
+        temperaturas = numpy.asarray(temperaturas, dtype=float)
+        tabla = self.get_tabla(codigo)
+        tasas = numpy.interp(temperaturas, self.temperaturas, tabla)
+        fuera = (temperaturas < self.temperaturas[0]) | \
+            (temperaturas > self.temperaturas[-1])
+        if fuera.any():
+            tasas = numpy.where(fuera, self.evaluar(codigo, temperaturas), tasas)
+        return tasas
+
+    def get(self, codigo, temperatura):
+        """
+        Retorna la tasa de desarrollo diaria del estado para una
+        temperatura. El resultado se memoriza, por lo que los individuos de
+        un mismo estado en un mismo día comparten la misma búsqueda.
+        """
+        key = (codigo, temperatura)
+        if self.__version != self.registro.version or key not in self.__memo:
+            if len(self.__memo) > 4096:
+                self.__memo = {}
+            tasa = float(self.tasas(codigo, temperatura))
+            self.__memo[key] = tasa
+        return self.__memo[key]
+
+
+TASAS = TablaSharpeDemichele(COEF_SH_DE)
 
 
 class AeAegypti:
@@ -134,6 +268,26 @@ class AeAegypti:
         """
         return self._generacion
 
+    @property
+    def aleatorio(self):
+        """
+        El flujo de números aleatorios del individuo, los individuos de una
+        misma colonia comparten el flujo.
+
+        @see FlujoAleatorio
+        """
+        return self._aleatorio
+
+    @property
+    def parametros(self):
+        """
+        Los parametros del modelo de la simulación, los individuos de una
+        población comparten los parametros.
+
+        @see get_parametros
+        """
+        return self._parametros
+
 
     def __init__(self, **kargs):
         """
@@ -148,6 +302,10 @@ class AeAegypti:
         @keyword [x]: la coordenada x
         @keyword [y]: La coordenada y
         @keyword [posicion]: El punto que determina la ubiación del AeAegypti
+        @keyword [aleatorio]: El flujo de números aleatorios del individuo,
+            por defecto el flujo FLUJO.
+        @keyword [parametros]: Los parametros del modelo, por defecto los de
+            config (ver get_parametros).
         """
         self._sexo = kargs.get('sexo', None)
         self._estado = kargs.get('estado', None)
@@ -168,6 +326,34 @@ class AeAegypti:
         self._id_mosquito = kargs.get('id', 0)
         self._id_padre = kargs.get('id_padre', 0)
         self._generacion = kargs.get('generacion', 0)
+        self._aleatorio = kargs.get('aleatorio', FLUJO)
+        self._parametros = kargs.get('parametros') or get_parametros()
+
+    def inicializar(self):
+        """
+        Inicializa los atributos propios del estado, los estados que tienen
+        atributos adicionales sobreescriben este método.
+        """
+        pass
+
+    def mudar(self, estado):
+        """
+        Reinicia los atributos del individuo para el inicio del estado. El
+        individuo conserva su identificador, sexo, colonia y posición, la
+        clase del individuo debe ser previamente cambiada a la del estado.
+
+        @type estado : Estado
+        @param estado: El nuevo estado del individuo.
+        """
+        self._estado = estado
+        self._colonia = None
+        self._edad = 0
+        self._madurez = 0
+        self._expectativa_vida = 100
+        self.delta_vuelo = 0
+        self._tiempo_vida = 0
+        self._tiempo_madurez = 0
+        self.inicializar()
 
     def se_reproduce(self, hora):
         """
@@ -184,13 +370,27 @@ class AeAegypti:
         """
         return self.madurez >= 100
 
+    def mover(self, distancia, angulo):
+        """
+        Desplaza al individuo `distancia` metros en la dirección `angulo`.
+
+        @type distancia : Float
+        @param distancia: La distancia en metros.
+
+        @type angulo : Float
+        @param angulo: El angulo en grados.
+        """
+        self.posicion.move(distancia, angulo)
+
     def get_bs_ij(self):
         """
         Calcula el valor de bs teniendo en cuenta la densidad larvaria de la
         zona.
         """
-        #~ se retorna el tipo de zona
-        return self.zonas.get_ranking(self.posicion, TAMANHO_ZONA)
+        #~ los inmaduros no se mueven, su zona se rankea de forma exacta
+        exacto = self.estado != Estado.ADULTO
+        return self.zonas.get_ranking(self.posicion,
+                                      self.parametros["TAMANHO_ZONA"], exacto)
 
     def get_tipo_zona(self):
         pts = self.get_bs_ij()
@@ -203,8 +403,7 @@ class AeAegypti:
         el modelo de sharpe&demichele.
 
         """
-        coef = COEF_SH_DE.get_by(self.estado)
-        cantidad_dias = 1 / self.sharpe_demichele(hora.temperatura, coef[0])
+        cantidad_dias = 1 / TASAS.get(self.estado, hora.temperatura)
         return cantidad_dias
 
     def sharpe_demichele(self, temperatura, coef):
@@ -215,11 +414,7 @@ class AeAegypti:
         @type  coef: Dicionario
         @param coef: Coeficientes para el modelo enzimatico
         """
-        k = temperatura + 273.15
-        return coef["rh025"] * ((k / 298.15) * math.exp(
-            (coef["ha"] / 1.987) * (1 / 298.15 - 1 / k))
-        )\
-            / (1 + math.exp((coef["hh"] / 1.987) * (1 / coef["th"] - 1 / k)))
+        return sharpe_demichele(temperatura, coef)
 
     def __str__(self):
         """
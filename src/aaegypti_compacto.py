@@ -0,0 +1,219 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene las variantes compactas de los estados del Aedes
+Aegypti. Las variantes definen sus atributos con __slots__, por lo que los
+individuos no tienen un diccionario de atributos, y guardan la posición
+como coordenadas x e y en lugar de un Point.
+
+Las variantes exponen las mismas propiedades públicas y reutilizan los
+métodos de Huevo, Larva, Pupa y Adulto, la posición se construye como un
+Point cuando es solicitada. Todas las variantes comparten los mismos
+__slots__, por lo que un individuo puede cambiar de variante al mudar.
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+from huevo import *
+from larva import *
+from pupa import *
+from adulto import *
+
+
+def copiar_comportamiento(destino, *clases):
+    """
+    Copia los métodos y propiedades de las clases en la clase destino. Los
+    atributos definidos en la clase destino no son reemplazados.
+
+    @type destino : type
+    @param destino: La clase compacta.
+
+    @type clases : classobj
+    @param clases: Las clases de las que se copia el comportamiento, en
+        orden de herencia.
+    """
+    propios = set(vars(destino).keys())
+    for clazz in clases:
+        for nombre, valor in vars(clazz).items():
+            if nombre in ("__init__", "__module__", "__doc__") or \
+                    nombre in propios:
+                continue
+            setattr(destino, nombre, valor)
+
+
+class AeAegyptiCompacto(object):
+
+    """
+    Clase base de las variantes compactas. Todas las variantes comparten
+    la misma definición de __slots__, incluidos los atributos del adulto.
+    """
+    __slots__ = (
+        "_sexo", "_estado", "_zonas", "_colonia", "_id_colonia",
+        "_x", "_y", "_x_origen", "_y_origen",
+        "_edad", "_madurez", "_expectativa_vida", "delta_vuelo",
+        "_tiempo_vida", "_tiempo_madurez",
+        "_id_mosquito", "_id_padre", "_generacion", "_aleatorio",
+        "_parametros",
+        # atributos del adulto
+        "_ultima_oviposicion", "_ultimo_alimento", "_dias_vuelo",
+        "_distancia_recorrida", "_desplazamiento_diario",
+        "_cantidad_oviposicion", "_cantidad_alimentacion",
+        "_alimentacion_necesaria", "_max_huevo", "_is_inseminada",
+        "_se_alimenta", "_se_reproduce", "_tipo_zona",
+        "_Adulto__no_pone_huevos", "_Adulto__no_se_alimenta",
+        "_Adulto__buscando_criaderos", "_Adulto__ciclo_gonotrofico"
+    )
+
+    @property
+    def estado(self):
+        """
+        Indica el estado actual de la clase.
+        """
+        return self._estado
+
+    @estado.setter
+    def estado(self, value):
+        self._estado = value
+
+    @property
+    def posicion(self):
+        """
+        La posición esta definida por las coordenadas x e y, el punto se
+        construye en cada acceso.
+
+        @see Point
+        """
+        return Point({"x": self._x, "y": self._y})
+
+    @property
+    def posicion_origen(self):
+        """
+        La posición en la que emergió el adulto.
+        """
+        return Point({"x": self._x_origen, "y": self._y_origen})
+
+    @posicion_origen.setter
+    def posicion_origen(self, value):
+        self._x_origen = value.x
+        self._y_origen = value.y
+
+    def __init__(self, **kargs):
+        """
+        @param kargs: Parametros de inicialización de la clase, los mismos
+            que AeAegypti.
+        """
+        self._sexo = kargs.get('sexo', None)
+        self._estado = kargs.get('estado', None)
+        self._zonas = kargs.get('zonas', None)
+        self._colonia = kargs.get('colonia', None)
+        self._id_colonia = kargs.get('id_colonia', None)
+        if kargs.has_key('posicion'):
+            self._x = kargs['posicion'].x
+            self._y = kargs['posicion'].y
+        else:
+            self._x = kargs.get('x', 0)
+            self._y = kargs.get('y', 0)
+        self._edad = 0
+        self._madurez = kargs.get('madurez', 0)
+        self._expectativa_vida = kargs.get('expectativa_vida', 100)
+        self.delta_vuelo = 0
+        self._tiempo_vida = 0
+        self._tiempo_madurez = 0
+        self._id_mosquito = kargs.get('id', 0)
+        self._id_padre = kargs.get('id_padre', 0)
+        self._generacion = kargs.get('generacion', 0)
+        self._aleatorio = kargs.get('aleatorio', FLUJO)
+        self._parametros = kargs.get('parametros') or get_parametros()
+
+    def mover(self, distancia, angulo):
+        """
+        Desplaza al individuo `distancia` metros en la dirección `angulo`.
+        """
+        punto = self.posicion.project(distancia, angulo)
+        self._x = punto.x
+        self._y = punto.y
+
+copiar_comportamiento(AeAegyptiCompacto, AeAegypti)
+
+
+class HuevoCompacto(AeAegyptiCompacto):
+
+    """
+    Variante compacta de Huevo.
+    """
+    __slots__ = ()
+
+    def __init__(self, **kargs):
+        # Se genera de forma aleatoria el sexo del huevo
+        if kargs.get('aleatorio', FLUJO).randint(0, 1) == 0:
+            kargs['sexo'] = Sexo.MACHO
+        else:
+            kargs['sexo'] = Sexo.HEMBRA
+        kargs['estado'] = Estado.HUEVO
+        AeAegyptiCompacto.__init__(self, **kargs)
+
+copiar_comportamiento(HuevoCompacto, Huevo)
+
+
+class LarvaCompacto(AeAegyptiCompacto):
+
+    """
+    Variante compacta de Larva.
+    """
+    __slots__ = ()
+
+    def __init__(self, **kargs):
+        if not kargs.has_key('sexo'):
+            # Se genera de forma aleatoria el sexo del mosquito
+            if kargs.get('aleatorio', FLUJO).randint(0, 1) == 0:
+                kargs['sexo'] = Sexo.MACHO
+            else:
+                kargs['sexo'] = Sexo.HEMBRA
+        kargs['estado'] = Estado.LARVA
+        AeAegyptiCompacto.__init__(self, **kargs)
+
+copiar_comportamiento(LarvaCompacto, Larva)
+
+
+class PupaCompacto(AeAegyptiCompacto):
+
+    """
+    Variante compacta de Pupa.
+    """
+    __slots__ = ()
+
+    def __init__(self, **kargs):
+        kargs['estado'] = Estado.PUPA
+        AeAegyptiCompacto.__init__(self, **kargs)
+
+copiar_comportamiento(PupaCompacto, Pupa)
+
+
+class AdultoCompacto(AeAegyptiCompacto):
+
+    """
+    Variante compacta de Adulto.
+    """
+    __slots__ = ()
+
+    def __init__(self, **kargs):
+        kargs['estado'] = Estado.ADULTO
+        AeAegyptiCompacto.__init__(self, **kargs)
+        self.inicializar()
+
+copiar_comportamiento(AdultoCompacto, Adulto)
+
+#~ Clases utilizadas por la población para cada estado
+CLASES = {
+    Estado.HUEVO: Huevo,
+    Estado.LARVA: Larva,
+    Estado.PUPA: Pupa,
+    Estado.ADULTO: Adulto
+}
+
+CLASES_COMPACTAS = {
+    Estado.HUEVO: HuevoCompacto,
+    Estado.LARVA: LarvaCompacto,
+    Estado.PUPA: PupaCompacto,
+    Estado.ADULTO: AdultoCompacto
+}
@@ -148,6 +148,13 @@ class Adulto(AeAegypti):
         # se invoca al constructor de la clase padre.
         AeAegypti.__init__(self, **kargs)
         #~ print "new "+ str(self)
+        self.inicializar()
+
+    def inicializar(self):
+        """
+        Inicializa los atributos propios del adulto, es invocado al crear el
+        adulto y al mudar una pupa a adulto.
+        """
         self.posicion_origen = self.posicion.clone()
         self._ultima_oviposicion = 1
         self._ultimo_alimento = 1
@@ -255,7 +262,7 @@ class Adulto(AeAegypti):
         (Stegomyia) aegypti (LINNAEUS, 1762), CEPA GIRARDOT (CUNDINAMARCA) EN
         CONDICIONES DE LABORATORIO"
         """
-        prob_ovi = randint(0, 10000)
+        prob_ovi = self.aleatorio.randint(0, 10000)
         if prob_ovi <= 2256 and is_frist:
             """
             Se puede observar  que el  22,56%(23) de la población no realizó
@@ -325,7 +332,7 @@ class Adulto(AeAegypti):
             contrario.
         @rtype Boolean
         """
-        porcentaje = randint(1, 100)
+        porcentaje = self.aleatorio.randint(1, 100)
         #~ Para las hembras nulíperas (no ha puesto ningún huevo)
         if self.cantidad_oviposicion == 0 and self._cantidad_alimentacion == 0\
             and porcentaje <= 58 and self.is_inseminada == False:
@@ -375,11 +382,11 @@ class Adulto(AeAegypti):
         tarda más tiempo.
         """
         if self.cantidad_oviposicion == 0:
-            coef = COEF_SH_DE.get_by("NULIPERA")
+            codigo = "NULIPERA"
         else:
-            coef = COEF_SH_DE.get_by(self.estado)
+            codigo = self.estado
 
-        cantidad_dias = 1 / self.sharpe_demichele(dia.temperatura, coef[0])
+        cantidad_dias = 1 / TASAS.get(codigo, dia.temperatura)
 
         return cantidad_dias
 
@@ -408,7 +415,7 @@ class Adulto(AeAegypti):
         CONDICIONES DE LABORATORIO" se puede observar que el 21,9% (22) de los
         mosquitos que tomaron una ingesta de sangre no realizaron ovoposturas.
         """
-        prob_ovi = randint(0, 100)
+        prob_ovi = self.aleatorio.randint(0, 100)
         if self.cantidad_alimentacion == 1 and self.ciclo_gonotrofico == 0:
             if prob_ovi <= 22:
                 self.__no_pone_huevos = True
@@ -439,7 +446,8 @@ class Adulto(AeAegypti):
         """
         # print "busqueda done.."
         self._cantidad_oviposicion += 1
-        return randint(MIN_HUEVOS, MAX_HUEVOS)
+        return self.aleatorio.randint(self.parametros["MIN_HUEVOS"],
+                                      self.parametros["MAX_HUEVOS"])
 
     def reset(self):
         """
@@ -486,11 +494,11 @@ class Adulto(AeAegypti):
             angulo = self.posicion_origen.angle_to(self.posicion)
             # se modifica el sentido del angulo de vuelo
             angulo_vuelo = angulo + 180
-            velocidad = uniform(0, distancia_origen)
+            velocidad = self.aleatorio.uniform(0, distancia_origen)
         else:
             #~ se genera un angulo 'delta', para simular las corrientes de aire
             #~ que sigue el mosquito.
-            delta = randint(-45, 45)
+            delta = self.aleatorio.randint(-45, 45)
             #~ Vuelan en sentido contrario al viento
             angulo_vuelo = dia.direccion_viento + 180 + delta
             #~ se calcula la velocidad de vuelo
@@ -504,7 +512,7 @@ class Adulto(AeAegypti):
         distancia = velocidad
         self._distancia_recorrida += distancia
         self._desplazamiento_diario = distancia
-        self.posicion.move(velocidad, angulo_vuelo)
+        self.mover(velocidad, angulo_vuelo)
 
     def velocidad_vuelo(self, hora, angulo_vuelo):
         """
@@ -518,7 +526,7 @@ class Adulto(AeAegypti):
         The Anopheles mosquito can fly for up to four hours continuously
         at 1–2 km/h ,traveling up to 12 km (7.5 mi) in a night.
         """
-        speed = randint(0, MIN_VUELO)
+        speed = self.aleatorio.randint(0, MIN_VUELO)
 
         wind_speed = hora.viento
 
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene los flujos de números aleatorios del simulador. Un
+flujo se inicializa con una semilla y genera siempre la misma secuencia,
+los números se generan por bloques con numpy y se entregan uno a uno.
+
+Cada flujo puede derivar sub flujos independientes identificados por una
+clave (la colonia, la partición, ...), el sub flujo depende únicamente de
+la semilla del flujo y de la clave, no del orden en que se lo solicita.
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import os
+import zlib
+import numpy
+
+#~ Cantidad de números generados por bloque
+BLOQUE_ALEATORIO = 256
+
+
+def get_palabra(clave):
+    """
+    Convierte la clave de un sub flujo en un entero de 32 bits.
+    """
+    if isinstance(clave, (int, long)):
+        return clave & 0xffffffff
+    if isinstance(clave, float):
+        clave = repr(clave)
+    return zlib.crc32(str(clave)) & 0xffffffff
+
+
+class FlujoAleatorio:
+
+    """
+    Flujo de números aleatorios basado en numpy.random.RandomState. Los
+    métodos randint, uniform y random reemplazan a los del módulo random.
+    """
+
+    def __init__(self, semilla=None, bloque=BLOQUE_ALEATORIO):
+        """
+        @type semilla : Integer
+        @param semilla: La semilla del flujo, o la lista de palabras de 32
+            bits que la componen. Sin semilla se utiliza una del sistema.
+
+        @type bloque : Integer
+        @param bloque: La cantidad de números generados por bloque.
+        """
+        if semilla is None:
+            semilla = numpy.frombuffer(os.urandom(8), dtype=numpy.uint32)
+        elif not isinstance(semilla, (list, tuple, numpy.ndarray)):
+            semilla = [semilla]
+        self.semilla = [get_palabra(int(s)) for s in semilla]
+        self.bloque = bloque
+        self.estado = numpy.random.RandomState(self.semilla)
+        self.__valores = []
+        self.__indice = 0
+
+    def random(self):
+        """
+        Retorna un número en el intervalo [0, 1).
+        """
+        if self.__indice >= len(self.__valores):
+            self.__valores = self.estado.random_sample(self.bloque).tolist()
+            self.__indice = 0
+        valor = self.__valores[self.__indice]
+        self.__indice += 1
+        return valor
+
+    def randint(self, a, b):
+        """
+        Retorna un entero entre `a` y `b`, ambos incluidos.
+        """
+        return a + int(self.random() * (b - a + 1))
+
+    def uniform(self, a, b):
+        """
+        Retorna un número entre `a` y `b`.
+        """
+        return a + (b - a) * self.random()
+
+    def sub_flujo(self, *claves):
+        """
+        Retorna el sub flujo identificado por las claves.
+
+            flujo.sub_flujo("colonia", id_colonia)
+
+        @rtype FlujoAleatorio
+        """
+        semilla = self.semilla + [get_palabra(c) for c in claves]
+        return FlujoAleatorio(semilla, self.bloque)
+
+
+#~ Flujo utilizado por los individuos creados sin un flujo explícito
+FLUJO = FlujoAleatorio()
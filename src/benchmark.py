@@ -0,0 +1,434 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene las mediciones de rendimiento del simulador. Cada
+medición se ejecuta sobre datos sintéticos, por lo que no requiere de la
+base de datos.
+
+Uso :
+    python benchmark.py [vuelo] [memoria] [arranque] [vuelo_vectorial]
+        [motores]
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import os
+import sys
+import math
+import time
+import subprocess
+import random
+import cProfile
+import pstats
+import numpy
+import models
+import aaegypti
+import ranking_table
+from aaegypti_compacto import *
+from aleatorio import FlujoAleatorio
+from tutiempo import Dia, Periodo
+from ranking_table import RankingTable, COD_ZONA
+from poblacion_vectorial import volar_adultos, SEXOS, ESTADOS
+from fuentes_datos import CoeficientesCsv
+from logger import EventLogger
+
+
+def gen_puntos_control(cantidad=200, x=-57.6, y=-25.3, semilla=0):
+    """
+    Genera puntos de control sintéticos distribuidos en una grilla de 10
+    metros alrededor de la posición (x, y).
+    """
+    rnd = random.Random(semilla)
+    puntos = []
+    for i in range(cantidad):
+        puntos.append({"id": i, "cantidad": rnd.randint(1, 60),
+                       "x": x + (i % 20) * 0.0001,
+                       "y": y + (i // 20) * 0.0001})
+    return puntos
+
+
+def gen_adultos(cantidad):
+    """
+    Genera `cantidad` adultos sobre los puntos de control sintéticos, la
+    mitad son hembras.
+    """
+    puntos = gen_puntos_control()
+    zonas = RankingTable(indice=models.IndiceEspacial(puntos))
+    #~ los adultos comparten un flujo con semilla fija, por lo que la
+    #~ medición es reproducible
+    aleatorio = FlujoAleatorio(0)
+    adultos = []
+    for i in range(cantidad):
+        p = puntos[i % len(puntos)]
+        adultos.append(Adulto(x=p["x"], y=p["y"], zonas=zonas,
+                              sexo=Sexo.HEMBRA if i % 2 else Sexo.MACHO,
+                              aleatorio=aleatorio))
+    return adultos
+
+
+def medir_vuelo(cantidad=2000, dias=10, perfil=False):
+    """
+    Mide el costo por vuelo de Adulto.volar. Retorna los segundos por vuelo.
+    """
+    adultos = gen_adultos(cantidad)
+    dia = Dia({"temperatura": 28, "viento": 3.0, "direccion_viento": 90.0})
+
+    def volar():
+        for d in range(dias):
+            for adulto in adultos:
+                adulto.volar(dia)
+
+    t = time.time()
+    if perfil:
+        prof = cProfile.Profile()
+        prof.runcall(volar)
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(10)
+    else:
+        volar()
+    return (time.time() - t) / (cantidad * dias)
+
+
+def proj_por_instancia():
+    """
+    Restaura el comportamiento anterior en el que cada Point construia su
+    propia proyección, se utiliza como referencia en las mediciones.
+    """
+    init = models.Point.__init__
+
+    def __init__(self, args):
+        init(self, args)
+        self._proj = models.Proj(proj='utm', zone=27, ellps='WGS84')
+    models.Point.__init__ = __init__
+    return init
+
+
+def benchmark_vuelo():
+    """
+    Compara el costo por vuelo construyendo una proyección por punto con el
+    de la proyección compartida.
+    """
+    init = proj_por_instancia()
+    antes = medir_vuelo(dias=2)
+    models.Point.__init__ = init
+    despues = medir_vuelo(dias=2)
+    print "Costo por vuelo"
+    print "  Proj por instancia  : %.1f us" % (antes * 1e6)
+    print "  Proj compartido     : %.1f us" % (despues * 1e6)
+    print "  Mejora              : %.1fx" % (antes / despues)
+    print
+    medir_vuelo(dias=2, perfil=True)
+
+
+def tamanho_individuo(aedes, compartidos):
+    """
+    Retorna la cantidad de bytes ocupados por el individuo, se incluyen
+    los objetos alcanzables desde el individuo que no son compartidos con
+    otros individuos (constantes, cadenas y los objetos en `compartidos`).
+    """
+    vistos = set(id(o) for o in compartidos)
+    pendientes = [aedes]
+    total = 0
+    while len(pendientes) > 0:
+        obj = pendientes.pop()
+        if id(obj) in vistos or obj is None or \
+                isinstance(obj, (basestring, bool)) or \
+                (isinstance(obj, int) and -5 <= obj <= 256):
+            continue
+        vistos.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pendientes.extend(obj.values())
+        if hasattr(obj, "__dict__"):
+            pendientes.append(vars(obj))
+        for nombre in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, nombre):
+                pendientes.append(getattr(obj, nombre))
+    return total
+
+
+def benchmark_memoria(cantidad=1000):
+    """
+    Reporta los bytes por individuo de cada estado, para las clases
+    originales y las variantes compactas.
+    """
+    zonas = RankingTable(indice=models.IndiceEspacial(gen_puntos_control()))
+    print "%-8s %12s %12s" % ("estado", "original", "compacto")
+    for estado in [Estado.HUEVO, Estado.LARVA, Estado.PUPA, Estado.ADULTO]:
+        fila = []
+        for clases in [CLASES, CLASES_COMPACTAS]:
+            posicion = models.Point({"x": -57.6, "y": -25.3})
+            individuos = [clases[estado](posicion=posicion, zonas=zonas)
+                          for i in range(cantidad)]
+            total = sum(tamanho_individuo(a, [zonas, posicion])
+                        for a in individuos)
+            fila.append(total / float(cantidad))
+        print "%-8s %12.0f %12.0f" % (estado, fila[0], fila[1])
+
+
+class FlujoRepetido:
+
+    """
+    Entrega a Adulto.volar los números aleatorios de un adulto que utilizó
+    volar_adultos, para comparar ambos resultados.
+    """
+
+    def __init__(self, uniforme, delta, speed):
+        self.uniforme = uniforme
+        self.delta = delta
+        self.speed = speed
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.uniforme
+
+    def randint(self, a, b):
+        return self.delta if a < 0 else self.speed
+
+
+def get_columnas_vuelo(adultos):
+    """
+    Retorna las columnas de volar_adultos para los adultos.
+    """
+    return {
+        "x": numpy.array([a.posicion.x for a in adultos]),
+        "y": numpy.array([a.posicion.y for a in adultos]),
+        "x_origen": numpy.array([a.posicion_origen.x for a in adultos]),
+        "y_origen": numpy.array([a.posicion_origen.y for a in adultos]),
+        "sexo": numpy.array([SEXOS.index(a.sexo) for a in adultos],
+                            dtype=numpy.int8),
+        "tipo_zona": numpy.array([COD_ZONA.get(a.get_tipo_zona(), -1)
+                                  for a in adultos], dtype=numpy.int8)
+    }
+
+
+def medir_vuelo_vectorial(cantidad=2000, dias=10):
+    """
+    Mide el costo por vuelo de volar_adultos y compara las posiciones con
+    las de Adulto.volar utilizando los mismos números aleatorios.
+
+    @rtype tuple
+    @return Los segundos por vuelo y la diferencia máxima en metros.
+    """
+    adultos = gen_adultos(cantidad)
+    dia = Dia({"temperatura": 28, "viento": 3.0, "direccion_viento": 90.0})
+    #~ los adultos se alejan de su origen para que algunos regresen
+    for i, adulto in enumerate(adultos):
+        adulto.mover(i % 300, i % 360)
+    c = get_columnas_vuelo(adultos)
+
+    t = time.time()
+    for d in range(dias):
+        x, y, distancia = volar_adultos(
+            c["x"], c["y"], c["x_origen"], c["y_origen"], c["sexo"],
+            c["tipo_zona"], dia.viento, dia.direccion_viento,
+            numpy.random.RandomState(d))
+    segundos = (time.time() - t) / (cantidad * dias)
+
+    #~ se repiten los números del último día en Adulto.volar
+    aleatorio = numpy.random.RandomState(dias - 1)
+    uniforme = aleatorio.uniform(0, 1, cantidad)
+    delta = aleatorio.randint(-45, 46, cantidad)
+    speed = aleatorio.randint(0, MIN_VUELO + 1, cantidad)
+    diferencia = 0
+    for i, adulto in enumerate(adultos):
+        adulto._aleatorio = FlujoRepetido(uniforme[i], delta[i], speed[i])
+        adulto.volar(dia)
+        diferencia = max(diferencia, 100000.0 * math.hypot(
+            adulto.posicion.x - x[i], adulto.posicion.y - y[i]))
+    return segundos, diferencia
+
+
+def benchmark_vuelo_vectorial():
+    """
+    Compara el costo por vuelo de Adulto.volar con el de volar_adultos.
+    """
+    objetos = medir_vuelo(dias=2)
+    vectorial, diferencia = medir_vuelo_vectorial()
+    print "Costo por vuelo"
+    print "  Adulto.volar        : %.2f us" % (objetos * 1e6)
+    print "  volar_adultos       : %.2f us" % (vectorial * 1e6)
+    print "  Mejora              : %.1fx" % (objetos / vectorial)
+    print "  Diferencia máxima   : %.2e m" % diferencia
+
+
+class SinkNulo:
+
+    """
+    Descarta los registros del log, permite simular sin base de datos.
+    """
+
+    def escribir(self, tabla, columnas):
+        pass
+
+
+def instalar_datos_sinteticos(puntos):
+    """
+    Utiliza los puntos de control sintéticos para el ranking de zonas y los
+    coeficientes de data/coef_sharpe_demichele.csv.
+    """
+    ranking_table.INDICE = models.IndiceEspacial(puntos)
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    aaegypti.COEF_SH_DE.dao = CoeficientesCsv(
+        os.path.join(directorio, "data", "coef_sharpe_demichele.csv"))
+    if aaegypti.COEF_SH_DE.version > 0:
+        aaegypti.COEF_SH_DE.reload()
+
+
+def simular_motor(motor, semilla, puntos, dias=30, temperatura=27.0):
+    """
+    Simula los puntos de control con el motor y la semilla indicados, a
+    temperatura constante y registrando cada individuo en un log nulo.
+
+    @rtype tuple
+    @return El resumen de la población final y los segundos de la
+        simulación.
+    """
+    from simulador import Simulador
+    periodo = Periodo()
+    periodo.dias = [Dia({"temperatura": temperatura, "viento": 3.0,
+                         "direccion_viento": 90.0}) for d in range(dias)]
+    evol = Simulador(poblacion=puntos, periodo=periodo, motor=motor,
+                     semilla=semilla, resguardo=0, raster_zonas=False,
+                     particiones=1)
+    evol.logger.close()
+    evol.logger = EventLogger(1, "benchmark", sink=SinkNulo(),
+                              nivel="individuos")
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        t = time.time()
+        evol.start()
+        segundos = time.time() - t
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return evol.poblacion.get_resumen(), segundos
+
+
+def get_estadisticas(resumen):
+    """
+    Retorna las cantidades del resumen de una población como una lista de
+    (nombre, valor).
+    """
+    valores = []
+    for estado in ESTADOS:
+        valores.append((estado + " total", resumen[estado]["total"]))
+        valores.append((estado + " muertas", resumen[estado]["muertas"]))
+    valores.append(("total_huevos", resumen["total_huevos"]))
+    return valores
+
+
+def benchmark_motores(semillas=10, dias=30):
+    """
+    Compara el resumen final del motor "objetos" con el del motor
+    "vectorial" sobre los puntos de control sintéticos. Ambos motores
+    consumen los números aleatorios en distinto orden, por lo que se
+    comparan las medias sobre las mismas `semillas` semillas: z es la
+    diferencia de las medias en errores estándar. Además se verifica que
+    cada motor reproduce su resultado con la misma semilla.
+    """
+    puntos = gen_puntos_control(cantidad=40)
+    instalar_datos_sinteticos(puntos)
+    resultados = {}
+    tiempos = {}
+    for motor in ["objetos", "vectorial"]:
+        resultados[motor] = []
+        tiempos[motor] = 0.0
+        for semilla in range(semillas):
+            resumen, segundos = simular_motor(motor, semilla, puntos, dias)
+            resultados[motor].append(get_estadisticas(resumen))
+            tiempos[motor] += segundos
+        repetido = get_estadisticas(simular_motor(motor, 0, puntos, dias)[0])
+        print "%-10s %8.2f s por simulación, semilla repetible : %s" % (
+            motor, tiempos[motor] / semillas,
+            repetido == resultados[motor][0])
+
+    print
+    print "%-16s %18s %18s %8s" % ("", "objetos", "vectorial", "z")
+    for j, (nombre, v) in enumerate(resultados["objetos"][0]):
+        medias = []
+        varianzas = []
+        for motor in ["objetos", "vectorial"]:
+            valores = numpy.array([r[j][1] for r in resultados[motor]],
+                                  dtype=float)
+            medias.append(valores.mean())
+            varianzas.append(valores.var(ddof=1) / semillas)
+        error = math.sqrt(sum(varianzas))
+        z = (medias[1] - medias[0]) / error if error > 0 else 0.0
+        print "%-16s %9.1f ± %6.1f %9.1f ± %6.1f %8.2f" % (
+            nombre, medias[0], math.sqrt(varianzas[0]), medias[1],
+            math.sqrt(varianzas[1]), z)
+
+
+#~ Script ejecutado en un proceso nuevo para medir la importación, la
+#~ conexión a la base de datos falla y se cuentan los intentos.
+SCRIPT_ARRANQUE = """
+import time
+import psycopg2
+intentos = []
+def connect(*args, **kargs):
+    intentos.append(1)
+    raise psycopg2.OperationalError("sin base de datos")
+psycopg2.connect = connect
+inicio = time.time()
+{0}
+print time.time() - inicio, len(intentos)
+"""
+
+
+def medir_arranque(sentencia, repeticiones=5):
+    """
+    Ejecuta `sentencia` en un proceso nuevo sin base de datos disponible.
+    Retorna la mediana de los segundos de la sentencia y del proceso
+    completo, y la cantidad de intentos de conexión; los segundos son None
+    si la sentencia falla.
+    """
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    script = SCRIPT_ARRANQUE.format(sentencia)
+    tiempos = []
+    totales = []
+    intentos = 0
+    for i in range(repeticiones):
+        t = time.time()
+        proceso = subprocess.Popen([sys.executable, "-c", script],
+                                   cwd=directorio, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        salida, error = proceso.communicate()
+        totales.append(time.time() - t)
+        if proceso.returncode != 0:
+            return None, None, error.strip().splitlines()[-1]
+        tiempo, intentos = salida.split()[-2:]
+        tiempos.append(float(tiempo))
+    tiempos.sort()
+    totales.sort()
+    return tiempos[len(tiempos) // 2], totales[len(totales) // 2], intentos
+
+
+def benchmark_arranque():
+    """
+    Mide el tiempo de importación de los módulos de entrada sin una base
+    de datos disponible, junto con los intentos de conexión realizados.
+    """
+    print "%-22s %10s %10s %10s" % ("import", "import ms", "total ms",
+                                    "conexiones")
+    for modulo in ["simulador", "controller", "rest_services"]:
+        tiempo, total, intentos = medir_arranque("import " + modulo)
+        if tiempo is None:
+            print "%-22s error: %s" % (modulo, intentos)
+        else:
+            print "%-22s %10.1f %10.1f %10s" % (modulo, tiempo * 1e3,
+                                               total * 1e3, intentos)
+
+
+BENCHMARKS = {
+    "vuelo": benchmark_vuelo,
+    "memoria": benchmark_memoria,
+    "arranque": benchmark_arranque,
+    "vuelo_vectorial": benchmark_vuelo_vectorial,
+    "motores": benchmark_motores
+}
+
+if __name__ == "__main__":
+    nombres = sys.argv[1:] or sorted(BENCHMARKS.keys())
+    for nombre in nombres:
+        print "=" * 10 + nombre + "=" * 10
+        BENCHMARKS[nombre]()
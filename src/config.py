@@ -7,13 +7,19 @@ Configuraciones para la conexión con la base de datos
 @contact mxbg.py@gmail.com
 """
 DB = {
-    "dbname": "dengue",
+    "dbname": "geodenguedb",
     "host": "localhost",
     "port": "5432",
     "user": "postgres",
     "password": "postgres"
 }
 
+#~ Conexiones del pool compartido por los DAOs de cada proceso
+DB_POOL = {
+    "min": 1,
+    "max": 8
+}
+
 TMP_HOME = "./data/"
 RASTER = {
     "schema": "public",
@@ -60,6 +66,23 @@ API_URL = "http://localhost/geodengue/py.2010"
 #~ TUTIEMPO_URL = "http://localhost/geodengue/tutiempo.dom";
 #~ TUTIEMPO_URL = 'http://www.tutiempo.net/'
 
+"""
+Configuraciones de las fuentes de datos
+"""
+#~ Fuente de los puntos de control, coeficientes y datos climáticos:
+#~ "postgres" (base de datos y openweathermap) o "archivos" (sin base de
+#~ datos ni red, ver ARCHIVOS_DATOS). Sin base de datos el log de eventos
+#~ debe utilizar LOG_SINK = "npz".
+FUENTE_DATOS = "postgres"
+#~ Archivos de la fuente "archivos", srid es el sistema de referencia de
+#~ las coordenadas del CSV de puntos.
+ARCHIVOS_DATOS = {
+    "puntos": TMP_HOME + "larvitrampas.csv",
+    "srid": 900913,
+    "coeficientes": TMP_HOME + "coef_sharpe_demichele.csv",
+    "clima": "../webapp/data/api.openweathermap.90.history.json"
+}
+
 """
 Configuraciones de las Zonas
 """
@@ -77,6 +100,78 @@ MAX_VUELO = 3000
 
 # Cantida de sitios de reproducción agrupados como uno solo.
 BS = 50.0
+#~ Tamaño en metros de la celda utilizada para agrupar las zonas rankeadas
+RANKING_CELDA = 10
+#~ Cantidad máxima de zonas rankeadas que se mantienen en memoria
+RANKING_MAX_ZONAS = 100000
 # mortalidad asociada a un sitio
 #ALPHA = 0.09353
 ALPHA = 0.1
+#~ Parametros del modelo que pueden variar por simulación (ver escenarios),
+#~ la población los entrega a los individuos (ver aaegypti.get_parametros)
+PARAMETROS_MODELO = ["ALPHA", "TAMANHO_ZONA", "MIN_HUEVOS", "MAX_HUEVOS"]
+
+"""
+Configuraciones del simulador
+"""
+#~ Motor utilizado para representar a la población: "objetos" mantiene un
+#~ objeto por individuo, "vectorial" mantiene la población en arrays de numpy
+#~ y "cohortes" agrupa a los inmaduros de cada colonia en cohortes,
+#~ únicamente los adultos se representan individualmente.
+MOTOR_SIMULACION = "objetos"
+#~ Ancho de las clases de madurez del motor "cohortes", las cohortes de una
+#~ colonia con el mismo estado, generación y clase de madurez se unen.
+COHORTES = {
+    "clase_madurez": 5.0
+}
+#~ True para representar a los individuos del motor "objetos" con las
+#~ variantes compactas (__slots__) de los estados.
+INDIVIDUOS_COMPACTOS = False
+#~ Cantidad de franjas del área de estudio simuladas en paralelo por el
+#~ motor "objetos", cada franja en un proceso. 1 simula en un único proceso.
+PARTICIONES = 1
+#~ Destino del log de eventos: "postgres" (COPY FROM STDIN) o "npz"
+#~ (archivos locales en LOG_DIR).
+LOG_SINK = "postgres"
+LOG_DIR = TMP_HOME + "log/"
+#~ Nivel del log: "individuos" registra cada individuo en cada día en
+#~ evolucion_log, "resumen" registra las cantidades por día, colonia, estado
+#~ y tipo de zona en evolucion_resumen. En el nivel "resumen" se registran
+#~ individualmente la fracción LOG_TRAZA de los individuos.
+LOG_NIVEL = "individuos"
+LOG_TRAZA = 0.0
+#~ Hilos escritores del log, tamaño máximo de la cola de lotes y cantidad
+#~ de registros por lote.
+LOG_ESCRITOR = {
+    "hilos": 1,
+    "cola": 8,
+    "lote": 5000
+}
+#~ Raster precalculado del bs de las zonas. La resolución es el tamaño en
+#~ metros de la celda, mmap indica si las matrices se mapean en memoria.
+RASTER_ZONAS = {
+    "activo": False,
+    "resolucion": 10,
+    "mmap": True
+}
+#~ Resguardos del estado de la simulación (ver resguardos). Cada `intervalo`
+#~ días se guarda el estado completo del simulador en el directorio, 0 para
+#~ no guardar resguardos. Una simulación interrumpida se reanuda desde su
+#~ último resguardo. Los procesos evolutivos de los servicios rest, que se
+#~ reanudan y avanzan con nuevos días, utilizan el intervalo `procesos`.
+RESGUARDOS = {
+    "intervalo": 0,
+    "procesos": 10,
+    "directorio": TMP_HOME + "resguardos/",
+    "compresion": 1
+}
+#~ Cola de los trabajos de simulación solicitados por los servicios rest (ver
+#~ trabajos). La cola se guarda en el archivo `sqlite` ("sqlite") o en la
+#~ tabla trabajos de la base de datos ("postgres"). Los trabajos se ejecutan
+#~ en `procesos` procesos, que consultan la cola cada `espera` segundos.
+TRABAJOS = {
+    "cola": "sqlite",
+    "sqlite": TMP_HOME + "trabajos.db",
+    "procesos": 2,
+    "espera": 1.0
+}
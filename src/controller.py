@@ -8,6 +8,9 @@ from interpolation import *
 from simulador import *
 from tutiempo import *
 from geoserver import *
+from fuentes_datos import get_fuente
+import resguardos
+from trabajos import get_cola
 
 """
 @autors Maximiliano Báez
@@ -25,10 +28,14 @@ class MainController:
         @type id_muestras : Integer
         @param id_muestras : El identificador de la muestra.
         """
-        self.puntos_control_dao = PuntosControlModel()
+        self.fuente = get_fuente()
         self.layer_dao = LayersDao()
         self.muestras_dao = MuestraModel()
+        #~ los reportes de cada simulación se calculan sobre la tabla en
+        #~ la que se registró, ver get_dao
         self.dao = ReporteDao()
+        self.dao_resumen = ReporteResumenDao()
+        self.cola = get_cola()
 
     def method_idw(self, data, cols, rows):
         """
@@ -107,10 +114,9 @@ class MainController:
         """
         print "obteniendo los datos climaticos"
         resp = {}
-        clima = TuTiempo("Asuncion")
-        periodo = clima.get_periodo()
+        periodo = self.fuente.get_periodo()
         print "obteniendo los datos"
-        data = self.puntos_control_dao.get_by(id_muestras)
+        data = self.fuente.get_puntos(id_muestras)
         #~ print data
         evol = Simulador(periodo=periodo, poblacion=data)
         print "iniciando simulación"
@@ -229,28 +235,113 @@ class MainController:
         return resp
 
 
-    def new_proceso_evolutivo(self,id_muestra,codigo):
+    def new_proceso_evolutivo(self,id_muestra,codigo,progreso=None,
+                              descartar=False):
         """
+        @type progreso : Function
+        @param progreso: La función de progreso del simulador, ver
+            trabajos.ejecutar.
+
+        @type descartar : Boolean
+        @param descartar: True para descartar los registros del log de una
+            simulación anterior con el mismo código.
         """
         print "obteniendo los datos climaticos"
         resp = {}
-        clima = TuTiempo("Asuncion")
-        periodo = clima.get_periodo()
+        periodo = self.fuente.get_periodo()
         print "obteniendo los datos"
-        data = self.puntos_control_dao.get_by(id_muestra)
+        data = self.fuente.get_puntos(id_muestra)
         #~ print data
-        evol = Simulador(id_muestra=id_muestra, periodo=periodo, poblacion=data, codigo=codigo)
+        #~ el estado se resguarda para reanudar y avanzar el proceso
+        evol = Simulador(id_muestra=id_muestra, periodo=periodo, poblacion=data, codigo=codigo, progreso=progreso,
+                         resguardo=RESGUARDOS["procesos"])
+        if descartar:
+            evol.logger.descartar(0)
         print "iniciando simulación"
         evol.start()
         resp['resumen'] = evol.poblacion.get_resumen()
         return resp
 
+    def avanzar_proceso_evolutivo(self, id_muestra, codigo, dias=None,
+                                  progreso=None):
+        """
+        Avanza el proceso evolutivo `codigo` con los días del periodo
+        climático posteriores al último día simulado, a partir del estado
+        guardado al final de la simulación anterior. Si el proceso no tiene
+        un estado guardado se lo simula desde los puntos de control.
+
+        @type dias : Integer
+        @param dias: La cantidad máxima de días a simular, por defecto todos
+            los días nuevos.
+
+        @type progreso : Function
+        @param progreso: La función de progreso del simulador.
+        """
+        evol = resguardos.cargar(codigo)
+        if evol is None:
+            #~ se descartan los registros de una simulación interrumpida
+            #~ antes de su primer resguardo
+            return self.new_proceso_evolutivo(id_muestra, codigo, progreso,
+                                              descartar=True)
+        evol.progreso = progreso
+        print "obteniendo los datos climaticos"
+        resp = {}
+        nuevos = evol.get_dias_nuevos(self.fuente.get_periodo().dias)
+        if dias is not None:
+            nuevos = nuevos[:int(dias)]
+        #~ se descartan los registros de un avance interrumpido
+        evol.logger.descartar(evol.dia_i)
+        print "avanzando la simulación " + str(len(nuevos)) + " días"
+        evol.avanzar(nuevos)
+        resp['resumen'] = evol.poblacion.get_resumen()
+        resp['dias'] = evol.dia_i
+        return resp
+
+    def encolar_proceso(self, id_muestra, codigo):
+        """
+        Encola la simulación del proceso evolutivo, la simulación la
+        ejecuta el pool de trabajos (ver trabajos).
+
+        @rtype Dictionaries
+        @return El trabajo encolado.
+        """
+        return self.cola.encolar("proceso", id_muestra, codigo)
+
+    def encolar_avance(self, id_muestra, codigo, dias=None):
+        """
+        Encola el avance del proceso evolutivo, ver
+        avanzar_proceso_evolutivo.
+
+        @rtype Dictionaries
+        @return El trabajo encolado.
+        """
+        return self.cola.encolar("avanzar", id_muestra, codigo,
+                                 {"dias": dias})
+
+    def get_trabajo(self, id_trabajo):
+        return self.cola.get(id_trabajo)
+
+    def get_progreso(self, id_trabajo):
+        """
+        Retorna el estado, el día actual y el tamaño de la población del
+        trabajo, None si no existe.
+        """
+        trabajo = self.cola.get(id_trabajo)
+        if trabajo is None:
+            return None
+        campos = ["id", "estado", "dia", "dias", "poblacion", "actualizado"]
+        return dict((c, trabajo[c]) for c in campos)
+
+    def cancelar_trabajo(self, id_trabajo):
+        return self.cola.cancelar(id_trabajo)
+
 
 
     def instante_diario(self, id_muestra, codigo, dia, cols=500, rows=500):
         """
         """
-        puntos_control = self.dao.get_poblacion_control(codigo, dia)
+        puntos_control = self.get_dao(codigo).get_poblacion_control(codigo,
+                                                                   dia)
         print "verificando"
         layer_name = self.gen_layer_name({
             "tipo": dia,
@@ -285,26 +376,49 @@ class MainController:
         """
         return self.muestras_dao.get_all()
 
+    def get_dao(self, codigo):
+        """
+        Retorna el dao de los reportes de la simulación `codigo`. Las
+        simulaciones en el nivel "resumen" tienen registros en la tabla
+        evolucion_resumen, las demás únicamente en evolucion_log, por lo que
+        el nivel de cada simulación no depende de LOG_NIVEL.
+
+        @rtype ReporteDao
+        """
+        if self.dao_resumen.tiene_registros(codigo):
+            return self.dao_resumen
+        return self.dao
+
     def get_codigos_by_muestra(self, id_muestra):
-        return self.dao.get_codigos_by_muestra(id_muestra)
+        """
+        Retorna los códigos de las simulaciones de la muestra en ambas
+        tablas del log, los individuos trazados de una simulación en el
+        nivel "resumen" no la repiten.
+        """
+        codigos = self.dao_resumen.get_codigos_by_muestra(id_muestra)
+        resumidos = set(c["codigo"] for c in codigos)
+        for codigo in self.dao.get_codigos_by_muestra(id_muestra):
+            if codigo["codigo"] not in resumidos:
+                codigos.append(codigo)
+        return codigos
 
     def get_tasa_desarrollo(self, codigo):
-        return self.dao.get_tasa_desarrollo(codigo)
+        return self.get_dao(codigo).get_tasa_desarrollo(codigo)
 
     def get_tasa_mortalidad(self, codigo):
-        return self.dao.get_tasa_mortalidad(codigo)
+        return self.get_dao(codigo).get_tasa_mortalidad(codigo)
 
     def get_poblacion_diaria(self, codigo):
-        return self.dao.get_poblacion_diaria(codigo)
+        return self.get_dao(codigo).get_poblacion_diaria(codigo)
 
     def get_dispersion(self, codigo):
-        return self.dao.get_dispersion(codigo)
+        return self.get_dao(codigo).get_dispersion(codigo)
 
     def get_ciclo_gonotrofico(self, codigo):
-        return self.dao.get_ciclo_gonotrofico(codigo)
+        return self.get_dao(codigo).get_ciclo_gonotrofico(codigo)
 
     def get_cantidad_dias(self, codigo):
-        return self.dao.get_cantidad_dias(codigo)
+        return self.get_dao(codigo).get_cantidad_dias(codigo)
 
     def get_evolucion_poblacion_diaria(self):
         """
@@ -1,31 +1,146 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import threading
+from contextlib import contextmanager
 import psycopg2
-from psycopg2 import connect
+from psycopg2.pool import ThreadedConnectionPool
 import psycopg2.extras
+from config import DB, DB_POOL
 """
 @autors Maximiliano Báez
 @contact mxbg.py@gmail.com
 """
 
+#~ pool de conexiones del proceso, se crea con la primera consulta
+POOL = None
+POOL_LOCK = threading.Lock()
+
+
+class PoolConexiones:
+
+    """
+    Pool de conexiones a la base de datos compartido por todos los DAOs
+    del proceso. Las conexiones se abren a demanda hasta `maximo`, cuando
+    todas estan en uso los hilos esperan a que se devuelva una.
+    """
+
+    def __init__(self, minimo=DB_POOL["min"], maximo=DB_POOL["max"], **db):
+        """
+        @type minimo : Integer
+        @param minimo: La cantidad de conexiones que se mantienen abiertas.
+
+        @type maximo : Integer
+        @param maximo: La cantidad máxima de conexiones abiertas.
+
+        @param db: Los parametros de la conexión, por defecto config.DB.
+        """
+        self.pid = os.getpid()
+        self.pool = ThreadedConnectionPool(minimo, maximo, **(db or DB))
+        self.disponibles = threading.BoundedSemaphore(maximo)
+
+    def checkout(self):
+        """
+        Retorna una conexión del pool, la conexión debe devolverse con
+        checkin.
+
+        @rtype Connection
+        """
+        self.disponibles.acquire()
+        try:
+            conexion = self.pool.getconn()
+            conexion.autocommit = True
+        except:
+            self.disponibles.release()
+            raise
+        return conexion
+
+    def checkin(self, conexion):
+        """
+        Devuelve la conexión al pool.
+        """
+        try:
+            self.pool.putconn(conexion)
+        finally:
+            self.disponibles.release()
+
+    @contextmanager
+    def conexion(self):
+        """
+        Retorna una conexión del pool durante el bloque with.
+
+            with pool.conexion() as conexion:
+                ...
+        """
+        conexion = self.checkout()
+        try:
+            yield conexion
+        finally:
+            self.checkin(conexion)
+
+    def close(self):
+        """
+        Cierra todas las conexiones del pool.
+        """
+        self.pool.closeall()
+
+
+def get_pool():
+    """
+    Retorna el pool de conexiones del proceso. Un proceso hijo creado con
+    fork no reutiliza las conexiones del padre, crea su propio pool.
+
+    @rtype PoolConexiones
+    """
+    global POOL
+    with POOL_LOCK:
+        if POOL is None or POOL.pid != os.getpid():
+            POOL = PoolConexiones()
+        return POOL
+
+
+def cerrar_pool():
+    """
+    Cierra las conexiones del pool del proceso.
+    """
+    global POOL
+    with POOL_LOCK:
+        if POOL is not None and POOL.pid == os.getpid():
+            POOL.close()
+        POOL = None
+
 
 class DBManager:
 
-    def __init__(self):
-        self.connection = connect(
-            """ dbname=geodenguedb
-            host=localhost
-            user=postgres
-            password=postgres
-        """)
-        self.connection.autocommit = True
+    """
+    Ejecuta las consultas tomando una conexión del pool del proceso por
+    cada consulta, por lo que construir un DBManager no abre conexiones.
+    Los resultados de la consulta quedan en el cursor, por lo que el
+    cursor puede leerse después de devolver la conexión.
+    """
+
+    def __init__(self, pool=None):
+        """
+        @type pool : PoolConexiones
+        @param pool: El pool a utilizar, por defecto el del proceso.
+        """
+        self.__pool = pool
+
+    @property
+    def pool(self):
+        """
+        El pool de conexiones, el del proceso si no se especifico uno.
+        """
+        if self.__pool is not None:
+            return self.__pool
+        return get_pool()
 
     def close(self):
         """
-        Este método se encarga de cerrar la conexión
+        Las conexiones pertenecen al pool, para cerrarlas ver cerrar_pool.
         """
-        self.connection.close()
+        pass
 
     def query(self, query_string, args={}, is_many=False):
         """
@@ -50,14 +165,31 @@ class DBManager:
         #~ for key in args.keys():
             #~ query_string = query_string.replace(':'+key, str(args[key]))
 
-        cursor = self.connection.cursor()
-        #~ print args
-        if not is_many:
-            cursor.execute(query_string, args)
-        else:
-            cursor.executemany(query_string, args)
+        with self.pool.conexion() as conexion:
+            cursor = conexion.cursor()
+            #~ print args
+            if not is_many:
+                cursor.execute(query_string, args)
+            else:
+                cursor.executemany(query_string, args)
         return cursor
 
+    def copy(self, query_string, archivo):
+        """
+        Ejecuta una sentencia COPY ... FROM STDIN, los datos se leen del
+        archivo.
+
+        @type query_string : String
+        @param query_string: La sentencia COPY.
+
+        @type archivo : File
+        @param archivo: El archivo (o StringIO) con los datos a copiar.
+        """
+        with self.pool.conexion() as conexion:
+            cursor = conexion.cursor()
+            cursor.copy_expert(query_string, archivo)
+            cursor.close()
+
     def to_dict(self, dbcursor):
         """
         Se encarga de procesar el cusor y generar un diccionario con los
@@ -129,6 +261,25 @@ class PuntosControlModel:
         cursor = self.db.query(sql_string, args)
         return self.db.to_dict(cursor)
 
+    def get_all(self):
+        """
+        Se encarga de obtener la lista de todos los puntos de control que
+        poseen fecha de recolección. Es el universo de puntos sobre el que
+        opera `get_within`.
+
+        @rtype  Dictionaries
+        @return Un diccionario con el resultado de la consulta
+        """
+        # se definie el query de la consulta.
+        sql_string = """
+            SELECT id,  id_muestras, codigo, descripcion,
+                cantidad, ST_X(the_geom) as x, ST_Y(the_geom) as y
+            FROM puntos_control
+            WHERE fecha_recoleccion is not null
+        """
+        cursor = self.db.query(sql_string)
+        return self.db.to_dict(cursor)
+
     def get_within(self, point, distance):
         """
         Se encarga de obtener la lista de todos los puntos que se encuentran
@@ -218,6 +369,85 @@ class CoefSarpeDemicheleModel:
         return self.db.to_dict(cursor)
 
 
+class CoeficientesInmutables(dict):
+
+    """
+    Diccionario de solo lectura con los coeficientes de un estado.
+    """
+
+    def __readonly(self, *args, **kargs):
+        raise TypeError("Los coeficientes son de solo lectura")
+
+    __setitem__ = __delitem__ = __readonly
+    update = clear = pop = popitem = setdefault = __readonly
+
+
+class CoefSarpeDemicheleRegistry:
+
+    """
+    Registro en memoria de la tabla `coef_sharpe_demichele`. La tabla se
+    carga una única vez y los coeficientes se consultan sin acceder a la
+    base de datos. Cada recarga genera una nueva versión del registro.
+    """
+    @property
+    def version(self):
+        """
+        Número de veces que se cargó la tabla, 0 si aún no fue cargada.
+        """
+        return self.__version
+
+    def __init__(self, dao=None):
+        """
+        @type dao : CoefSarpeDemicheleModel
+        @param dao: La capa de acceso a la tabla de coeficientes.
+        """
+        self.dao = dao
+        self.__version = 0
+        self.__tabla = None
+
+    def reload(self):
+        """
+        Se encarga de volver a cargar los coeficientes desde la base de
+        datos. La tabla anterior se reemplaza en una única asignación, por
+        lo que los lectores nunca observan una tabla a medio cargar.
+
+        @rtype  Integer
+        @return La nueva versión del registro.
+        """
+        if self.dao is None:
+            self.dao = CoefSarpeDemicheleModel()
+        tabla = {}
+        for coef in self.dao.get_all():
+            tabla[coef["codigo"]] = CoeficientesInmutables(coef)
+        self.__tabla = tabla
+        self.__version += 1
+        return self.__version
+
+    def get(self, codigo):
+        """
+        Se encarga de obtener los coeficientes para el modelo de
+        sharpe&demichele, la tabla se carga en el primer acceso.
+
+        @type codigo : String
+        @param codigo: El código del estado (HUEVO, LARVA, PUPA, ADULTO,
+            NULIPERA).
+
+        @rtype  CoeficientesInmutables
+        @return Los coeficientes del estado.
+        """
+        if self.__tabla is None:
+            self.reload()
+        return self.__tabla[codigo]
+
+    def codigos(self):
+        """
+        Retorna la lista de códigos registrados.
+        """
+        if self.__tabla is None:
+            self.reload()
+        return self.__tabla.keys()
+
+
 class InterpolacionModel:
 
     """
@@ -695,6 +925,138 @@ class ReporteDao:
         return self.db.to_dict(cursor)
 
 
+class ReporteResumenDao(ReporteDao):
+
+    """
+    Reportes calculados sobre la tabla `evolucion_resumen`, utilizada por
+    las simulaciones con el log en nivel "resumen". Los reportes que
+    requieren el historial de cada individuo (tasa de desarrollo y ciclo
+    gonotrófico) se calculan sobre los individuos trazados en
+    `evolucion_log`.
+    """
+
+    def get_codigos_by_muestra(self, id_muestra):
+        """
+        Se encarga de obtener la lista de códigos exitentes para un id de
+        muestra especificado previamente.
+        """
+        # se definie el query de la consulta.
+        sql_string = """
+            SELECT DISTINCT codigo, id_muestra, max(dia), min(dia)
+            FROM evolucion_resumen
+            WHERE id_muestra = %(id_muestra)s
+            GROUP BY codigo, id_muestra
+        """
+        # se construye el diccionario que contiene los parametros del query.
+        cursor = self.db.query(sql_string, {"id_muestra": id_muestra})
+        return self.db.to_dict(cursor)
+
+    #~ La cantidad de individuos y de muertos de cada día y estado
+    SQL_DIARIO = """
+            select codigo, dia, estado, sum(muertos) as muertos,
+                sum(cantidad) as total
+            from evolucion_resumen
+            where codigo = %(codigo)s
+            group by codigo, dia, estado
+    """
+
+    def tiene_registros(self, codigo):
+        """
+        Retorna True si la simulación `codigo` tiene registros en la tabla
+        `evolucion_resumen`, es decir si se simuló en el nivel "resumen".
+        """
+        # se definie el query de la consulta.
+        sql_string = """
+        select exists (
+            select 1 from evolucion_resumen where codigo = %(codigo)s
+        ) as existe
+        """
+        # se construye el diccionario que contiene los parametros del query.
+        cursor = self.db.query(sql_string, {"codigo": codigo})
+        return bool(self.db.to_dict(cursor)[0]["existe"])
+
+    def get_tasa_mortalidad(self, codigo):
+        """
+        Se encarga de calcular la tasa de mortalidad diaria para todas la
+        estapas del ciclo de vida del mosquito. Como en ReporteDao, la tasa
+        se calcula sobre los días con muertes.
+        """
+        # se definie el query de la consulta.
+        sql_string = """
+        select tmp.codigo, tmp.estado, sum(tmp.muertos) as muertos,
+        sum(tmp.total) as total,
+        round(sum(tmp.muertos) * 1.0 / sum(tmp.total), 4) * 100.0 as "porcentaje"
+        from (""" + self.SQL_DIARIO + """) as tmp
+        where tmp.muertos > 0
+        group by tmp.codigo, tmp.estado
+        order by codigo, estado;
+        """
+        # se construye el diccionario que contiene los parametros del query.
+        cursor = self.db.query(sql_string, {"codigo": codigo})
+        return self.db.to_dict(cursor)
+
+    def get_poblacion_diaria(self, codigo):
+        """
+        Se encarga de calcular el estado diario de la poblacion, incluidos
+        los días sin muertes.
+        """
+        # se definie el query de la consulta.
+        sql_string = """
+        select tmp.codigo, tmp.dia, tmp.estado, tmp.muertos, tmp.total,
+        round(tmp.muertos * 1.0 / tmp.total, 4) * 100.0 as "porcentaje"
+        from (""" + self.SQL_DIARIO + """) as tmp
+        order by codigo, estado, dia;
+        """
+        # se construye el diccionario que contiene los parametros del query.
+        cursor = self.db.query(sql_string, {"codigo": codigo})
+        return self.db.to_dict(cursor)
+
+    def get_dispersion(self, codigo):
+        """
+        Se encarga de calcular la distancia media recorrida por las hembras
+        adultas por tipo de zona.
+        """
+        # se definie el query de la consulta.
+        sql_string = """
+        select codigo, tipo_zona,
+            sum(distancia_hembras) / sum(hembras) as distancia
+        from evolucion_resumen as tmp
+        where estado = 'ADULTO'
+            and hembras > 0
+            and tmp.codigo = %(codigo)s
+        group by tmp.codigo, tipo_zona
+        order by tmp.codigo, tipo_zona
+        """
+        # se construye el diccionario que contiene los parametros del query.
+        cursor = self.db.query(sql_string, {"codigo": codigo})
+        return self.db.to_dict(cursor)
+
+    def get_cantidad_dias(self, codigo):
+        # se definie el query de la consulta.
+        sql_string = """
+        select max(dia), min(dia) from evolucion_resumen
+        where codigo = %(codigo)s
+        """
+        # se construye el diccionario que contiene los parametros del query.
+        cursor = self.db.query(sql_string, {"codigo": codigo})
+        return self.db.to_dict(cursor)
+
+    def get_poblacion_control(self, codigo, dia):
+        # se definie el query de la consulta.
+        sql_string = """
+        SELECT 0 as id, id_muestra, codigo, dia, sum(cantidad) as cantidad,
+        ST_X(the_geom) as x, ST_Y(the_geom) as y
+        FROM evolucion_resumen
+        WHERE codigo=%(codigo)s
+            AND dia = %(dia)s
+            AND estado != 'ADULTO'
+        GROUP BY the_geom, codigo, dia, id_muestra
+        """
+        # se construye el diccionario que contiene los parametros del query.
+        cursor = self.db.query(sql_string, {"codigo": codigo, "dia": dia})
+        return self.db.to_dict(cursor)
+
+
 class ConfiguracionesDao:
 
     """
@@ -0,0 +1,258 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo ejecuta grillas de escenarios de simulación en paralelo. Cada
+escenario define una temperatura fija (o None para el clima de la fuente),
+una semilla y los valores de los parametros del modelo que varían (ver
+PARAMETROS), que se entregan al simulador. Los escenarios se ejecutan en
+un pool de procesos, los
+puntos de control y el periodo climático se cargan una única vez y se
+entregan a cada proceso al inicializarlo.
+
+Uso :
+    python escenarios.py [id_muestras] [procesos]
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import os
+import sys
+import csv
+import copy
+import time
+import itertools
+import multiprocessing
+import aaegypti
+import ranking_table
+from config import *
+from datatype import *
+from tutiempo import Periodo
+from fuentes_datos import get_fuente
+
+#~ Parametros del modelo que pueden variar por escenario
+PARAMETROS = PARAMETROS_MODELO
+#~ Columnas del resumen de cada escenario
+ESTADOS = [Estado.HUEVO, Estado.LARVA, Estado.PUPA, Estado.ADULTO]
+# entradas compartidas por los escenarios de un proceso
+ENTRADAS = {}
+
+
+def gen_escenarios(temperaturas=[None], semillas=[None], **parametros):
+    """
+    Retorna el producto cartesiano de los valores de cada parametro.
+
+        gen_escenarios([20, 30], [1, 2], ALPHA=[0.1, 0.2])
+
+    @type temperaturas : List
+    @param temperaturas: Las temperaturas fijas, None utiliza el clima de
+        la fuente de datos.
+
+    @type semillas : List
+    @param semillas: Las semillas de los números aleatorios.
+
+    @param parametros: Los valores de cada parametro de PARAMETROS.
+
+    @rtype List
+    @return La lista de escenarios, cada escenario es un diccionario.
+    """
+    for nombre in parametros:
+        if nombre not in PARAMETROS:
+            raise ValueError("parametro desconocido : " + nombre)
+    nombres = sorted(parametros.keys())
+    escenarios = []
+    for valores in itertools.product(temperaturas, semillas,
+                                     *[parametros[n] for n in nombres]):
+        escenario = {"temperatura": valores[0], "semilla": valores[1]}
+        escenario.update(zip(nombres, valores[2:]))
+        escenarios.append(escenario)
+    return escenarios
+
+
+def get_codigo(id_muestras, escenario):
+    """
+    Construye el código de la simulación del escenario, por ejemplo
+    "m-4-temp-30-s-1-ALPHA-0.1".
+    """
+    codigo = "m-" + str(id_muestras)
+    if escenario.get("temperatura") is not None:
+        codigo += "-temp-" + str(escenario["temperatura"])
+    if escenario.get("semilla") is not None:
+        codigo += "-s-" + str(escenario["semilla"])
+    for nombre in PARAMETROS:
+        if nombre in escenario:
+            codigo += "-" + nombre + "-" + str(escenario[nombre])
+    return codigo
+
+
+def get_periodo(periodo, temperatura):
+    """
+    Retorna una copia del periodo con la temperatura fija, o el mismo
+    periodo si la temperatura es None.
+    """
+    if temperatura is None:
+        return periodo
+    copia = Periodo()
+    for dia in periodo.dias:
+        dia = copy.copy(dia)
+        dia.temperatura = float(temperatura)
+        copia.dias.append(dia)
+    return copia
+
+
+def inicializar(entradas):
+    """
+    Inicializa un proceso del pool con las entradas compartidas.
+    """
+    ENTRADAS.update(entradas)
+
+
+def ejecutar_escenario(escenario):
+    """
+    Ejecuta la simulación de un escenario con las entradas del proceso.
+
+    @rtype Dictionaries
+    @return La fila del resumen del escenario.
+    """
+    from simulador import Simulador
+
+    parametros = dict((n, escenario[n]) for n in PARAMETROS
+                      if n in escenario)
+    #~ los escenarios no guardan resguardos salvo que se indique
+    opciones = dict(ENTRADAS.get("opciones", {}))
+    opciones.setdefault("resguardo", 0)
+    salida = sys.stdout
+    try:
+        if ENTRADAS.get("silencioso", True):
+            sys.stdout = open(os.devnull, "w")
+        t = time.time()
+        evol = Simulador(id_muestra=ENTRADAS["id_muestras"],
+                         periodo=get_periodo(ENTRADAS["periodo"],
+                                             escenario.get("temperatura")),
+                         poblacion=ENTRADAS["puntos"],
+                         codigo=escenario["codigo"],
+                         semilla=escenario.get("semilla"),
+                         parametros=parametros, **opciones)
+        evol.start()
+        segundos = time.time() - t
+    finally:
+        if sys.stdout is not salida:
+            sys.stdout.close()
+            sys.stdout = salida
+
+    fila = dict(escenario)
+    resumen = evol.poblacion.get_resumen()
+    for estado in ESTADOS:
+        fila[estado.lower()] = resumen[estado]["total"]
+        fila[estado.lower() + "_muertas"] = resumen[estado]["muertas"]
+    fila["total_huevos"] = resumen["total_huevos"]
+    fila["segundos"] = round(segundos, 2)
+    return fila
+
+
+def ejecutar(escenarios, id_muestras, procesos=None, fuente=None,
+             silencioso=True, **opciones):
+    """
+    Ejecuta los escenarios en un pool de procesos.
+
+    @type escenarios : List
+    @param escenarios: Los escenarios, ver gen_escenarios.
+
+    @type id_muestras : Integer
+    @param id_muestras: El id de la muestra a simular.
+
+    @type procesos : Integer
+    @param procesos: La cantidad de procesos, por defecto la cantidad de
+        cpus. Con 1 proceso los escenarios se ejecutan en este proceso.
+
+    @type fuente : FuenteDatos
+    @param fuente: La fuente de los datos, por defecto FUENTE_DATOS.
+
+    @type silencioso : Boolean
+    @param silencioso: True para descartar la salida de las simulaciones.
+
+    @param opciones: Parametros adicionales de Simulador (motor,
+        raster_zonas, log_nivel, ...).
+
+    @rtype List
+    @return Las filas del resumen, en el orden de los escenarios.
+    """
+    fuente = fuente or get_fuente()
+    escenarios = [dict(e) for e in escenarios]
+    for escenario in escenarios:
+        escenario.setdefault("codigo", get_codigo(id_muestras, escenario))
+    entradas = {
+        "id_muestras": id_muestras,
+        "puntos": fuente.get_puntos(id_muestras),
+        "periodo": fuente.get_periodo(),
+        "silencioso": silencioso,
+        "opciones": opciones
+    }
+    #~ los coeficientes y el índice de puntos se cargan antes de crear los
+    #~ procesos, por lo que los procesos los heredan ya cargados.
+    aaegypti.COEF_SH_DE.codigos()
+    ranking_table.get_indice()
+
+    procesos = procesos or multiprocessing.cpu_count()
+    if procesos == 1:
+        inicializar(entradas)
+        return [ejecutar_escenario(e) for e in escenarios]
+    pool = multiprocessing.Pool(procesos, inicializar, (entradas,))
+    try:
+        return pool.map(ejecutar_escenario, escenarios, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_columnas(filas):
+    """
+    Retorna las columnas de la tabla de resultados.
+    """
+    parametros = [n for n in PARAMETROS if any(n in f for f in filas)]
+    resumen = []
+    for estado in ESTADOS:
+        resumen += [estado.lower(), estado.lower() + "_muertas"]
+    return ["codigo", "temperatura", "semilla"] + parametros + resumen + \
+        ["total_huevos", "segundos"]
+
+
+def to_tabla(filas):
+    """
+    Retorna la tabla de resultados como texto.
+    """
+    columnas = get_columnas(filas)
+    datos = [[str(f.get(c, "")) for c in columnas] for f in filas]
+    anchos = [max([len(c)] + [len(d[i]) for d in datos])
+              for i, c in enumerate(columnas)]
+    lineas = [" ".join(c.rjust(a) for c, a in zip(columnas, anchos))]
+    for d in datos:
+        lineas.append(" ".join(v.rjust(a) for v, a in zip(d, anchos)))
+    return "\n".join(lineas)
+
+
+def guardar(filas, path):
+    """
+    Guarda la tabla de resultados en un archivo CSV.
+    """
+    columnas = get_columnas(filas)
+    with open(path, "wb") as f:
+        writer = csv.writer(f)
+        writer.writerow(columnas)
+        for fila in filas:
+            writer.writerow([fila.get(c, "") for c in columnas])
+
+
+if __name__ == "__main__":
+    id_muestras = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    procesos = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    escenarios = gen_escenarios(
+        temperaturas=[15, 18, 20, 22, 24, 25, 26, 27, 30, 34],
+        semillas=[1])
+    t = time.time()
+    filas = ejecutar(escenarios, id_muestras, procesos)
+    print to_tabla(filas)
+    print "tiempo total : %.1f s" % (time.time() - t)
+    path = os.path.join(TMP_HOME, "escenarios-m-" + str(id_muestras) + ".csv")
+    guardar(filas, path)
+    print "resultados : " + path
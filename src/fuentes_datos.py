@@ -0,0 +1,272 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene las fuentes de datos del simulador. Una fuente provee
+los puntos de control, los coeficientes del modelo de Sharpe & DeMichele y
+los datos climáticos del periodo a simular.
+
+    postgres : Los puntos y coeficientes se leen de la base de datos y el
+        clima de los servicios de openweathermap (TuTiempo).
+    archivos : Los puntos se leen de un CSV como data/larvitrampas.csv,
+        los coeficientes de un CSV y el clima de un JSON como los de
+        webapp/data/api.openweathermap.*.json. No requiere de la base de
+        datos ni de la red.
+
+Las capas de acceso de los archivos exponen los mismos métodos que las de
+la base de datos (get_by, get_all), por lo que pueden reemplazarlas.
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import csv
+import json
+import math
+from config import *
+from db_manager import PuntosControlModel, CoefSarpeDemicheleModel
+from tutiempo import Periodo, TuTiempo
+import ranking_table
+import aaegypti
+
+#~ Radio de la esfera de la proyección mercator (EPSG:900913 / EPSG:3857)
+RADIO_MERCATOR = 6378137.0
+
+
+def a_geograficas(x, y, srid):
+    """
+    Transforma las coordenadas (x, y) del `srid` indicado a longitud y
+    latitud (EPSG:4326).
+
+    @type srid : Integer
+    @param srid: 4326, o 900913/3857 para la proyección mercator esférica.
+    """
+    if srid == 4326:
+        return x, y
+    if srid in (900913, 3857):
+        lon = math.degrees(x / RADIO_MERCATOR)
+        lat = math.degrees(2 * math.atan(math.exp(y / RADIO_MERCATOR)) -
+                           math.pi / 2)
+        return lon, lat
+    raise ValueError("srid no soportado : " + str(srid))
+
+
+class PuntosControlCsv:
+
+    """
+    Capa de acceso a los puntos de control guardados en un CSV con las
+    columnas id, cantidad, x, y. El CSV puede tener una fila de cabecera,
+    si la cabecera incluye la columna id_muestras los puntos se filtran
+    por muestra, en caso contrario todos los puntos pertenecen a todas las
+    muestras.
+    """
+
+    def __init__(self, path, srid=900913):
+        """
+        @type path : String
+        @param path: La ruta del archivo CSV.
+
+        @type srid : Integer
+        @param srid: El sistema de referencia de las coordenadas del CSV.
+        """
+        self.path = path
+        self.srid = srid
+        self.__puntos = None
+
+    def leer(self):
+        """
+        Lee los puntos del archivo, las coordenadas se transforman a
+        longitud y latitud.
+        """
+        columnas = ["id", "cantidad", "x", "y"]
+        puntos = []
+        with open(self.path) as f:
+            for fila in csv.reader(f):
+                if len(fila) == 0:
+                    continue
+                if not fila[0].strip().lstrip("-").isdigit():
+                    columnas = [c.strip() for c in fila]
+                    continue
+                args = dict(zip(columnas, fila))
+                x, y = a_geograficas(float(args["x"]), float(args["y"]),
+                                     self.srid)
+                puntos.append({
+                    "id": int(args["id"]),
+                    "id_muestras": int(args["id_muestras"])
+                    if "id_muestras" in args else None,
+                    "codigo": args.get("codigo", args["id"]),
+                    "descripcion": args.get("descripcion", ""),
+                    "cantidad": int(float(args["cantidad"])),
+                    "x": x,
+                    "y": y
+                })
+        return puntos
+
+    def get_all(self):
+        """
+        Retorna todos los puntos de control del archivo, el archivo se lee
+        en el primer acceso.
+        """
+        if self.__puntos is None:
+            self.__puntos = self.leer()
+        return [dict(p) for p in self.__puntos]
+
+    def get_by(self, id_muestras):
+        """
+        Retorna los puntos de control de la muestra `id_muestras`.
+        """
+        return [p for p in self.get_all()
+                if p["id_muestras"] in (None, id_muestras)]
+
+
+class CoeficientesCsv:
+
+    """
+    Capa de acceso a los coeficientes del modelo de Sharpe & DeMichele
+    guardados en un CSV con las columnas codigo, rh025, ha, hh, th.
+    """
+
+    def __init__(self, path):
+        """
+        @type path : String
+        @param path: La ruta del archivo CSV.
+        """
+        self.path = path
+
+    def get_all(self):
+        """
+        Retorna los coeficientes de todos los códigos.
+        """
+        coeficientes = []
+        with open(self.path) as f:
+            for fila in csv.DictReader(f):
+                coef = {"codigo": fila["codigo"]}
+                for nombre in ["rh025", "ha", "hh", "th"]:
+                    coef[nombre] = float(fila[nombre])
+                coeficientes.append(coef)
+        return coeficientes
+
+    def get_by(self, codigo):
+        """
+        Retorna los coeficientes del código indicado.
+        """
+        return [c for c in self.get_all() if c["codigo"] == codigo]
+
+
+class ClimaJson:
+
+    """
+    Obtiene los datos climáticos de un archivo JSON con el formato de los
+    servicios de openweathermap. Se reconocen los tres formatos utilizados
+    por el parser de Dia: historial de estación (temp.v), predicción
+    (temp.day) e historial de ciudad (nodo main).
+    """
+
+    def __init__(self, path):
+        """
+        @type path : String
+        @param path: La ruta del archivo JSON.
+        """
+        self.path = path
+
+    def get_formato(self, data):
+        """
+        Retorna el valor del parametro `future` de Dia.parse que
+        corresponde al formato del registro.
+        """
+        temp = data.get("temp")
+        if isinstance(temp, dict) and temp.has_key("v"):
+            return None
+        if isinstance(temp, dict) and temp.has_key("day"):
+            return True
+        return False
+
+    def get_periodo(self, temperatura=None):
+        """
+        Retorna el periodo con los datos climáticos del archivo.
+
+        @type temperatura : Float
+        @param temperatura: La temperatura fija a utilizar en lugar de la
+            del archivo, en cualquiera de los formatos.
+        """
+        with open(self.path) as f:
+            data = json.load(f)
+        periodo = Periodo()
+        if len(data["list"]) > 0:
+            formato = self.get_formato(data["list"][0])
+            periodo.parse_json(data, temperatura, formato)
+        if temperatura is not None:
+            for dia in periodo.dias:
+                dia.temperatura = float(temperatura)
+        return periodo
+
+
+class FuenteDatos:
+
+    """
+    Agrupa las capas de acceso a los puntos de control, a los coeficientes
+    y a los datos climáticos.
+    """
+
+    def __init__(self, puntos, coeficientes, clima):
+        """
+        @type puntos : PuntosControlModel
+        @param puntos: La capa de acceso a los puntos de control.
+
+        @type coeficientes : CoefSarpeDemicheleModel
+        @param coeficientes: La capa de acceso a los coeficientes.
+
+        @type clima : TuTiempo
+        @param clima: La fuente de los datos climáticos.
+        """
+        self.puntos = puntos
+        self.coeficientes = coeficientes
+        self.clima = clima
+
+    def get_puntos(self, id_muestras):
+        """
+        Retorna los puntos de control de la muestra.
+        """
+        return self.puntos.get_by(id_muestras)
+
+    def get_periodo(self, temperatura=None):
+        """
+        Retorna el periodo con los datos climáticos.
+        """
+        return self.clima.get_periodo(temperatura)
+
+    def instalar(self):
+        """
+        Utiliza la fuente para el índice de puntos de control del ranking
+        de zonas y para el registro de coeficientes. Los datos ya cargados
+        de otra fuente se descartan.
+        """
+        if ranking_table.DAO is not self.puntos:
+            ranking_table.DAO = self.puntos
+            ranking_table.INDICE = None
+        if aaegypti.COEF_SH_DE.dao is not self.coeficientes:
+            aaegypti.COEF_SH_DE.dao = self.coeficientes
+            if aaegypti.COEF_SH_DE.version > 0:
+                aaegypti.COEF_SH_DE.reload()
+        return self
+
+
+def get_fuente(nombre=None):
+    """
+    Retorna la fuente de datos `nombre`, por defecto FUENTE_DATOS, ya
+    instalada.
+
+    @type nombre : String
+    @param nombre: "postgres" o "archivos".
+    """
+    nombre = nombre or FUENTE_DATOS
+    if nombre == "archivos":
+        fuente = FuenteDatos(
+            PuntosControlCsv(ARCHIVOS_DATOS["puntos"],
+                             ARCHIVOS_DATOS["srid"]),
+            CoeficientesCsv(ARCHIVOS_DATOS["coeficientes"]),
+            ClimaJson(ARCHIVOS_DATOS["clima"]))
+    elif nombre == "postgres":
+        fuente = FuenteDatos(PuntosControlModel(), CoefSarpeDemicheleModel(),
+                             TuTiempo("Asuncion"))
+    else:
+        raise ValueError("fuente de datos desconocida : " + str(nombre))
+    return fuente.instalar()
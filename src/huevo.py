@@ -23,9 +23,10 @@ class Huevo(AeAegypti):
 
         @keyword [sexo]: El enum que identifica el sexo del Huevo
         @keyword [position]: El punto que determina la ubiación del huevo
+        @keyword [aleatorio]: El flujo de números aleatorios del individuo.
         """
         # Se genera de forma aleatoria el sexo del huevo
-        sexo = randint(0, 1)
+        sexo = kargs.get('aleatorio', FLUJO).randint(0, 1)
         if sexo == 0:
             sexo = Sexo.MACHO
         else:
@@ -97,8 +98,7 @@ class Huevo(AeAegypti):
         else:
             omega = 0.63
 
-        coef = COEF_SH_DE.get_by(Estado.HUEVO)
-        elr = self.sharpe_demichele(temperatura, coef[0])
+        elr = TASAS.get(Estado.HUEVO, temperatura)
         hi = H * elr * omega
         return hi
 
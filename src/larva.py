@@ -35,7 +35,7 @@ class Larva(AeAegypti):
 
         if not kargs.has_key('sexo'):
             # Se genera de forma aleatoria el sexo del mosquito
-            sexo = randint(0, 1)
+            sexo = kargs.get('aleatorio', FLUJO).randint(0, 1)
             if sexo == 0:
                 kargs['sexo'] = Sexo.MACHO
             else:
@@ -103,7 +103,7 @@ class Larva(AeAegypti):
         Conclusión, si hay una sola larva, no hay competencia intraespecífica.
         """
         bs_ij = self.get_bs_ij()
-        m = ml * L + (ALPHA / bs_ij) * L * (L - 1)
+        m = ml * L + (self.parametros["ALPHA"] / bs_ij) * L * (L - 1)
 
         colonia[self.estado]["cantidad_ant"] = m
         # innivición de eclosión de huevos
@@ -0,0 +1,346 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Este módulo contiene los destinos (sinks) del log de eventos. Los eventos
+se acumulan por columnas en un BufferEventos y cada sink se encarga de
+escribir las columnas acumuladas en su destino. Los sinks escriben tanto
+la tabla evolucion_log (un registro por individuo por día) como la tabla
+evolucion_resumen (un registro por día, colonia, estado y tipo de zona).
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import os
+import csv
+import datetime
+import itertools
+from array import array
+from cStringIO import StringIO
+import numpy
+from config import *
+from db_manager import DBManager
+
+"""
+Columnas de la tabla evolucion_log, cada columna se define como (nombre,
+tipo). Los tipos son los del módulo array, "s" indica una columna de texto.
+Las columnas propias del adulto son nulas para los demás estados, los
+nulos se representan con NaN en las columnas numéricas y con -1 en las
+booleanas.
+"""
+COLUMNAS = [
+    ("id_mosquito", "l"),
+    ("id_colonia", "s"),
+    ("id_mosquito_padre", "l"),
+    ("id_muestra", "l"),
+    ("codigo", "s"),
+    ("temperatura", "d"),
+    ("sexo", "s"),
+    ("expectativa_de_vida", "d"),
+    ("tiempo_de_vida", "d"),
+    ("tiempo_madurez", "d"),
+    ("madurez", "d"),
+    ("tipo_zona", "s"),
+    ("bs", "d"),
+    ("ultima_oviposicion", "d"),
+    ("ultimo_alimento", "d"),
+    ("distancia_recorrida", "d"),
+    ("cantidad_oviposicion", "d"),
+    ("cantidad_alimentacion", "d"),
+    ("is_inseminada", "b"),
+    ("se_alimenta", "b"),
+    ("se_reproduce", "b"),
+    ("ciclo_gonotrofico", "d"),
+    ("cantidad_huevos", "d"),
+    ("estado", "s"),
+    ("x", "d"),
+    ("y", "d"),
+    ("dia", "l"),
+    ("generacion", "l"),
+    ("edad", "l")
+]
+
+"""
+Columnas de la tabla evolucion_resumen, ver db/evolucion_resumen.sql.
+"""
+COLUMNAS_RESUMEN = [
+    ("id_muestra", "l"),
+    ("codigo", "s"),
+    ("dia", "l"),
+    ("id_colonia", "s"),
+    ("estado", "s"),
+    ("tipo_zona", "s"),
+    ("temperatura", "d"),
+    ("cantidad", "l"),
+    ("muertos", "l"),
+    ("hembras", "l"),
+    ("distancia_hembras", "d"),
+    ("x", "d"),
+    ("y", "d")
+]
+
+ESQUEMAS = {
+    "evolucion_log": COLUMNAS,
+    "evolucion_resumen": COLUMNAS_RESUMEN
+}
+
+NULOS = {"d": float("nan"), "b": -1, "l": 0, "s": ""}
+#~ Valores del CSV de las columnas booleanas, por valor + 1
+BOOLEANOS_CSV = numpy.array(["", "f", "t"], dtype=object)
+
+
+class BufferEventos:
+
+    """
+    Acumula los registros del log por columnas tipadas.
+    """
+
+    def __init__(self, tabla="evolucion_log"):
+        """
+        @type tabla : String
+        @param tabla: La tabla de los registros (ver ESQUEMAS).
+        """
+        self.tabla = tabla
+        self.esquema = ESQUEMAS[tabla]
+        self.vaciar()
+
+    def __len__(self):
+        return len(self.columnas[self.esquema[0][0]])
+
+    def add(self, args):
+        """
+        Añade un registro al buffer, los campos ausentes se guardan como
+        nulos.
+
+        @type args : Dictionaries
+        @param args: Los campos del registro.
+        """
+        for nombre, tipo in self.esquema:
+            valor = args.get(nombre, None)
+            if valor is None:
+                valor = NULOS[tipo]
+            elif tipo == "s":
+                valor = str(valor)
+            elif tipo == "b":
+                valor = int(bool(valor))
+            elif tipo == "l":
+                valor = int(valor)
+            else:
+                valor = float(valor)
+            self.columnas[nombre].append(valor)
+
+    def extend(self, columnas, cantidad):
+        """
+        Añade `cantidad` registros dados por columnas. Cada columna es un
+        array de `cantidad` valores o un único valor común a todos los
+        registros, las columnas ausentes se guardan como nulos. Los nulos
+        de las columnas de texto son None, los de las demás columnas son
+        los valores de NULOS.
+
+        @type columnas : Dictionaries
+        @param columnas: Las columnas de los registros.
+        """
+        for nombre, tipo in self.esquema:
+            valores = columnas.get(nombre, None)
+            if valores is None:
+                valores = NULOS[tipo]
+            if tipo == "s":
+                if numpy.ndim(valores) == 0:
+                    valores = [valores] * cantidad
+                self.columnas[nombre].extend(
+                    NULOS[tipo] if v is None else str(v) for v in valores)
+                continue
+            valores = numpy.asarray(valores).astype(tipo)
+            if valores.ndim == 0:
+                valores = numpy.repeat(valores, cantidad)
+            self.columnas[nombre].fromstring(valores.tostring())
+
+    def vaciar(self):
+        """
+        Retorna las columnas acumuladas y reinicia el buffer.
+
+        @rtype Dictionaries
+        """
+        columnas = getattr(self, "columnas", None)
+        self.columnas = {}
+        for nombre, tipo in self.esquema:
+            self.columnas[nombre] = [] if tipo == "s" else array(tipo)
+        return columnas
+
+
+class SinkPostgres:
+
+    """
+    Escribe los registros en la tabla evolucion_log mediante
+    COPY FROM STDIN en formato CSV, sin construir sentencias INSERT.
+    """
+
+    def __init__(self, db=None):
+        """
+        @type db : DBManager
+        @param db: La conexión a utilizar, por defecto una nueva.
+        """
+        self.db = db if db is not None else DBManager()
+
+    def get_columnas(self, tabla):
+        """
+        Retorna las columnas de la tabla en el orden del CSV.
+        """
+        nombres = [n for n, t in ESQUEMAS[tabla] if n not in ("x", "y")]
+        return nombres + ["the_geom", "fecha"]
+
+    def to_csv(self, tabla, columnas):
+        """
+        Construye el CSV a partir de las columnas del buffer. Cada columna
+        se convierte de una vez a una lista de valores del CSV y las filas
+        se escriben con writerows; el módulo csv escribe los float con repr
+        y None como un campo vacío.
+
+        @rtype StringIO
+        """
+        salida = StringIO()
+        writer = csv.writer(salida)
+        fecha = datetime.datetime.now().isoformat()
+        campos = [(n, t) for n, t in ESQUEMAS[tabla] if n not in ("x", "y")]
+        valores = []
+        for nombre, tipo in campos:
+            columna = columnas[nombre]
+            if tipo == "s":
+                valores.append(columna)
+                continue
+            columna = numpy.frombuffer(columna, dtype=tipo)
+            if tipo == "d":
+                #~ los NaN son nulos
+                nulos = numpy.isnan(columna)
+                columna = columna.astype(object)
+                columna[nulos] = None
+            elif tipo == "b":
+                columna = BOOLEANOS_CSV[numpy.sign(columna) + 1]
+            valores.append(columna.tolist())
+        x = numpy.frombuffer(columnas["x"], dtype="d").tolist()
+        y = numpy.frombuffer(columnas["y"], dtype="d").tolist()
+        valores.append(map("SRID=4326;POINT({0!r} {1!r})".format, x, y))
+        valores.append(itertools.repeat(fecha, len(x)))
+        writer.writerows(itertools.izip(*valores))
+        salida.seek(0)
+        return salida
+
+    def escribir(self, tabla, columnas):
+        """
+        Escribe las columnas en la base de datos.
+
+        @type tabla : String
+        @param tabla: La tabla destino (ver ESQUEMAS).
+
+        @type columnas : Dictionaries
+        @param columnas: Las columnas retornadas por BufferEventos.vaciar.
+        """
+        sql_string = "COPY public.{0} ({1}) FROM STDIN WITH CSV".format(
+            tabla, ", ".join(self.get_columnas(tabla)))
+        self.db.copy(sql_string, self.to_csv(tabla, columnas))
+
+    def descartar(self, tabla, id_muestra, codigo, dia):
+        """
+        Elimina los registros de la simulación desde el día `dia`, se
+        utiliza al reanudar una simulación para no duplicar registros.
+
+        @type tabla : String
+        @param tabla: La tabla de los registros (ver ESQUEMAS).
+        """
+        sql_string = """
+        DELETE FROM public.{0}
+        WHERE id_muestra = %(id_muestra)s AND codigo = %(codigo)s
+            AND dia >= %(dia)s
+        """.format(tabla)
+        self.db.query(sql_string, {"id_muestra": id_muestra,
+                                   "codigo": codigo, "dia": dia})
+
+
+class SinkNpz:
+
+    """
+    Escribe los registros en archivos .npz locales, un archivo por cada
+    escritura. Cada columna se guarda como un array de numpy.
+    """
+
+    def __init__(self, directorio=LOG_DIR, prefijo="log"):
+        """
+        @type directorio : String
+        @param directorio: El directorio de los archivos.
+
+        @type prefijo : String
+        @param prefijo: El prefijo del nombre de los archivos.
+        """
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.secuencia = 0
+
+    def escribir(self, tabla, columnas):
+        """
+        Escribe las columnas en el siguiente archivo de la secuencia.
+
+        @type tabla : String
+        @param tabla: La tabla de los registros (ver ESQUEMAS).
+
+        @type columnas : Dictionaries
+        @param columnas: Las columnas retornadas por BufferEventos.vaciar.
+        """
+        if not os.path.isdir(self.directorio):
+            os.makedirs(self.directorio)
+        arrays = {}
+        for nombre, tipo in ESQUEMAS[tabla]:
+            if tipo == "s":
+                arrays[nombre] = numpy.array(columnas[nombre], dtype=str)
+            else:
+                arrays[nombre] = numpy.array(columnas[nombre], dtype=tipo)
+        #~ los archivos existentes, de una ejecución anterior o de otro
+        #~ hilo, no se sobreescriben
+        path = None
+        while path is None or os.path.exists(path):
+            self.secuencia += 1
+            path = os.path.join(self.directorio, "{0}-{1}-{2:06d}.npz".format(
+                self.prefijo, tabla, self.secuencia))
+        numpy.savez(path, **arrays)
+        return path
+
+    def descartar(self, tabla, id_muestra, codigo, dia):
+        """
+        Elimina los registros de la simulación desde el día `dia` de los
+        archivos del directorio, los archivos que quedan vacíos se borran.
+
+        @type tabla : String
+        @param tabla: La tabla de los registros (ver ESQUEMAS).
+        """
+        if not os.path.isdir(self.directorio):
+            return
+        sufijo = "-" + tabla + "-"
+        for nombre in sorted(os.listdir(self.directorio)):
+            if not nombre.endswith(".npz") or sufijo not in nombre:
+                continue
+            path = os.path.join(self.directorio, nombre)
+            with numpy.load(path) as datos:
+                arrays = dict((n, datos[n]) for n in datos.files)
+            descartados = (arrays["id_muestra"] == id_muestra) & \
+                (arrays["codigo"] == str(codigo)) & (arrays["dia"] >= dia)
+            if not descartados.any():
+                continue
+            if descartados.all():
+                os.remove(path)
+                continue
+            for n in arrays:
+                arrays[n] = arrays[n][~descartados]
+            numpy.savez(path, **arrays)
+
+
+def get_sink(nombre=LOG_SINK, codigo="", indice=0):
+    """
+    Retorna el sink identificado por `nombre`: "postgres" o "npz". Los
+    archivos del sink "npz" llevan como prefijo el código de la simulación
+    y el índice del hilo escritor.
+    """
+    if nombre == "npz":
+        prefijo = codigo or "log"
+        if indice > 0:
+            prefijo += "-" + str(indice)
+        return SinkNpz(prefijo=prefijo)
+    return SinkPostgres()
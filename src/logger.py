@@ -2,18 +2,275 @@
 # -*- coding: utf-8 -*-
 
 """
-Clase encargada de recibir strings de eventos y almacenarlos
-en un archivo de salida en un tabla de eventos.
+Clase encargada de recibir los eventos de los individuos y almacenarlos
+en la tabla de eventos, o en el destino configurado (ver log_sinks).
 
 @autors Maximiliano Báez
 @contact mxbg.py@gmail.com
 """
 import threading
+import Queue
+from collections import OrderedDict
+import numbers
+import numpy
 import os
 import sys
 import time
 from datatype import *
-from db_manager import DBManager
+from config import *
+from log_sinks import BufferEventos, ESQUEMAS, get_sink
+
+
+class EscritorEventos:
+
+    """
+    Hilos escritores del log. Los lotes de registros se encolan en una cola
+    acotada, si la cola se encuentra llena el productor espera a que los
+    escritores la liberen. Cada hilo escribe con su propio sink.
+    """
+
+    def __init__(self, crear_sink, hilos=1, tamanho_cola=8):
+        """
+        @type crear_sink : Function
+        @param crear_sink: Recibe el índice del hilo y retorna su sink.
+
+        @type hilos : Integer
+        @param hilos: La cantidad de hilos escritores.
+
+        @type tamanho_cola : Integer
+        @param tamanho_cola: La cantidad máxima de lotes en espera.
+        """
+        self.cola = Queue.Queue(tamanho_cola)
+        self.lock = threading.Lock()
+        self.errores = []
+        self.escrituras = 0
+        self.registros = 0
+        self.latencia_total = 0.0
+        self.latencia_max = 0.0
+        self.cola_max = 0
+        self.hilos = []
+        for i in range(hilos):
+            t = threading.Thread(target=self.run, args=(crear_sink(i),))
+            t.daemon = True
+            t.start()
+            self.hilos.append(t)
+
+    def run(self, sink):
+        """
+        Ciclo de los hilos escritores, termina al recibir None.
+        """
+        while True:
+            lote = self.cola.get()
+            try:
+                if lote is None:
+                    return
+                tabla, columnas = lote
+                inicio = time.time()
+                sink.escribir(tabla, columnas)
+                latencia = time.time() - inicio
+                with self.lock:
+                    self.escrituras += 1
+                    self.registros += len(columnas["x"])
+                    self.latencia_total += latencia
+                    self.latencia_max = max(self.latencia_max, latencia)
+            except Exception, e:
+                with self.lock:
+                    self.errores.append(e)
+                print >> sys.stderr, "Error al escribir el log : " + str(e)
+            finally:
+                self.cola.task_done()
+
+    @property
+    def cerrado(self):
+        """
+        True si el escritor fue cerrado y ya no acepta registros.
+        """
+        return len(self.hilos) == 0
+
+    def put(self, tabla, columnas):
+        """
+        Encola un lote de registros de la tabla, espera si la cola está
+        llena.
+        """
+        if self.cerrado:
+            raise RuntimeError("El escritor del log se encuentra cerrado")
+        self.cola.put((tabla, columnas))
+        with self.lock:
+            self.cola_max = max(self.cola_max, self.cola.qsize())
+
+    def flush(self):
+        """
+        Espera a que se escriban todos los lotes encolados. Si alguna
+        escritura falló se lanza el primer error.
+        """
+        self.cola.join()
+        with self.lock:
+            errores = self.errores
+            self.errores = []
+        if len(errores) > 0:
+            raise errores[0]
+
+    def close(self):
+        """
+        Escribe los lotes pendientes y detiene los hilos escritores.
+        """
+        try:
+            self.flush()
+        finally:
+            for t in self.hilos:
+                self.cola.put(None)
+            for t in self.hilos:
+                t.join()
+            self.hilos = []
+
+    def get_metricas(self):
+        """
+        Retorna las métricas del escritor: profundidad actual y máxima de
+        la cola, cantidad de escrituras y registros, latencia media y máxima
+        de las escrituras en segundos, y cantidad de errores pendientes.
+        """
+        with self.lock:
+            media = self.latencia_total / self.escrituras \
+                if self.escrituras > 0 else 0.0
+            return {
+                "cola": self.cola.qsize(),
+                "cola_max": self.cola_max,
+                "escrituras": self.escrituras,
+                "registros": self.registros,
+                "latencia_media": media,
+                "latencia_max": self.latencia_max,
+                "errores": len(self.errores)
+            }
+
+
+def seleccionar(columnas, indices):
+    """
+    Retorna las filas `indices` de las columnas, los valores comunes a
+    todos los registros se conservan.
+    """
+    return dict((nombre, valor if numpy.ndim(valor) == 0 else valor[indices])
+                for nombre, valor in columnas.items())
+
+
+class ResumenDiario:
+
+    """
+    Acumula la cantidad de individuos por día, colonia, estado y tipo de
+    zona. Junto con la cantidad se acumulan los muertos (expectativa de
+    vida igual a 0) y la distancia recorrida por las hembras adultas, que
+    son los datos utilizados por los reportes.
+    """
+
+    def __init__(self):
+        self.grupos = OrderedDict()
+
+    def __len__(self):
+        return len(self.grupos)
+
+    def get_grupo(self, args):
+        """
+        Retorna el grupo del registro, el grupo se crea en el primer
+        acceso.
+        """
+        key = (args['dia'], args['id_colonia'], args['estado'],
+               args['tipo_zona'])
+        grupo = self.grupos.get(key)
+        if grupo is None:
+            x, y = str(args['id_colonia']).split("_")
+            grupo = {
+                'id_muestra': args['id_muestra'],
+                'codigo': args['codigo'],
+                'dia': args['dia'],
+                'id_colonia': args['id_colonia'],
+                'estado': args['estado'],
+                'tipo_zona': args['tipo_zona'],
+                'temperatura': args['temperatura'],
+                'cantidad': 0,
+                'muertos': 0,
+                'hembras': 0,
+                'distancia_hembras': 0.0,
+                'x': float(x),
+                'y': float(y)
+            }
+            self.grupos[key] = grupo
+        return grupo
+
+    def add(self, args):
+        """
+        Añade el registro de un individuo a su grupo.
+
+        @type args : Dictionaries
+        @param args: Los campos del registro del individuo.
+        """
+        grupo = self.get_grupo(args)
+        grupo['cantidad'] += 1
+        if args['expectativa_de_vida'] == 0:
+            grupo['muertos'] += 1
+        if args['estado'] == Estado.ADULTO and args['sexo'] == Sexo.HEMBRA:
+            grupo['hembras'] += 1
+            grupo['distancia_hembras'] += args['distancia_recorrida']
+
+    def add_cohorte(self, args):
+        """
+        Añade a su grupo los individuos de una cohorte, un conjunto de
+        individuos inmaduros representados únicamente por su cantidad.
+
+        @type args : Dictionaries
+        @param args: Los campos del grupo, `cantidad` y `muertos` indican
+            los individuos de la cohorte y cuántos murieron en el día.
+        """
+        grupo = self.get_grupo(args)
+        grupo['cantidad'] += args['cantidad']
+        grupo['muertos'] += args['muertos']
+
+    def add_columnas(self, columnas, cantidad):
+        """
+        Añade a sus grupos los registros dados por columnas (ver
+        BufferEventos.extend), los registros se agrupan con numpy y se
+        accede una única vez a cada grupo.
+        """
+        codigos = []
+        for nombre in ['dia', 'id_colonia', 'estado', 'tipo_zona']:
+            valores = columnas[nombre]
+            if numpy.ndim(valores) == 0:
+                codigos.append(numpy.zeros(cantidad, dtype=numpy.int64))
+            else:
+                codigos.append(numpy.unique(numpy.asarray(valores),
+                                            return_inverse=True)[1])
+        grupos, primero, grupo = numpy.unique(
+            numpy.column_stack(codigos), axis=0, return_index=True,
+            return_inverse=True)
+        hembra = (numpy.asarray(columnas['estado']) == Estado.ADULTO) & \
+            (numpy.asarray(columnas['sexo']) == Sexo.HEMBRA)
+        distancia = numpy.where(hembra, columnas['distancia_recorrida'], 0)
+        total = numpy.bincount(grupo)
+        muertos = numpy.bincount(
+            grupo, numpy.asarray(columnas['expectativa_de_vida']) == 0)
+        hembras = numpy.bincount(grupo, hembra)
+        distancias = numpy.bincount(grupo, distancia)
+        for g, i in enumerate(primero):
+            args = {}
+            for nombre in ['id_muestra', 'codigo', 'dia', 'id_colonia',
+                           'estado', 'tipo_zona', 'temperatura']:
+                valor = columnas[nombre]
+                args[nombre] = valor if numpy.ndim(valor) == 0 else valor[i]
+            grupo_i = self.get_grupo(args)
+            grupo_i['cantidad'] += int(total[g])
+            grupo_i['muertos'] += int(muertos[g])
+            grupo_i['hembras'] += int(hembras[g])
+            grupo_i['distancia_hembras'] += float(distancias[g])
+
+    def vaciar(self):
+        """
+        Retorna las columnas de los grupos acumulados y reinicia el resumen.
+
+        @rtype Dictionaries
+        """
+        buffer = BufferEventos("evolucion_resumen")
+        for grupo in self.grupos.itervalues():
+            buffer.add(grupo)
+        self.grupos = OrderedDict()
+        return buffer.vaciar()
 
 
 class EventLogger():
@@ -26,19 +283,58 @@ class EventLogger():
         """
         return self.__id_muestra
 
-    def __init__(self, id_muestra, codigo=''):
-        self.db = DBManager()
+    @property
+    def cerrado(self):
+        """
+        True si el log fue cerrado (ver close), un log cerrado no puede
+        registrar nuevos eventos.
+        """
+        return self.escritor.cerrado
+
+    def __init__(self, id_muestra, codigo='', sink=None, **kargs):
+        """
+        @type id_muestra : Integer
+        @param id_muestra: El id de la muestra simulada.
+
+        @type codigo : String
+        @param codigo: El código de la simulación.
+
+        @type sink : SinkPostgres
+        @param sink: El destino de los eventos, por defecto un sink
+            LOG_SINK por cada hilo escritor. Un sink explícito es
+            utilizado por un único hilo.
+
+        @keyword [hilos]: La cantidad de hilos escritores.
+        @keyword [cola]: La cantidad máxima de lotes en espera.
+        @keyword [lote]: La cantidad de registros por lote.
+        @keyword [nivel]: "individuos" registra cada individuo en cada día,
+            "resumen" registra la cantidad por día, colonia, estado y tipo
+            de zona. Por defecto LOG_NIVEL.
+        @keyword [traza]: En el nivel "resumen", los individuos que además
+            se registran individualmente: una fracción (cualquier número
+            entre 0 y 1) o un conjunto de ids. Por defecto LOG_TRAZA.
+        """
         self.__id_muestra = id_muestra
         self.__codigo = codigo
-        self.query = ""
+        self.buffer = BufferEventos()
+        self.tamanho_lote = kargs.get("lote", LOG_ESCRITOR["lote"])
+        self.nivel = kargs.get("nivel", LOG_NIVEL)
+        self.traza = kargs.get("traza", LOG_TRAZA)
+        self.resumen = ResumenDiario()
+        if sink is not None:
+            crear_sink, hilos = lambda i: sink, 1
+        else:
+            crear_sink = lambda i: get_sink(LOG_SINK, codigo, i)
+            hilos = kargs.get("hilos", LOG_ESCRITOR["hilos"])
+        self.crear_sink = crear_sink
+        self.escritor = EscritorEventos(
+            crear_sink, hilos, kargs.get("cola", LOG_ESCRITOR["cola"]))
 
     def add(self, kargs):
         aedes = kargs['aedes']
         dia = kargs['dia']
         periodo = kargs['periodo']
         args = {}
-        args['codigo'] = self.__codigo
-        args['id_muestra'] = self.id_muestra
         args['id_mosquito'] = aedes.id_mosquito
         args['id_colonia'] = aedes.id_colonia
         args['id_mosquito_padre'] = aedes.id_padre
@@ -57,7 +353,6 @@ class EventLogger():
         args['y'] = aedes.posicion.y
         # args['fecha'] =
         args['dia'] = periodo
-        target_method = None
         if aedes.estado == Estado.ADULTO:
             args['tipo_zona'] = aedes.tipo_zona
             args['ultima_oviposicion'] = aedes.ultima_oviposicion
@@ -71,137 +366,132 @@ class EventLogger():
             args['se_reproduce'] = aedes.se_reproduce(dia)
             args['ciclo_gonotrofico'] = aedes.ciclo_gonotrofico
             args['cantidad_huevos'] = kargs.get('huevos', 0)
-            target_method = self.persist_adulto
-        else:
-            target_method = self.persist
-        # se lanza un thread
-        self.query += target_method(args)
-
-    def persist_adulto(self, args):
-        """
-        """
-        # se definie el query de la consulta.
-        sql_string = """
-        INSERT INTO public.evolucion_log(
-            id_mosquito,
-            id_colonia,
-            id_mosquito_padre,
-            id_muestra,
-            codigo,
-            temperatura,
-            sexo,
-            expectativa_de_vida,
-            tiempo_de_vida,
-            tiempo_madurez,
-            madurez,
-            tipo_zona,
-            bs,
-            ultima_oviposicion,
-            ultimo_alimento,
-            distancia_recorrida,
-            cantidad_oviposicion,
-            cantidad_alimentacion,
-            is_inseminada,
-            se_alimenta,
-            se_reproduce,
-            ciclo_gonotrofico,
-            cantidad_huevos,
-            estado,
-            the_geom,
-            fecha,
-            dia,
-            generacion,
-            edad
-            ) VALUES (
-                {id_mosquito},
-                '{id_colonia}',
-                {id_mosquito_padre},
-                {id_muestra},
-                '{codigo}',
-                {temperatura},
-                '{sexo}',
-                {expectativa_de_vida},
-                {tiempo_de_vida},
-                {tiempo_madurez},
-                {madurez},
-                '{tipo_zona}',
-                {bs},
-                {ultima_oviposicion},
-                {ultimo_alimento},
-                {distancia_recorrida},
-                {cantidad_oviposicion},
-                {cantidad_alimentacion},
-                {is_inseminada},
-                {se_alimenta},
-                {se_reproduce},
-                {ciclo_gonotrofico},
-                {cantidad_huevos},
-                '{estado}',
-                ST_GeomFromText('POINT({x} {y})', 4326),
-                now(),
-                {dia},
-                {generacion},
-                {edad}
-            );
-        """
-        # se construye el diccionario que contiene los parametros del query.
-        return sql_string.format(**args)
-
-    def persist(self, args):
-        """
-        """
-        # se definie el query de la consulta.
-        sql_string = """
-        INSERT INTO public.evolucion_log(
-            id_mosquito,
-            id_colonia,
-            id_mosquito_padre,
-            id_muestra,
-            codigo,
-            temperatura,
-            sexo,
-            expectativa_de_vida,
-            tiempo_de_vida,
-            tiempo_madurez,
-            madurez,
-            tipo_zona,
-            bs,
-            estado,
-            the_geom,
-            fecha,
-            dia,
-            edad,
-            generacion
-        ) VALUES (
-            {id_mosquito},
-            '{id_colonia}',
-            {id_mosquito_padre},
-            {id_muestra},
-            '{codigo}',
-            {temperatura},
-            '{sexo}',
-            {expectativa_de_vida},
-            {tiempo_de_vida},
-            {tiempo_madurez},
-            {madurez},
-            '{tipo_zona}',
-            {bs},
-            '{estado}',
-            ST_GeomFromText('POINT({x} {y})', 4326),
-            now(),
-            {dia},
-            {edad},
-            {generacion}
-            );
-        """
-        # se construye el diccionario que contiene los parametros del query.
-        return sql_string.format(**args)
+        self.add_registro(args)
+
+    def add_registro(self, args):
+        """
+        Se encarga de añadir un registro ya construido al log. Es utilizado
+        por los motores que no representan a los individuos como objetos.
+
+        @type args : Dictionaries
+        @param args: Los campos del registro del individuo.
+        """
+        args['codigo'] = self.__codigo
+        args['id_muestra'] = self.id_muestra
+        if self.nivel == "resumen":
+            self.resumen.add(args)
+            if not self.trazar(args['id_mosquito']):
+                return
+        self.buffer.add(args)
+        if len(self.buffer) >= self.tamanho_lote:
+            self.save()
+
+    def add_columnas(self, columnas, cantidad):
+        """
+        Se encarga de añadir al log `cantidad` registros dados por columnas,
+        es utilizado por los motores vectoriales (ver
+        BufferEventos.extend).
+
+        @type columnas : Dictionaries
+        @param columnas: Los campos de los registros, cada campo es un
+            array de numpy o un valor común a todos los registros.
+        """
+        columnas['codigo'] = self.__codigo
+        columnas['id_muestra'] = self.id_muestra
+        if self.nivel == "resumen":
+            self.resumen.add_columnas(columnas, cantidad)
+            trazados = numpy.flatnonzero(
+                self.trazados(columnas['id_mosquito']))
+            columnas = seleccionar(columnas, trazados)
+            cantidad = len(trazados)
+        #~ los registros se dividen en lotes de tamanho_lote registros
+        inicio = 0
+        while inicio < cantidad:
+            fin = min(cantidad,
+                      inicio + self.tamanho_lote - len(self.buffer))
+            self.buffer.extend(seleccionar(columnas, slice(inicio, fin)),
+                               fin - inicio)
+            if len(self.buffer) >= self.tamanho_lote:
+                self.save()
+            inicio = fin
+
+    def add_cohorte(self, args):
+        """
+        Se encarga de añadir al log una cohorte del motor "cohortes". Las
+        cohortes no tienen individuos, por lo que se registran en la tabla
+        evolucion_resumen y el motor utiliza el nivel "resumen" (ver
+        simulador.get_log_nivel).
+
+        @type args : Dictionaries
+        @param args: Los campos del grupo (ver ResumenDiario.add_cohorte).
+        """
+        args['codigo'] = self.__codigo
+        args['id_muestra'] = self.id_muestra
+        self.resumen.add_cohorte(args)
+
+    def trazar(self, id_mosquito):
+        """
+        Retorna True si el individuo se registra individualmente en el
+        nivel "resumen". La fracción se aplica sobre un hash del id, por lo
+        que un individuo trazado se registra durante toda su vida.
+        """
+        if isinstance(self.traza, numbers.Real):
+            return (id_mosquito * 2654435761) % 4294967296 < \
+                self.traza * 4294967296
+        return id_mosquito in self.traza
+
+    def trazados(self, ids):
+        """
+        Versión vectorial de trazar, retorna una mascara con True para los
+        individuos trazados.
+        """
+        ids = numpy.asarray(ids).astype(numpy.uint64)
+        if isinstance(self.traza, numbers.Real):
+            return (ids * numpy.uint64(2654435761)) % \
+                numpy.uint64(4294967296) < self.traza * 4294967296
+        return numpy.in1d(ids, numpy.array(list(self.traza), dtype=numpy.uint64))
 
     def save(self):
-        sql_string = str(self.query)
-        self.query = ""
-        if len(sql_string) == 0:
+        """
+        Encola los registros acumulados para su escritura.
+        """
+        if len(self.resumen) > 0:
+            self.escritor.put("evolucion_resumen", self.resumen.vaciar())
+        if len(self.buffer) == 0:
             return
+        self.escritor.put(self.buffer.tabla, self.buffer.vaciar())
+
+    def flush(self):
+        """
+        Encola los registros acumulados y espera a que se escriban todos
+        los lotes.
+        """
+        self.save()
+        self.escritor.flush()
+
+    def close(self):
+        """
+        Escribe los registros pendientes y detiene los hilos escritores.
+        """
+        self.save()
+        self.escritor.close()
 
-        t = threading.Thread(target=self.db.query, args=(sql_string,))
-        t.start()
+    def descartar(self, dia):
+        """
+        Elimina de ambas tablas los registros de la simulación escritos
+        desde el día `dia`. Al reanudar una simulación desde un resguardo,
+        los días posteriores al resguardo se vuelven a registrar.
+
+        @type dia : Integer
+        @param dia: El número del primer día a descartar.
+        """
+        self.flush()
+        sink = self.crear_sink(0)
+        for tabla in ESQUEMAS:
+            sink.descartar(tabla, self.id_muestra, self.__codigo, dia)
+
+    def get_metricas(self):
+        """
+        Retorna las métricas de los hilos escritores.
+        """
+        return self.escritor.get_metricas()
@@ -13,11 +13,42 @@ import math
 import cmath
 import types
 
-from pyproj import Proj
+from pyproj import Proj, Geod
 import shapely.geometry
 from shapely.geometry import MultiPoint
 from shapely.geometry.polygon import Polygon
 
+#~ Proyección y elipsoide compartidos por todos los puntos y grillas, se
+#~ crean en el primer uso (construir un Proj es costoso).
+PROYECCION = None
+GEOD = None
+
+
+def get_proyeccion():
+    """
+    Retorna la proyección utilizada para convertir las coordenadas
+    geográficas a metros.
+
+    @rtype: Proj
+    """
+    global PROYECCION
+    if PROYECCION is None:
+        PROYECCION = Proj(proj='utm', zone=27, ellps='WGS84')
+    return PROYECCION
+
+
+def get_geod():
+    """
+    Retorna el elipsoide WGS84 utilizado para calcular distancias.
+
+    @rtype: Geod
+    """
+    global GEOD
+    if GEOD is None:
+        GEOD = Geod(ellps='WGS84')
+    return GEOD
+
+
 class Bounds:
 
     """
@@ -72,8 +103,12 @@ class Grid:
         self.x = x
         self.y = y
         self.z = z
-        self.proj = Proj(proj='utm',zone=27,ellps='WGS84')
         self.nodata_value =-9999
+
+    @property
+    def proj(self):
+        """La proyección compartida (ver get_proyeccion)"""
+        return get_proyeccion()
         
 
     def parse(self, data):
@@ -337,6 +372,82 @@ class Grid:
         return geojson.dumps(coll)
 
 
+class IndiceEspacial:
+
+    """
+    Índice espacial en memoria para puntos en coordenadas geográficas
+    (EPSG:4326). Los puntos se agrupan en celdas de `tamanho_celda` grados,
+    una consulta de radio solo evalua los puntos de las celdas que
+    intersectan el radio. La distancia se calcula sobre el elipsoide WGS84,
+    al igual que ST_DWithin sobre el tipo Geography.
+    """
+
+    def __init__(self, data, tamanho_celda=0.005):
+        """
+        @type data : Dictionaries
+        @param data: La lista de puntos, cada punto debe tener los campos
+            x (longitud) e y (latitud).
+
+        @type tamanho_celda : Float
+        @param tamanho_celda: El tamaño de la celda en grados.
+        """
+        self.data = list(data)
+        self.tamanho_celda = tamanho_celda
+        self.geod = get_geod()
+        self.x = numpy.array([p['x'] for p in self.data], dtype=float)
+        self.y = numpy.array([p['y'] for p in self.data], dtype=float)
+        celdas = {}
+        col = numpy.floor(self.x / tamanho_celda).astype(int)
+        row = numpy.floor(self.y / tamanho_celda).astype(int)
+        for i in range(len(self.data)):
+            celdas.setdefault((col[i], row[i]), []).append(i)
+        self.celdas = {}
+        for key in celdas:
+            self.celdas[key] = numpy.array(celdas[key], dtype=int)
+
+    def __len__(self):
+        return len(self.data)
+
+    def get_within(self, point, distance):
+        """
+        Se encarga de obtener la lista de todos los puntos que se encuentran
+        a una distancia menor o igual a `distance` metros del punto.
+
+        @param point : El punto de origen
+        @type  point : Point
+
+        @param distance : La distancia en metros
+        @type  distance : Float
+
+        @rtype  Dictionaries
+        @return La lista de puntos dentro del radio.
+        """
+        # se calcula el radio en grados, por exceso
+        delta_y = distance / 110574.0
+        latitud = min(abs(point.y) + delta_y, 89.0)
+        delta_x = distance / (111319.49 * math.cos(math.radians(latitud)))
+
+        t = self.tamanho_celda
+        candidatos = []
+        for i in range(int(math.floor((point.x - delta_x) / t)),
+                       int(math.floor((point.x + delta_x) / t)) + 1):
+            for j in range(int(math.floor((point.y - delta_y) / t)),
+                           int(math.floor((point.y + delta_y) / t)) + 1):
+                if (i, j) in self.celdas:
+                    candidatos.append(self.celdas[(i, j)])
+        if len(candidatos) == 0:
+            return []
+
+        candidatos = numpy.concatenate(candidatos)
+        origen_x = numpy.empty(len(candidatos))
+        origen_x.fill(point.x)
+        origen_y = numpy.empty(len(candidatos))
+        origen_y.fill(point.y)
+        _, _, dist = self.geod.inv(origen_x, origen_y,
+                                   self.x[candidatos], self.y[candidatos])
+        return [self.data[i] for i in candidatos[dist <= distance]]
+
+
 class Point:
 
     """
@@ -361,6 +472,11 @@ class Point:
     def y(self, value):
         self.__y = value
 
+    @property
+    def proj(self):
+        """La proyección compartida (ver get_proyeccion)"""
+        return get_proyeccion()
+
     def to_metter(self, delta):
         """
         Se encarga de traducir la diferencia de las distancias a metros
@@ -388,7 +504,6 @@ class Point:
     def __init__(self, args):
         self.__x = args.get('x', 0)
         self.__y = args.get('y', 0)
-        self.proj = Proj(proj='utm',zone=27,ellps='WGS84')
 
     def distance_to(self, point):
         """
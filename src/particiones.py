@@ -0,0 +1,362 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene la simulación en paralelo del motor "objetos". El área
+de estudio se divide en franjas verticales con la misma cantidad de
+individuos, cada franja se simula en un proceso. Las colonias solo
+interactúan por el vuelo de los adultos, por lo que al final de cada día
+los individuos que se encuentran fuera de su franja migran al proceso de
+la franja en la que se encuentran.
+
+Los procesos se crean con fork, por lo que cada proceso hereda la
+población inicial, el ranking de zonas y los coeficientes ya cargados.
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import bisect
+import multiprocessing
+import numpy
+from config import *
+from datatype import *
+from poblacion import Poblacion, ListaIndividuos
+from logger import EventLogger
+from log_sinks import get_sink
+
+
+def get_posicion(aedes):
+    """
+    Retorna la posición que determina la franja del individuo, la posición
+    actual.
+    """
+    return aedes.posicion
+
+
+def get_posicion_colonia(aedes):
+    """
+    Retorna la posición de la colonia a la que pertenece el individuo, la
+    de origen para los adultos.
+    """
+    if aedes.estado == Estado.ADULTO:
+        return aedes.posicion_origen
+    return aedes.posicion
+
+
+def get_x(key):
+    """
+    Retorna la coordenada x de la clave de una colonia (ver gen_key).
+    """
+    return float(key.split("_")[0])
+
+
+class Particion:
+
+    """
+    Divide el área de estudio en franjas verticales por la coordenada x.
+    """
+
+    def __init__(self, limites):
+        """
+        @type limites : List
+        @param limites: Las coordenadas x que separan las franjas, en orden
+            creciente. Hay len(limites) + 1 franjas.
+        """
+        self.limites = list(limites)
+
+    def __len__(self):
+        return len(self.limites) + 1
+
+    def get_franja(self, x):
+        """
+        Retorna el índice de la franja de la coordenada x.
+        """
+        return bisect.bisect_right(self.limites, x)
+
+    @staticmethod
+    def balancear(poblacion, cantidad):
+        """
+        Calcula `cantidad` franjas con aproximadamente la misma cantidad de
+        individuos de la población.
+
+        @type poblacion : Poblacion
+        @param poblacion: La población inicial.
+
+        @rtype Particion
+        """
+        xs = numpy.array([get_posicion(a).x for a in poblacion.individuos])
+        if len(xs) == 0:
+            return Particion([])
+        cuantiles = numpy.percentile(
+            xs, [100.0 * i / cantidad for i in range(1, cantidad)])
+        return Particion(sorted(set(float(x) for x in cuantiles)))
+
+
+def mover_colonia(origen, destino, aedes):
+    """
+    Traslada al individuo de su colonia en la población `origen` a la misma
+    colonia en la población `destino`, la colonia se crea en el destino si
+    no existe.
+    """
+    posicion = get_posicion_colonia(aedes)
+    if origen is not None:
+        grupo = origen.get(posicion)
+        if grupo is not None:
+            grupo[aedes.estado]["cantidad"] -= 1
+    if destino is not None:
+        destino.new_grupo(posicion=posicion, estado=aedes.estado, cantidad=1)
+
+
+def emigrar(poblacion, particion, indice):
+    """
+    Retira de la población a los individuos que se encuentran fuera de la
+    franja `indice`.
+
+    @rtype Dictionaries
+    @return Los individuos por franja de destino, sin la referencia a la
+        tabla de zonas.
+    """
+    emigrantes = {}
+    for aedes in poblacion.individuos:
+        franja = particion.get_franja(get_posicion(aedes).x)
+        if franja == indice:
+            continue
+        mover_colonia(poblacion, None, aedes)
+        poblacion.individuos.remove(aedes)
+        aedes._zonas = None
+        aedes._aleatorio = None
+        aedes._parametros = None
+        emigrantes.setdefault(franja, []).append(aedes)
+    poblacion.compactar()
+    return emigrantes
+
+
+def inmigrar(poblacion, inmigrantes):
+    """
+    Añade a la población los individuos provenientes de otras franjas.
+    """
+    for aedes in inmigrantes:
+        aedes._zonas = poblacion.zonas_table
+        aedes._aleatorio = poblacion.get_flujo(aedes.id_colonia)
+        aedes._parametros = poblacion.parametros
+        mover_colonia(None, poblacion, aedes)
+    poblacion.extend(inmigrantes)
+
+
+def recortar(poblacion, particion, indice):
+    """
+    Deja en la población únicamente las colonias e individuos de la franja
+    `indice`. Los adultos se asignan por su posición actual.
+    """
+    poblacion.memory = dict((k, v) for k, v in poblacion.memory.items()
+                            if particion.get_franja(get_x(k)) == indice)
+    individuos = [a for a in poblacion.individuos
+                  if particion.get_franja(get_posicion(a).x) == indice]
+    #~ los adultos fuera de la franja de su colonia se trasladan a ella
+    for aedes in individuos:
+        if poblacion.get(get_posicion_colonia(aedes)) is None:
+            mover_colonia(None, poblacion, aedes)
+    poblacion.individuos = ListaIndividuos(individuos)
+    if indice > 0:
+        poblacion.total_huevos = 0
+
+
+def desvincular(individuos):
+    """
+    Quita a los individuos las referencias a la tabla de zonas, al flujo
+    de números aleatorios y a los parametros antes de enviarlos a otro
+    proceso.
+    """
+    for aedes in individuos:
+        aedes._zonas = None
+        aedes._aleatorio = None
+        aedes._parametros = None
+
+
+def vincular(poblacion, individuos):
+    """
+    Asigna a los individuos recibidos de otro proceso la tabla de zonas, el
+    flujo de su colonia y los parametros de la población.
+    """
+    for aedes in individuos:
+        aedes._zonas = poblacion.zonas_table
+        aedes._aleatorio = poblacion.get_flujo(aedes.id_colonia)
+        aedes._parametros = poblacion.parametros
+
+
+def trabajar(conexion, simulador, particion, indice):
+    """
+    Simula la franja `indice` en un proceso hijo. El proceso recibe por la
+    conexión los mensajes ("dia", dia, dia_i, inmigrantes), ("estado",) y
+    ("fin",). Responde a cada día con los emigrantes del día, y al estado y
+    al fin con la población de la franja y el siguiente id.
+    """
+    poblacion = simulador.poblacion
+    recortar(poblacion, particion, indice)
+    #~ los ids se intercalan entre las franjas
+    Poblacion.ID += indice
+    Poblacion.PASO_ID = len(particion)
+    #~ las colonias creadas en el proceso utilizan flujos derivados del
+    #~ flujo de la partición, las colonias heredadas conservan su flujo.
+    poblacion.aleatorio = poblacion.aleatorio.sub_flujo("particion", indice)
+    #~ los hilos escritores del padre no existen en el proceso hijo
+    codigo = simulador.codigo or "log"
+    simulador.logger = EventLogger(
+        simulador.id_muestra, simulador.codigo,
+        sink=get_sink(LOG_SINK, codigo + "-p" + str(indice)),
+        nivel=simulador.logger.nivel, traza=simulador.logger.traza)
+
+    while True:
+        mensaje = conexion.recv()
+        if mensaje[0] == "dia":
+            dia, dia_i, inmigrantes = mensaje[1:]
+            inmigrar(poblacion, inmigrantes)
+            simulador.procesar_dia(dia, dia_i)
+            simulador.logger.save()
+            conexion.send((emigrar(poblacion, particion, indice),
+                           len(poblacion)))
+            continue
+        #~ el estado se envía con el log de los días simulados ya escrito,
+        #~ como lo requieren los resguardos
+        if mensaje[0] == "fin":
+            simulador.logger.close()
+        else:
+            simulador.logger.flush()
+        desvincular(poblacion.individuos)
+        conexion.send((poblacion.memory, list(poblacion.individuos),
+                       poblacion.total_huevos, Poblacion.ID))
+        if mensaje[0] == "fin":
+            break
+        vincular(poblacion, poblacion.individuos)
+    conexion.close()
+
+
+def unir_memoria(memoria, otra):
+    """
+    Suma los contadores de las colonias de `otra` en `memoria`.
+    """
+    for key, grupo in otra.items():
+        if not memoria.has_key(key):
+            memoria[key] = grupo
+            continue
+        for estado in grupo:
+            for campo in ["cantidad", "killed"]:
+                memoria[key][estado][campo] += grupo[estado][campo]
+
+
+class Franjas:
+
+    """
+    Los procesos que simulan las franjas de la población de un simulador.
+    El simulador envía cada día a las franjas con procesar_dia, y reúne el
+    estado de las franjas en su población con reunir, por ejemplo antes de
+    guardar un resguardo y al final de la simulación.
+    """
+
+    def __init__(self, simulador, cantidad):
+        """
+        Divide la población del simulador en `cantidad` franjas y crea un
+        proceso por franja.
+
+        @type simulador : Simulador
+        @param simulador: El simulador, con la población al final del último
+            día simulado.
+        """
+        self.poblacion = simulador.poblacion
+        self.particion = Particion.balancear(self.poblacion, cantidad)
+        self.procesos = []
+        self.conexiones = []
+        #~ los individuos que migran a cada franja al inicio del siguiente
+        #~ día
+        self.inmigrantes = []
+        #~ True cuando las franjas enviaron su población final
+        self.terminadas = False
+        try:
+            for indice in range(len(self.particion)):
+                padre, hijo = multiprocessing.Pipe()
+                proceso = multiprocessing.Process(
+                    target=trabajar,
+                    args=(hijo, simulador, self.particion, indice))
+                proceso.daemon = True
+                proceso.start()
+                hijo.close()
+                self.procesos.append(proceso)
+                self.conexiones.append(padre)
+                self.inmigrantes.append([])
+        except:
+            self.cerrar()
+            raise
+
+    def procesar_dia(self, dia, dia_i):
+        """
+        Simula el día en todas las franjas y distribuye los individuos que
+        salieron de su franja.
+        """
+        for indice, conexion in enumerate(self.conexiones):
+            desvincular(self.inmigrantes[indice])
+            conexion.send(("dia", dia, dia_i, self.inmigrantes[indice]))
+        self.inmigrantes = [[] for c in self.conexiones]
+        total = 0
+        for conexion in self.conexiones:
+            emigrantes, cantidad_franja = conexion.recv()
+            total += cantidad_franja
+            for franja, individuos in emigrantes.items():
+                self.inmigrantes[franja].extend(individuos)
+        print "=" * 5 + "Día Nro :" + str(dia_i) + " Temp : " + \
+            str(dia.temperatura) + " poblacion :" + str(total) + \
+            " migrantes :" + str(sum(len(i) for i in self.inmigrantes)) + \
+            "=" * 5
+
+    def reunir(self, fin=False):
+        """
+        Reúne en la población del simulador las colonias e individuos de
+        todas las franjas, los migrantes pendientes se cuentan en sus
+        colonias. El contador de ids continúa a partir del mayor id
+        utilizado por las franjas.
+
+        @type fin : Boolean
+        @param fin: True para terminar además los procesos de las franjas.
+        """
+        memoria = {}
+        individuos = []
+        total_huevos = 0
+        siguiente_id = Poblacion.ID
+        for conexion in self.conexiones:
+            conexion.send(("fin",) if fin else ("estado",))
+        for conexion in self.conexiones:
+            memoria_franja, individuos_franja, huevos, id_franja = \
+                conexion.recv()
+            unir_memoria(memoria, memoria_franja)
+            individuos.extend(individuos_franja)
+            total_huevos += huevos
+            siguiente_id = max(siguiente_id, id_franja)
+
+        poblacion = self.poblacion
+        migrantes = [a for franja in self.inmigrantes for a in franja]
+        individuos.extend(migrantes)
+        vincular(poblacion, individuos)
+        poblacion.memory = memoria
+        #~ los migrantes se cuentan en sus colonias
+        for aedes in migrantes:
+            mover_colonia(None, poblacion, aedes)
+        poblacion.individuos = ListaIndividuos(individuos)
+        poblacion.total_huevos = total_huevos
+        #~ los ids de las franjas se intercalan desde el id del padre, el
+        #~ mayor de los siguientes ids no fue utilizado por ninguna franja
+        Poblacion.ID = siguiente_id
+        if fin:
+            self.inmigrantes = [[] for c in self.conexiones]
+            self.terminadas = True
+            self.cerrar()
+
+    def cerrar(self):
+        """
+        Termina los procesos de las franjas, los procesos de una simulación
+        interrumpida se terminan sin esperar al fin.
+        """
+        for proceso in self.procesos:
+            if self.terminadas:
+                proceso.join(1)
+            if proceso.is_alive():
+                proceso.terminate()
+            proceso.join()
+        self.procesos = []
@@ -14,6 +14,93 @@ from huevo import *
 from larva import *
 from pupa import *
 from adulto import *
+from aaegypti_compacto import CLASES, CLASES_COMPACTAS
+
+
+def muestrear(cantidad, total, aleatorio=FLUJO):
+    """
+    Retorna `total` números distintos entre 1 y `cantidad`, elegidos al
+    azar sin reemplazo. Se utiliza el algoritmo de Floyd, que realiza
+    exactamente `total` sorteos sin importar la proporción de elegidos.
+
+    @type cantidad : Integer
+    @param cantidad: El tamaño de la población.
+
+    @type total : Integer
+    @param total: La cantidad de elementos a elegir.
+
+    @type aleatorio : FlujoAleatorio
+    @param aleatorio: El flujo de números aleatorios a utilizar.
+
+    @rtype Set
+    """
+    elegidos = set()
+    for j in xrange(cantidad - total + 1, cantidad + 1):
+        t = aleatorio.randint(1, j)
+        if t in elegidos:
+            elegidos.add(j)
+        else:
+            elegidos.add(t)
+    return elegidos
+
+
+class ListaIndividuos:
+
+    """
+    Contenedor de los individuos de la población. La eliminación de un
+    individuo es O(1), el individuo se marca como removido (tombstone) y
+    permanece en su posición hasta que se compacta el contenedor. Esto
+    permite eliminar individuos mientras se recorre la población sin
+    saltear elementos.
+    """
+
+    def __init__(self, individuos=[]):
+        self.__items = list(individuos)
+        self.__removidos = set()
+
+    def append(self, aedes):
+        self.__items.append(aedes)
+
+    def extend(self, individuos):
+        self.__items.extend(individuos)
+
+    def remove(self, aedes):
+        """
+        Marca al individuo como removido, se elimina al compactar.
+        """
+        self.__removidos.add(id(aedes))
+
+    def compactar(self):
+        """
+        Elimina a los individuos removidos, se debe invocar una única vez
+        al final de cada día.
+        """
+        if len(self.__removidos) == 0:
+            return
+        removidos = self.__removidos
+        self.__items = [aedes for aedes in self.__items
+                        if id(aedes) not in removidos]
+        self.__removidos = set()
+
+    def __len__(self):
+        return len(self.__items) - len(self.__removidos)
+
+    def __iter__(self):
+        """
+        Recorre los individuos no removidos, los individuos añadidos
+        durante el recorrido no son incluidos.
+        """
+        items = self.__items
+        removidos = self.__removidos
+        for i in xrange(len(items)):
+            if id(items[i]) not in removidos:
+                yield items[i]
+
+    def __getitem__(self, index):
+        return self.__items[index]
+
+    def __setitem__(self, index, aedes):
+        self.__items[index] = aedes
 
 
 class Poblacion:
@@ -22,6 +109,9 @@ class Poblacion:
     Clase que define el comportamiento goblal de la población.
     """
     ID = 1
+    #~ incremento entre ids consecutivos, las particiones de una simulación
+    #~ en paralelo intercalan sus ids (ver particiones).
+    PASO_ID = 1
 
     @property
     def memory(self):
@@ -57,15 +147,37 @@ class Poblacion:
 
         @keyword poblacion: La población inicial.
         @keyword periodo: El periodo de simulación.
+        @keyword [raster_zonas]: El raster precalculado del bs de las zonas.
+        @keyword [compacto]: True para utilizar las variantes compactas de
+            los individuos, por defecto INDIVIDUOS_COMPACTOS.
+        @keyword [aleatorio]: El flujo de números aleatorios de la población,
+            cada colonia utiliza un sub flujo.
+        @keyword [semilla]: La semilla del flujo, si no se especifica el
+            flujo.
+        @keyword [parametros]: Los parametros del modelo, por defecto los de
+            config (ver get_parametros).
         """
         self.__memory = {}
-        self.__individuos = []
+        self.parametros = get_parametros(args.get("parametros"))
+        self.aleatorio = args.get("aleatorio", None)
+        if self.aleatorio is None:
+            self.aleatorio = FlujoAleatorio(args.get("semilla", None))
+        self.flujos = {}
+        if args.get("compacto", INDIVIDUOS_COMPACTOS) == True:
+            self.clases = CLASES_COMPACTAS
+        else:
+            self.clases = CLASES
+        self.__individuos = ListaIndividuos()
         self.zonas_table = RankingTable()
         self.zonas_table.poblacion = self
+        self.zonas_table.raster = args.get("raster_zonas", None)
         self.__total_huevos = 0
         if args.has_key("poblacion") == True:
             self.generar_poblacion(args["poblacion"])
 
+    def __len__(self):
+        return len(self.individuos)
+
     def gen_sub_poblacion(self, **kargs):
         """
         Se encarga de generar un sub array de individuos a partir de los parametros
@@ -80,7 +192,7 @@ class Poblacion:
         if kargs.has_key('clazz') == True:
             state = Estado.LARVA
         # se determina el tipo de individuo a instanciar
-        clazz = kargs.get('clazz', Huevo)
+        clazz = kargs.get('clazz', self.clases[Estado.HUEVO])
         posicion = kargs.get('posicion', Point(kargs))
         id_colonia = self.gen_key(posicion)
         sub_poblacion = []
@@ -88,13 +200,15 @@ class Poblacion:
         colonia = self.new_grupo(
             posicion=posicion, cantidad=cantidad_larvas, estado=state)
 
+        aleatorio = self.get_flujo(id_colonia)
         for cantidad in range(cantidad_larvas):
             indv = clazz(posicion=posicion, zonas=self.zonas_table,
                          madurez=madurez, id_padre=id_padre, id_colonia=id_colonia,
-                         generacion=generacion)
+                         generacion=generacion, aleatorio=aleatorio,
+                         parametros=self.parametros)
             # id del mosquito
             indv._id_mosquito = Poblacion.ID
-            Poblacion.ID += 1
+            Poblacion.ID += Poblacion.PASO_ID
             #~ se añade el individuo a la sub población
             sub_poblacion.append(indv)
 
@@ -115,23 +229,19 @@ class Poblacion:
                 cantidad_larvas=cantidad_larvas,
                 #madurez=randint(0, 90)
                 # madurez=90,
-                clazz=Larva,
+                clazz=self.clases[Estado.LARVA],
                 x=grid.x[i], y=grid.y[i])
             self.individuos.extend(sub_poblacion)
 
     def cambiar_estado(self, aedes):
         """
         Se encarga de realizar el cambio de estado para el individuo de
-        acuerdo a su estado actual.
+        acuerdo a su estado actual. El cambio se realiza sobre el mismo
+        individuo, la clase del individuo pasa a ser la del nuevo estado.
         """
 
         grupo = self.get(aedes.posicion)
 
-        clazz = {
-            "HUEVO": Larva,
-            "LARVA": Pupa,
-            "PUPA": Adulto
-        }
         # diccionario que determina el siguiente estado para el estado actual.
         next_state = {
             "HUEVO": Estado.LARVA,
@@ -143,10 +253,10 @@ class Poblacion:
         grupo[aedes.estado]["cantidad_ant"] -= 1
         grupo[next_state[aedes.estado]]["cantidad"] += 1
 
-        return clazz[aedes.estado](sexo=aedes.sexo, posicion=aedes.posicion,
-                                   zonas=self.zonas_table, id=aedes.id_mosquito,
-                                   id_padre=aedes.id_padre, id_colonia=aedes.id_colonia,
-                                   generacion=aedes.generacion)
+        estado = next_state[aedes.estado]
+        aedes.__class__ = self.clases[estado]
+        aedes.mudar(estado)
+        return aedes
 
     def gen_key(self, punto):
         """
@@ -155,6 +265,19 @@ class Poblacion:
         """
         return str(punto.x) + "_" + str(punto.y)
 
+    def get_flujo(self, id_colonia):
+        """
+        Retorna el flujo de números aleatorios de la colonia, el flujo se
+        deriva del flujo de la población y del id de la colonia.
+
+        @rtype FlujoAleatorio
+        """
+        flujo = self.flujos.get(id_colonia)
+        if flujo is None:
+            flujo = self.aleatorio.sub_flujo("colonia", id_colonia)
+            self.flujos[id_colonia] = flujo
+        return flujo
+
     def new_grupo(self, **kargs):
         """
         Este método se encarga de inicializar un nodo para la tabla de memoria
@@ -182,6 +305,8 @@ class Poblacion:
             grupo[estado]["periodo"] = -1
             grupo[estado]["dia"] = -1
             grupo[estado]["killed"] = 0
+            grupo[estado]["index"] = 0
+            grupo[estado]["candidatos"] = set()
 
         grupo[state]["cantidad"] = cantidad
         self.memory[key] = grupo
@@ -204,11 +329,7 @@ class Poblacion:
         Se encarga de eliminar un idividuo de la población y actualizar la
         información de la población.
         """
-        if aedes.estado == Estado.ADULTO:
-            grupo = self.get(aedes.posicion_origen)
-        else:
-            grupo = self.get(aedes.posicion)
-
+        grupo = self.get_grupo(aedes)
         if grupo != None:
             grupo[aedes.estado]["cantidad"] -= 1
             grupo[aedes.estado]["to_kill"] -= 1
@@ -218,22 +339,41 @@ class Poblacion:
 
         self.individuos.remove(aedes)
 
-    def regular(self, aedes, dia, periodo):
+    def get_grupo(self, aedes):
         """
-        Se encarga de realizar las validaciones para realizar la reducción de
-        la población.
+        Retorna el grupo de la colonia del individuo, la de origen para los
+        adultos.
         """
         if aedes.estado == Estado.ADULTO:
-            grupo = self.get(aedes.posicion_origen)
-        else:
-            grupo = self.get(aedes.posicion)
-
-        grupo_estado = grupo[aedes.estado]
-        if grupo_estado["periodo"] < periodo:
+            return self.get(aedes.posicion_origen)
+        return self.get(aedes.posicion)
+
+    def sortear_candidatos(self, dia, periodo):
+        """
+        Se encarga de calcular, al inicio del día, la mortalidad de cada
+        colonia y estado y de sortear de una vez los candidatos a eliminar
+        de todos los grupos. La mortalidad de cada grupo se calcula con su
+        primer individuo en el orden del recorrido, y los candidatos con el
+        flujo de la colonia.
+        """
+        representantes = {}
+        orden = []
+        for aedes in self.individuos:
+            clave = (aedes.id_colonia, aedes.estado)
+            if clave not in representantes:
+                representantes[clave] = aedes
+                orden.append(clave)
+
+        grupos = []
+        for clave in orden:
+            aedes = representantes[clave]
+            grupo = self.get_grupo(aedes)
+            grupo_estado = grupo[aedes.estado]
+            if grupo_estado["periodo"] >= periodo:
+                continue
             # se actualiza el periodo
             grupo_estado["periodo"] = periodo
-            # se calcula la mortalidad del individuo
-            # print str(grupo_estado)
+            # se calcula la mortalidad del grupo
             mortalidad = aedes.mortalidad(dia.temperatura, grupo)
             """
             se actualiza la canitdad de inviduos que deben desaparecer
@@ -244,10 +384,21 @@ class Poblacion:
                 delta = mortalidad - round(mortalidad)
 
             grupo_estado["to_kill"] += round(mortalidad) + delta
+            grupos.append((grupo_estado, aedes.aleatorio))
 
-            self.gen_candidatos(grupo_estado)
-        else:
-            grupo_estado["index"] += 1
+        #~ los candidatos se sortean después de calcular la mortalidad de
+        #~ todos los grupos
+        for grupo_estado, aleatorio in grupos:
+            self.gen_candidatos(grupo_estado, aleatorio)
+
+    def regular(self, aedes, dia, periodo):
+        """
+        Se encarga de realizar las validaciones para realizar la reducción de
+        la población. Los candidatos del día se sortean antes de recorrer la
+        población (ver sortear_candidatos).
+        """
+        grupo_estado = self.get_grupo(aedes)[aedes.estado]
+        grupo_estado["index"] += 1
 
         # se verifica si el elemento actual es un candidato a eliminar
         is_candidato = False
@@ -300,24 +451,23 @@ class Poblacion:
         aedes._expectativa_vida = -1
         self.individuos.remove(aedes)
 
-    def gen_candidatos(self, colonia):
+    def gen_candidatos(self, colonia, aleatorio=FLUJO):
         """
-        Se encarga de generar una lista aleatoria de candidatos de la
-        población a ser eliminados.
+        Se encarga de generar un conjunto aleatorio de candidatos de la
+        población a ser eliminados. Los candidatos son las posiciones (de 1
+        a cantidad) en las que son recorridos los individuos del grupo, el
+        índice se incrementa en cada recorrido (ver regular).
+
+        @type aleatorio : FlujoAleatorio
+        @param aleatorio: El flujo de la colonia.
         """
         total = int(colonia["to_kill"])
         if total > colonia["cantidad"]:
             total = colonia["cantidad"]
-        candidatos = []
-        for index in range(total):
-            candidato = randint(1, colonia["cantidad"])
-            while candidato in candidatos:
-                candidato = randint(1, colonia["cantidad"])
-            # se añaden los candidatos
-            candidatos.append(candidato)
 
-        colonia["candidatos"] = candidatos
-        colonia["index"] = 1
+        colonia["candidatos"] = muestrear(colonia["cantidad"], total,
+                                          aleatorio)
+        colonia["index"] = 0
 
     def ovipostura(self, adulto, dia):
         """
@@ -337,6 +487,13 @@ class Poblacion:
         """
         self.individuos.extend(nueva_poblacion)
 
+    def compactar(self):
+        """
+        Se encarga de eliminar definitivamente a los individuos muertos
+        durante el día.
+        """
+        self.individuos.compactar()
+
     def get_resumen(self):
         """
         Se encarga de generar un resumen de la poblacion
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene el motor "cohortes", un modo aproximado y rápido del
+motor vectorial. Los huevos, larvas y pupas no se representan como
+individuos, cada colonia mantiene cohortes de inmaduros: grupos de
+individuos del mismo estado, generación y clase de madurez representados
+únicamente por su cantidad. Los individuos se generan recién cuando las
+pupas emergen como adultos, a partir de ahí se simulan con las reglas del
+motor vectorial.
+
+La mortalidad de los inmaduros ya se calcula sobre la cantidad de cada
+colonia (ver Huevo.mortalidad, Larva.mortalidad y Pupa.mortalidad), los
+int(to_kill) muertos de cada colonia y estado se reparten al azar entre
+sus cohortes.
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import numpy
+# Se impotan los modulos.
+from poblacion_vectorial import *
+
+"""
+Columnas de las cohortes, cada columna se define como (nombre, tipo).
+"""
+COLUMNAS_COHORTE = [
+    ("colonia", numpy.int32),
+    ("estado", numpy.int8),
+    ("generacion", numpy.int32),
+    ("madurez", numpy.float64),
+    ("edad", numpy.float64),
+    ("tiempo_madurez", numpy.float64),
+    ("cantidad", numpy.int64),
+    ("muertos", numpy.int64),
+]
+
+
+class PoblacionCohortes(PoblacionVectorial):
+
+    """
+    Población en la que los inmaduros se agrupan en cohortes por colonia y
+    los adultos se representan como las filas de PoblacionVectorial.
+    """
+
+    def __init__(self, args):
+        """
+        Constructor de la clase
+        @param args: Parametros de inicialización de la clase
+
+        @keyword poblacion: La población inicial.
+        @keyword [semilla]: La semilla del generador de números aleatorios.
+        @keyword [clase_madurez]: El ancho de las clases de madurez en las
+            que se agrupan las cohortes, por defecto
+            COHORTES["clase_madurez"].
+        """
+        self.clase_madurez = args.get("clase_madurez",
+                                      COHORTES["clase_madurez"])
+        self.cohortes = {}
+        for nombre, tipo in COLUMNAS_COHORTE:
+            self.cohortes[nombre] = numpy.zeros(0, dtype=tipo)
+        PoblacionVectorial.__init__(self, args)
+
+    def __len__(self):
+        return int(self.cantidad.sum())
+
+    def generar_poblacion(self, data):
+        """
+        Este método se encarga de procesar los datos de las muestras y
+        generar las cohortes de larvas que inicializan la población.
+        """
+        grid = Grid()
+        grid.parse(data)
+        colonias = numpy.array(
+            [self.get_colonia(float(grid.x[i]), float(grid.y[i]))
+             for i in range(len(grid))], dtype=numpy.int32)
+        self.gen_cohortes(colonias, LARVA, grid.z.astype(int))
+
+    def gen_cohortes(self, colonias, estado, cantidad, generacion=0):
+        """
+        Añade una cohorte por cada colonia con la cantidad de individuos
+        correspondiente.
+
+        @type colonias : ndarray
+        @param colonias: Los índices de las colonias.
+
+        @type estado : Integer
+        @param estado: El código del estado de las cohortes.
+
+        @type cantidad : ndarray
+        @param cantidad: La cantidad de individuos de cada cohorte.
+
+        @type generacion : ndarray
+        @param generacion: La generación de cada cohorte.
+        """
+        cantidad = numpy.asarray(cantidad, dtype=numpy.int64)
+        numpy.add.at(self.cantidad, (colonias, estado), cantidad)
+        nuevas = {
+            "colonia": colonias,
+            "estado": numpy.repeat(estado, len(colonias)),
+            "generacion": numpy.zeros(len(colonias)) + generacion,
+            "cantidad": cantidad
+        }
+        for nombre, tipo in COLUMNAS_COHORTE:
+            valor = nuevas.get(nombre, numpy.zeros(len(colonias)))
+            self.cohortes[nombre] = numpy.concatenate(
+                (self.cohortes[nombre], numpy.asarray(valor).astype(tipo)))
+
+    def agrupar(self):
+        """
+        Une las cohortes de la misma colonia, estado, generación y clase de
+        madurez, la madurez y la edad de la cohorte resultante son los
+        promedios ponderados por la cantidad. Se descartan las cohortes
+        vacías.
+        """
+        k = self.cohortes
+        vivas = k["cantidad"] > 0
+        for nombre in k:
+            k[nombre] = k[nombre][vivas]
+        clase = numpy.floor(k["madurez"] / self.clase_madurez)
+        orden = numpy.lexsort((clase, k["generacion"], k["estado"],
+                               k["colonia"]))
+        claves = numpy.vstack((k["colonia"], k["estado"], k["generacion"],
+                               clase))[:, orden]
+        inicio = numpy.ones(len(orden), dtype=bool)
+        inicio[1:] = (claves[:, 1:] != claves[:, :-1]).any(axis=0)
+        grupo = numpy.cumsum(inicio) - 1
+        if inicio.all():
+            return
+
+        cantidad = numpy.bincount(grupo, k["cantidad"][orden])
+        agrupadas = {}
+        for nombre in ["madurez", "edad"]:
+            agrupadas[nombre] = numpy.bincount(
+                grupo, k[nombre][orden] * k["cantidad"][orden]) / cantidad
+        agrupadas["cantidad"] = cantidad
+        agrupadas["muertos"] = numpy.bincount(grupo, k["muertos"][orden])
+        for nombre, tipo in COLUMNAS_COHORTE:
+            if nombre in agrupadas:
+                k[nombre] = agrupadas[nombre].astype(tipo)
+            else:
+                k[nombre] = k[nombre][orden][inicio]
+
+    def desarrollar(self, dia):
+        """
+        Incrementa la madurez de las cohortes de acuerdo a la tasa de
+        desarrollo del estado, y desarrolla a los adultos como en
+        PoblacionVectorial.
+        """
+        k = self.cohortes
+        for estado in [HUEVO, LARVA, PUPA]:
+            indices = numpy.flatnonzero(k["estado"] == estado)
+            if len(indices) == 0:
+                continue
+            cantidad_dias = 1 / self.get_tasa(ESTADOS[estado], dia.temperatura)
+            k["tiempo_madurez"][indices] = cantidad_dias
+            if cantidad_dias > 0:
+                k["madurez"][indices] += 100 / cantidad_dias
+        k["edad"] += 1
+        PoblacionVectorial.desarrollar(self, dia)
+
+    def eliminar(self):
+        """
+        Reparte los int(to_kill) muertos de cada colonia y estado inmaduro
+        entre sus cohortes, siguiendo una distribución hipergeométrica
+        multivariada, y elimina a los adultos como en PoblacionVectorial.
+
+        @rtype ndarray
+        @return Mascara con True para los adultos eliminados.
+        """
+        k = self.cohortes
+        k["muertos"] = numpy.zeros(len(k["cantidad"]), dtype=numpy.int64)
+        grupo = k["colonia"].astype(numpy.int64) * len(ESTADOS) + k["estado"]
+        to_kill = numpy.minimum(self.to_kill.astype(numpy.int64),
+                                self.cantidad).ravel()
+        restantes = numpy.bincount(grupo, k["cantidad"],
+                                   minlength=self.cantidad.size)
+        restantes = restantes.astype(numpy.int64)
+        pendientes = to_kill.copy()
+        pendientes[ADULTO::len(ESTADOS)] = 0
+
+        # se recorren las cohortes de cada grupo en orden
+        orden = numpy.argsort(grupo, kind="mergesort")
+        grupo_ordenado = grupo[orden]
+        posicion = numpy.arange(len(orden)) - \
+            numpy.searchsorted(grupo_ordenado, grupo_ordenado)
+        for p in range(posicion.max() + 1 if len(orden) > 0 else 0):
+            cohortes = orden[posicion == p]
+            grupos = grupo[cohortes]
+            cantidad = k["cantidad"][cohortes]
+            muertos = numpy.zeros(len(cohortes), dtype=numpy.int64)
+            sortear = pendientes[grupos] > 0
+            if sortear.any():
+                muertos[sortear] = self.random.hypergeometric(
+                    cantidad[sortear],
+                    restantes[grupos[sortear]] - cantidad[sortear],
+                    pendientes[grupos[sortear]])
+            k["muertos"][cohortes] = muertos
+            restantes[grupos] -= cantidad
+            pendientes[grupos] -= muertos
+
+        k["cantidad"] -= k["muertos"]
+        total = numpy.bincount(grupo, k["muertos"],
+                               minlength=self.cantidad.size)
+        total = total.astype(numpy.int64).reshape(self.cantidad.shape)
+        self.cantidad -= total
+        self.to_kill -= total
+        self.killed += total
+        return PoblacionVectorial.eliminar(self)
+
+    def madurar(self):
+        """
+        Realiza el cambio de estado de las cohortes maduras. Las pupas
+        maduras emergen como adultos, que se añaden a la población como
+        individuos.
+        """
+        k = self.cohortes
+        maduras = numpy.flatnonzero((k["madurez"] >= 100) & (k["cantidad"] > 0))
+        estado = k["estado"][maduras]
+        numpy.add.at(self.cantidad, (k["colonia"][maduras], estado),
+                     -k["cantidad"][maduras])
+        inmaduras = maduras[estado + 1 < ADULTO]
+        numpy.add.at(self.cantidad,
+                     (k["colonia"][inmaduras], k["estado"][inmaduras] + 1),
+                     k["cantidad"][inmaduras])
+        k["estado"][inmaduras] += 1
+        for nombre in ["madurez", "edad", "tiempo_madurez"]:
+            k[nombre][inmaduras] = 0
+
+        # se generan los adultos
+        pupas = maduras[estado + 1 == ADULTO]
+        colonias = k["colonia"][pupas]
+        adultos = self.gen_sub_poblacion(
+            cantidad_larvas=k["cantidad"][pupas], estado=ADULTO,
+            x=self.colonias_x[colonias], y=self.colonias_y[colonias],
+            generacion=k["generacion"][pupas])
+        adultos["x_origen"] = adultos["x"].copy()
+        adultos["y_origen"] = adultos["y"].copy()
+        k["cantidad"][pupas] = 0
+
+        inicio = len(self.columnas["id"])
+        self.extend(adultos)
+        self.calcular_cantidad_alimentacion(
+            numpy.arange(inicio, len(self.columnas["id"])))
+
+    def procesar_dia(self, dia, periodo, logger=None):
+        """
+        Se encarga de simular un día completo para toda la población.
+
+        @type dia : Dia
+        @param dia: el objeto que contiene los datos climatologicos para
+            un dia.
+
+        @type periodo : Integer
+        @param periodo: El número de día de la simulación.
+
+        @type logger : EventLogger
+        @param logger: El log de eventos, None para no registrar eventos.
+        """
+        c = self.columnas
+        if len(self) == 0:
+            return
+
+        self.desarrollar(dia)
+        #~ Se verifica el estado de las cohortes y los adultos
+        muertos = self.regular(dia.temperatura)
+
+        ponen = numpy.flatnonzero(
+            ~muertos & (c["sexo"] == HEMBRA) & c["is_inseminada"] &
+            c["se_alimenta"])
+        if dia.temperatura >= 15:
+            huevos = self.ovipostura(ponen, dia)
+        else:
+            huevos = numpy.zeros(len(c["id"]), dtype=numpy.int64)
+
+        if logger is not None:
+            self.registrar(logger, dia, periodo, huevos)
+
+        madres = numpy.flatnonzero(huevos > 0)
+        self.reset(madres)
+        #~ los huevos forman una cohorte en la colonia en la que se
+        #~ encuentra la madre
+        colonias = numpy.array(
+            [self.get_colonia(float(c["x"][i]), float(c["y"][i]))
+             for i in madres], dtype=numpy.int32)
+        generacion = c["generacion"][madres] + 1
+        self.total_huevos += int(huevos.sum())
+        self.compactar(~muertos)
+        self.madurar()
+        self.gen_cohortes(colonias, HUEVO, huevos[madres], generacion)
+        self.agrupar()
+
+    def registrar(self, logger, dia, periodo, huevos):
+        """
+        Se encarga de añadir al log los adultos, como en PoblacionVectorial,
+        y la cantidad de inmaduros de cada colonia y estado.
+        """
+        PoblacionVectorial.registrar(self, logger, dia, periodo, huevos)
+        k = self.cohortes
+        grupo = k["colonia"].astype(numpy.int64) * len(ESTADOS) + k["estado"]
+        muertos = numpy.bincount(grupo, k["muertos"],
+                                 minlength=self.cantidad.size)
+        cantidad = numpy.bincount(grupo, k["cantidad"],
+                                  minlength=self.cantidad.size) + muertos
+        grupos = numpy.flatnonzero(cantidad)
+        colonias, estados = numpy.divmod(grupos, len(ESTADOS))
+        #~ el tipo de zona se calcula una única vez para todas las colonias
+        tipos_zona = NOMBRES_ZONA[get_cod_zona(self.get_bs_colonias(colonias))]
+        for g, colonia, estado, tipo_zona in zip(grupos, colonias, estados,
+                                                 tipos_zona):
+            args = {}
+            args['id_colonia'] = self.colonias_clave[colonia]
+            args['estado'] = ESTADOS[estado]
+            args['tipo_zona'] = tipo_zona
+            args['temperatura'] = dia.temperatura
+            args['dia'] = periodo
+            args['cantidad'] = int(cantidad[g])
+            args['muertos'] = int(muertos[g])
+            logger.add_cohorte(args)
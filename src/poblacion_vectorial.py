@@ -0,0 +1,744 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene la representación vectorial de la población. Los
+individuos no se representan como objetos, cada atributo del individuo es
+una columna (array de numpy) y el individuo es la fila de dichas columnas.
+
+El desarrollo, la mortalidad y los cambios de estado se aplican sobre
+todas las columnas a la vez, reproduciendo las reglas definidas en las
+clases Huevo, Larva, Pupa y Adulto.
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import numpy
+# Se impotan los modulos.
+from poblacion import *
+
+#~ Códigos numéricos de los estados, el orden coincide con el ciclo de vida.
+HUEVO, LARVA, PUPA, ADULTO = 0, 1, 2, 3
+ESTADOS = [Estado.HUEVO, Estado.LARVA, Estado.PUPA, Estado.ADULTO]
+
+#~ Códigos numéricos del sexo
+MACHO, HEMBRA = 0, 1
+SEXOS = [Sexo.MACHO, Sexo.HEMBRA]
+
+#~ Códigos numéricos del tipo de zona (ver ranking_table.ZONAS)
+PESIMA, MALA = COD_ZONA[Zonas.PESIMA], COD_ZONA[Zonas.MALA]
+
+#~ Nombres de los códigos utilizados en el log, indexados por el código. El
+#~ código -1 del tipo de zona (sin rankear) corresponde al último, None.
+NOMBRES_ESTADO = numpy.array(ESTADOS, dtype=object)
+NOMBRES_SEXO = numpy.array(SEXOS, dtype=object)
+NOMBRES_ZONA = numpy.array(ZONAS + [None], dtype=object)
+
+"""
+Tablas de las colonias, cada tabla se define como (nombre, forma de la
+fila, tipo, valor inicial). El bs de una colonia se calcula en el primer
+acceso.
+"""
+TABLAS_COLONIAS = [
+    ("colonias_x", (), numpy.float64, 0),
+    ("colonias_y", (), numpy.float64, 0),
+    ("colonias_bs", (), numpy.float64, numpy.nan),
+    ("cantidad", (len(ESTADOS),), numpy.int64, 0),
+    ("killed", (len(ESTADOS),), numpy.int64, 0),
+    ("to_kill", (len(ESTADOS),), numpy.float64, 0),
+]
+#~ Capacidad inicial de las tablas de las colonias
+CAPACIDAD_COLONIAS = 64
+
+"""
+Columnas de la población, cada columna se define como (nombre, tipo,
+valor por defecto).
+"""
+COLUMNAS = [
+    ("id", numpy.int64, 0),
+    ("id_padre", numpy.int64, 0),
+    ("generacion", numpy.int32, 0),
+    ("colonia", numpy.int32, 0),
+    ("estado", numpy.int8, HUEVO),
+    ("sexo", numpy.int8, MACHO),
+    ("madurez", numpy.float64, 0),
+    ("edad", numpy.int32, 0),
+    ("expectativa_vida", numpy.float64, 100),
+    ("tiempo_madurez", numpy.float64, 0),
+    ("x", numpy.float64, 0),
+    ("y", numpy.float64, 0),
+    # columnas utilizadas por los adultos
+    ("x_origen", numpy.float64, 0),
+    ("y_origen", numpy.float64, 0),
+    ("tipo_zona", numpy.int8, -1),
+    ("is_inseminada", numpy.bool_, False),
+    ("se_alimenta", numpy.bool_, False),
+    ("no_se_alimenta", numpy.bool_, False),
+    ("no_pone_huevos", numpy.bool_, False),
+    ("alimentacion_necesaria", numpy.int8, 0),
+    ("cantidad_alimentacion", numpy.int32, 0),
+    ("cantidad_oviposicion", numpy.int32, 0),
+    ("ciclo_gonotrofico", numpy.float64, 0),
+    ("ultimo_alimento", numpy.int32, 1),
+    ("ultima_oviposicion", numpy.int32, 1),
+    ("distancia_recorrida", numpy.float64, 0),
+    ("desplazamiento_diario", numpy.float64, 0),
+]
+
+
+def volar_adultos(x, y, x_origen, y_origen, sexo, tipo_zona, viento,
+                  direccion_viento, random):
+    """
+    Versión vectorial de Adulto.volar para un conjunto de adultos. El
+    desplazamiento se calcula en grados siguiendo las mismas conversiones
+    que Point (distance_to, angle_to y project).
+
+    Los adultos que se alejaron de su origen al menos la distancia de vuelo
+    (MAX_VUELO para las hembras en zonas malas o pésimas, MIN_VUELO para
+    los demás) regresan hacia el origen, los demás vuelan en sentido
+    contrario al viento.
+
+    @type x, y : ndarray
+    @param x, y: Las posiciones actuales.
+
+    @type x_origen, y_origen : ndarray
+    @param x_origen, y_origen: Las posiciones de origen.
+
+    @type sexo : ndarray
+    @param sexo: Los códigos del sexo (MACHO, HEMBRA).
+
+    @type tipo_zona : ndarray
+    @param tipo_zona: Los códigos del tipo de zona (ver COD_ZONA).
+
+    @type viento : Float
+    @param viento: La velocidad del viento del día (Dia.viento).
+
+    @type direccion_viento : Float
+    @param direccion_viento: La dirección del viento del día.
+
+    @type random : numpy.random.RandomState
+    @param random: El generador de los números aleatorios.
+
+    @rtype tuple
+    @return Las nuevas posiciones x e y, y la distancia recorrida en
+        metros.
+    """
+    n = len(x)
+    hembra = sexo == HEMBRA
+    dist_vuelo = numpy.where(
+        hembra & ((tipo_zona == MALA) | (tipo_zona == PESIMA)),
+        MAX_VUELO, MIN_VUELO)
+
+    # Se calcula la distancia desde la posición actual a la origen
+    delta_x = x - x_origen
+    delta_y = y - y_origen
+    distancia_origen = numpy.hypot(delta_x, delta_y) * 100000.0
+    regresa = distancia_origen >= dist_vuelo
+
+    # angulo desde el origen a la posición actual (Point.angle_to)
+    angulo = numpy.degrees(numpy.arctan2(delta_y, delta_x))
+    angulo = numpy.where(angulo >= 90, 360 - numpy.abs(angulo - 90),
+                         numpy.abs(angulo - 90))
+    velocidad_regreso = random.uniform(0, 1, n) * distancia_origen
+
+    #~ Vuelan en sentido contrario al viento con un angulo 'delta'
+    delta = random.randint(-45, 46, n)
+    angulo_libre = direccion_viento + 180 + delta
+    speed = random.randint(0, MIN_VUELO + 1, n)
+    vx = numpy.sin(180 - angulo_libre) * speed - viento
+    vy = numpy.cos(180 - angulo_libre) * speed
+    velocidad_libre = numpy.sqrt(vx ** 2 + vy ** 2)
+
+    angulo_vuelo = numpy.where(regresa, angulo + 180, angulo_libre)
+    distancia = numpy.where(regresa, velocidad_regreso, velocidad_libre)
+
+    # se proyecta la posición (Point.project)
+    angulo_vuelo = 90 - angulo_vuelo
+    angulo_vuelo = numpy.where(angulo_vuelo < -180, 360 + angulo_vuelo,
+                               angulo_vuelo)
+    angulo_vuelo = numpy.radians(angulo_vuelo)
+    unidades = distancia / 100000.0
+    return (x + unidades * numpy.cos(angulo_vuelo),
+            y + unidades * numpy.sin(angulo_vuelo), distancia)
+
+
+class PoblacionVectorial(Poblacion):
+
+    """
+    Población representada como un conjunto de columnas. Las colonias se
+    identifican por un índice entero y sus contadores por estado se
+    almacenan en matrices de (colonias x estados).
+
+    Las tablas de las colonias (ver TABLAS_COLONIAS) se reservan con
+    capacidad extra en `tablas`, los atributos de cada tabla son vistas de
+    las filas de las colonias existentes y se modifican en el lugar.
+    """
+
+    @property
+    def memory(self):
+        """
+        Tabla en memoria, se construye a partir de los contadores de las
+        colonias para mantener la compatibilidad con Poblacion.
+        """
+        memory = {}
+        for i in range(len(self.colonias_clave)):
+            grupo = {}
+            for estado in range(len(ESTADOS)):
+                grupo[ESTADOS[estado]] = {
+                    "cantidad": int(self.cantidad[i, estado]),
+                    "cantidad_ant": 0,
+                    "to_kill": float(self.to_kill[i, estado]),
+                    "inhibicion": 0,
+                    "periodo": -1,
+                    "dia": -1,
+                    "killed": int(self.killed[i, estado])
+                }
+            memory[self.colonias_clave[i]] = grupo
+        return memory
+
+    def __init__(self, args):
+        """
+        Constructor de la clase
+        @param args: Parametros de inicialización de la clase
+
+        @keyword poblacion: La población inicial.
+        @keyword [semilla]: La semilla del generador de números aleatorios.
+        """
+        if args.get("aleatorio", None) is not None:
+            self.random = args["aleatorio"].estado
+        else:
+            self.random = numpy.random.RandomState(args.get("semilla", None))
+        self.columnas = {}
+        for nombre, tipo, defecto in COLUMNAS:
+            self.columnas[nombre] = numpy.zeros(0, dtype=tipo)
+        # tablas de las colonias
+        self.colonias_clave = []
+        self.colonias_indice = {}
+        self.tablas = {}
+        self.reservar_colonias(CAPACIDAD_COLONIAS)
+        Poblacion.__init__(self, args)
+
+    def __len__(self):
+        return len(self.columnas["id"])
+
+    def __getstate__(self):
+        """
+        El estado utilizado en los resguardos, las tablas de las colonias
+        se guardan sin la capacidad extra.
+        """
+        estado = dict(self.__dict__)
+        del estado['tablas']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self.tablas = {}
+        self.reservar_colonias(max(CAPACIDAD_COLONIAS,
+                                   2 * len(self.colonias_clave)))
+
+    def reservar_colonias(self, capacidad):
+        """
+        Amplía las tablas de las colonias a `capacidad` filas, las filas
+        de las colonias existentes se conservan.
+        """
+        n = len(self.colonias_clave)
+        for nombre, forma, tipo, inicial in TABLAS_COLONIAS:
+            tabla = numpy.empty((capacidad,) + forma, dtype=tipo)
+            tabla.fill(inicial)
+            if n > 0:
+                tabla[:n] = getattr(self, nombre)
+            self.tablas[nombre] = tabla
+        self.ajustar_colonias()
+
+    def ajustar_colonias(self):
+        """
+        Actualiza las vistas de las tablas a las colonias existentes.
+        """
+        n = len(self.colonias_clave)
+        for nombre, tabla in self.tablas.items():
+            setattr(self, nombre, tabla[:n])
+
+    def get_colonia(self, x, y):
+        """
+        Retorna el índice de la colonia ubicada en (x, y), si la colonia no
+        existe se la crea. Las tablas duplican su capacidad al llenarse.
+        """
+        key = str(x) + "_" + str(y)
+        if key in self.colonias_indice:
+            return self.colonias_indice[key]
+
+        index = len(self.colonias_clave)
+        if index == len(self.tablas["colonias_x"]):
+            self.reservar_colonias(2 * index)
+        self.colonias_clave.append(key)
+        self.colonias_indice[key] = index
+        self.ajustar_colonias()
+        self.colonias_x[index] = x
+        self.colonias_y[index] = y
+        return index
+
+    def gen_sub_poblacion(self, **kargs):
+        """
+        Se encarga de generar las columnas de un grupo de individuos a partir
+        de los parametros definidos. Si se recibe un array en `cantidad_larvas`
+        se genera un grupo por cada elemento, con las posiciones, padres y
+        generaciones definidas en los arrays correspondientes.
+
+        @rtype Dictionaries
+        @return Las columnas de la sub población.
+        """
+        cantidad = numpy.atleast_1d(kargs.get("cantidad_larvas", 0)).astype(int)
+        x = numpy.atleast_1d(kargs.get("x", 0)).astype(float)
+        y = numpy.atleast_1d(kargs.get("y", 0)).astype(float)
+        estado = kargs.get("estado", HUEVO)
+        # se obtienen las colonias de cada grupo
+        colonias = numpy.array([self.get_colonia(float(x[i]), float(y[i]))
+                                for i in range(len(cantidad))], dtype=numpy.int32)
+        numpy.add.at(self.cantidad, (colonias, estado), cantidad)
+
+        total = int(cantidad.sum())
+        sub_poblacion = {}
+        for nombre, tipo, defecto in COLUMNAS:
+            sub_poblacion[nombre] = numpy.empty(total, dtype=tipo)
+            sub_poblacion[nombre].fill(defecto)
+
+        sub_poblacion["id"] = numpy.arange(Poblacion.ID, Poblacion.ID + total)
+        Poblacion.ID += total
+        sub_poblacion["colonia"] = numpy.repeat(colonias, cantidad)
+        sub_poblacion["x"] = numpy.repeat(x, cantidad)
+        sub_poblacion["y"] = numpy.repeat(y, cantidad)
+        sub_poblacion["estado"].fill(estado)
+        sub_poblacion["madurez"].fill(kargs.get("madurez", 0))
+        sub_poblacion["sexo"] = self.random.randint(0, 2, total).astype(numpy.int8)
+        for nombre in ["id_padre", "generacion"]:
+            valor = numpy.atleast_1d(kargs.get(nombre, 0))
+            if len(valor) == 1:
+                valor = numpy.repeat(valor, len(cantidad))
+            sub_poblacion[nombre] = numpy.repeat(valor, cantidad)
+        return sub_poblacion
+
+    def generar_poblacion(self, data):
+        """
+        Este método se encarga de procesar los datos de las muestras y
+        generar los inidividuos para inicializar la población.
+        """
+        grid = Grid()
+        grid.parse(data)
+        sub_poblacion = self.gen_sub_poblacion(
+            cantidad_larvas=grid.z.astype(int), estado=LARVA,
+            x=grid.x, y=grid.y)
+        self.extend(sub_poblacion)
+
+    def extend(self, nueva_poblacion):
+        """
+        Se encarga de extender la población para incluir las columnas de los
+        nuevos individuos.
+        """
+        for nombre, tipo, defecto in COLUMNAS:
+            self.columnas[nombre] = numpy.concatenate(
+                (self.columnas[nombre], nueva_poblacion[nombre]))
+
+    def compactar(self, vivos):
+        """
+        Se encarga de eliminar las filas de los individuos muertos.
+
+        @type vivos : ndarray
+        @param vivos: Mascara con True para los individuos que permanecen.
+        """
+        for nombre in self.columnas:
+            self.columnas[nombre] = self.columnas[nombre][vivos]
+
+    def get_ranking(self, x, y, exacto=False):
+        """
+        Retorna el valor de bs para la posición (x, y), `exacto` indica que
+        la posición no se cuantiza (ver RankingTable.get_ranking).
+        """
+        punto = Point({"x": float(x), "y": float(y)})
+        return self.zonas_table.get_ranking(
+            punto, self.parametros["TAMANHO_ZONA"], exacto)
+
+    def get_bs_colonias(self, colonias):
+        """
+        Retorna el valor de bs de las colonias, el bs se calcula una única
+        vez por colonia ya que su posición es fija.
+        """
+        colonias = numpy.asarray(colonias)
+        for i in numpy.unique(colonias[numpy.isnan(self.colonias_bs[colonias])]):
+            self.colonias_bs[i] = self.get_ranking(
+                self.colonias_x[i], self.colonias_y[i], True)
+        return self.colonias_bs[colonias]
+
+    def get_bs(self, indices):
+        """
+        Retorna el valor de bs de la posición actual de los individuos. Las
+        posiciones cubiertas por el raster se resuelven juntas, las demás
+        se rankean una única vez por celda de la tabla de zonas, en la
+        posición del primer individuo de la celda.
+        """
+        c = self.columnas
+        x = c["x"][indices]
+        y = c["y"][indices]
+        bs = numpy.empty(len(x))
+        pendientes = numpy.ones(len(x), dtype=bool)
+        raster = self.zonas_table.raster
+        if raster is not None and \
+                raster.distancia == self.parametros["TAMANHO_ZONA"]:
+            fila, col, dentro = raster.get_indices(x, y)
+            bs[dentro] = raster.bs[fila[dentro], col[dentro]]
+            pendientes = ~dentro
+        pendientes = numpy.flatnonzero(pendientes)
+        if len(pendientes) == 0:
+            return bs
+        celdas = self.zonas_table.gen_celdas(x[pendientes], y[pendientes])
+        celdas, primero, inversa = numpy.unique(
+            celdas, axis=0, return_index=True, return_inverse=True)
+        valores = numpy.array([self.get_ranking(x[i], y[i])
+                               for i in pendientes[primero]])
+        bs[pendientes] = valores[inversa]
+        return bs
+
+    def get_tipo_zona(self, indices):
+        """
+        Retorna los códigos del tipo de zona en la que se encuentran los
+        individuos.
+        """
+        return get_cod_zona(self.get_bs(indices))
+
+    def get_tasa(self, codigo, temperatura):
+        """
+        Retorna la tasa de desarrollo diaria del modelo de Sharpe&DeMichele
+        para el estado y la temperatura.
+        """
+        return TASAS.get(codigo, temperatura)
+
+    def calcular_cantidad_alimentacion(self, indices, is_frist=True):
+        """
+        Versión vectorial de Adulto.calcular_cantidad_alimentacion.
+        """
+        c = self.columnas
+        prob_ovi = self.random.randint(0, 10001, len(indices))
+        if is_frist:
+            c["no_se_alimenta"][indices] = prob_ovi <= 2256
+        c["alimentacion_necesaria"][indices] = numpy.select(
+            [prob_ovi <= 6616, prob_ovi <= 8266, prob_ovi <= 9108,
+             prob_ovi <= 9798], [1, 2, 3, 4], 5)
+
+    def desarrollar(self, dia):
+        """
+        Versión vectorial del método desarrollar de cada estado. Los
+        inmaduros incrementan su madurez de acuerdo a la tasa de desarrollo
+        del estado, la cual se calcula una única vez por día.
+        """
+        c = self.columnas
+        for estado in [HUEVO, LARVA, PUPA]:
+            indices = numpy.flatnonzero(c["estado"] == estado)
+            if len(indices) == 0:
+                continue
+            cantidad_dias = 1 / self.get_tasa(ESTADOS[estado], dia.temperatura)
+            c["tiempo_madurez"][indices] = cantidad_dias
+            if cantidad_dias > 0:
+                c["madurez"][indices] += 100 / cantidad_dias
+        #~ se envejece a la población
+        c["edad"] += 1
+
+        adultos = numpy.flatnonzero(c["estado"] == ADULTO)
+        if len(adultos) > 0:
+            self.inseminacion(adultos)
+            # se ranquea la zona
+            c["tipo_zona"][adultos] = self.get_tipo_zona(adultos)
+            if dia.temperatura > 15:
+                self.volar(adultos, dia)
+                self.buscar_alimento(adultos)
+
+    def inseminacion(self, adultos):
+        """
+        Versión vectorial de Adulto.inseminar_hembra.
+        """
+        c = self.columnas
+        hembras = adultos[c["sexo"][adultos] == HEMBRA]
+        porcentaje = self.random.randint(1, 101, len(hembras))
+        nulipera = c["cantidad_oviposicion"][hembras] == 0
+        inseminada = c["is_inseminada"][hembras]
+        se_alimenta = c["se_alimenta"][hembras]
+
+        antes = nulipera & (c["cantidad_alimentacion"][hembras] == 0) \
+            & (porcentaje <= 58) & ~inseminada
+        durante = nulipera & (porcentaje <= 17) & se_alimenta & ~inseminada
+        despues = (c["cantidad_oviposicion"][hembras] <= 1) & se_alimenta \
+            & (porcentaje <= 25)
+        c["is_inseminada"][hembras] = inseminada | antes | durante | despues
+
+    def volar(self, adultos, dia):
+        """
+        Versión vectorial de Adulto.volar, ver volar_adultos.
+        """
+        c = self.columnas
+        x, y, distancia = volar_adultos(
+            c["x"][adultos], c["y"][adultos],
+            c["x_origen"][adultos], c["y_origen"][adultos],
+            c["sexo"][adultos], c["tipo_zona"][adultos],
+            dia.viento, dia.direccion_viento, self.random)
+        c["distancia_recorrida"][adultos] += distancia
+        c["desplazamiento_diario"][adultos] = distancia
+        c["x"][adultos] = x
+        c["y"][adultos] = y
+
+    def buscar_alimento(self, adultos):
+        """
+        Versión vectorial de Adulto.buscar_alimento.
+        """
+        c = self.columnas
+        c["ultimo_alimento"][adultos] += 1
+        activos = adultos[~c["no_se_alimenta"][adultos]]
+        nuevos = activos[~c["se_alimenta"][activos]]
+        c["ultimo_alimento"][nuevos] = 0
+        c["cantidad_alimentacion"][nuevos] += 1
+        satisfechos = c["cantidad_alimentacion"][activos] == \
+            c["alimentacion_necesaria"][activos]
+        c["se_alimenta"][activos[satisfechos]] = True
+
+    def mortalidad(self, temperatura):
+        """
+        Calcula la mortalidad de cada colonia y estado, reproduciendo el
+        método mortalidad de cada estado.
+
+        @rtype ndarray
+        @return La matriz de (colonias x estados) con la mortalidad.
+        """
+        cantidad = self.cantidad.astype(float)
+        mortalidad = numpy.zeros(cantidad.shape)
+        k = temperatura + 273.15
+        # Huevo.mortalidad
+        mortalidad[:, HUEVO] = cantidad[:, HUEVO] / 100.0
+        # Larva.mortalidad
+        L = cantidad[:, LARVA]
+        colonias = numpy.flatnonzero(L > 0)
+        if len(colonias) > 0:
+            ml = 0.01 + 0.9725 * math.exp(-(k - 278) / 2.7035)
+            bs_ij = self.get_bs_colonias(colonias)
+            mortalidad[colonias, LARVA] = ml * L[colonias] + \
+                (self.parametros["ALPHA"] / bs_ij) * L[colonias] * \
+                (L[colonias] - 1)
+        # Pupa.mortalidad
+        ef = 0.83
+        mp = 0.01 + 0.9725 * math.exp(-(k - 278) / 2.7035)
+        if cantidad[:, PUPA].any():
+            par = self.get_tasa(Estado.PUPA, temperatura)
+            mortalidad[:, PUPA] = (mp + par * (1 - ef)) * cantidad[:, PUPA]
+        # Adulto.mortalidad
+        mortalidad[:, ADULTO] = 0.1 * cantidad[:, ADULTO]
+        return mortalidad
+
+    def regular(self, temperatura):
+        """
+        Se encarga de realizar la reducción de la población. Para cada
+        colonia y estado se eliminan int(to_kill) individuos elegidos al
+        azar entre los miembros del grupo.
+
+        @rtype ndarray
+        @return Mascara con True para los individuos eliminados.
+        """
+        mortalidad = self.mortalidad(temperatura)
+        redondeo = numpy.floor(mortalidad + 0.5)
+        delta = numpy.where(mortalidad > redondeo, mortalidad - redondeo, 0)
+        self.to_kill += redondeo + delta
+        return self.eliminar()
+
+    def eliminar(self):
+        """
+        Elimina int(to_kill) individuos de cada colonia y estado, elegidos
+        al azar entre los miembros del grupo.
+
+        @rtype ndarray
+        @return Mascara con True para los individuos eliminados.
+        """
+        c = self.columnas
+        # se ordena la población por grupo y por una clave aleatoria
+        grupo = c["colonia"].astype(numpy.int64) * len(ESTADOS) + c["estado"]
+        orden = numpy.lexsort((self.random.random_sample(len(grupo)), grupo))
+        grupo_ordenado = grupo[orden]
+        inicio = numpy.searchsorted(grupo_ordenado, grupo_ordenado)
+        posicion = numpy.arange(len(grupo)) - inicio
+
+        to_kill = numpy.minimum(self.to_kill.astype(numpy.int64), self.cantidad)
+        muertos = numpy.zeros(len(grupo), dtype=bool)
+        muertos[orden] = posicion < to_kill.ravel()[grupo_ordenado]
+
+        # se actualizan los contadores de las colonias
+        total = numpy.bincount(grupo[muertos], minlength=self.cantidad.size)
+        total = total.reshape(self.cantidad.shape)
+        self.cantidad -= total
+        self.to_kill -= total
+        self.killed += total
+        c["expectativa_vida"][muertos] = 0
+        return muertos
+
+    def ovipostura(self, ponen, dia):
+        """
+        Versión vectorial de Adulto.poner_huevos.
+
+        @rtype ndarray
+        @return La cantidad de huevos puestos por cada hembra.
+        """
+        c = self.columnas
+        ponen = ponen[~c["no_pone_huevos"][ponen]]
+        prob_ovi = self.random.randint(0, 101, len(ponen))
+        no_pone = (c["cantidad_alimentacion"][ponen] == 1) & \
+            (c["ciclo_gonotrofico"][ponen] == 0) & (prob_ovi <= 22)
+        c["no_pone_huevos"][ponen[no_pone]] = True
+        ponen = ponen[~no_pone]
+
+        #~ se obtiene el ciclo gonotrofico
+        ciclo_gonotrofico = numpy.where(
+            c["cantidad_oviposicion"][ponen] == 0,
+            1 / self.get_tasa("NULIPERA", dia.temperatura),
+            1 / self.get_tasa(Estado.ADULTO, dia.temperatura))
+        c["ciclo_gonotrofico"][ponen] += 100 / ciclo_gonotrofico
+        ponen = ponen[(c["ciclo_gonotrofico"][ponen] >= 100) &
+                      (c["cantidad_alimentacion"][ponen] >= 1)]
+        c["cantidad_oviposicion"][ponen] += 1
+        huevos = numpy.zeros(len(c["id"]), dtype=numpy.int64)
+        huevos[ponen] = self.random.randint(self.parametros["MIN_HUEVOS"],
+                                            self.parametros["MAX_HUEVOS"] + 1,
+                                            len(ponen))
+        return huevos
+
+    def reset(self, indices):
+        """
+        Reinicia las variables de control de las hembras que ovipusieron.
+        """
+        c = self.columnas
+        c["ultima_oviposicion"][indices] = 0
+        c["se_alimenta"][indices] = False
+        c["ciclo_gonotrofico"][indices] = 0
+        self.calcular_cantidad_alimentacion(indices, False)
+        c["cantidad_alimentacion"][indices] = 0
+
+    def cambiar_estado(self, indices):
+        """
+        Se encarga de realizar el cambio de estado de los individuos maduros,
+        los campos del individuo se reinician como en un individuo nuevo.
+        """
+        c = self.columnas
+        estado = c["estado"][indices]
+        numpy.add.at(self.cantidad, (c["colonia"][indices], estado), -1)
+        numpy.add.at(self.cantidad, (c["colonia"][indices], estado + 1), 1)
+        c["estado"][indices] = estado + 1
+        for nombre in ["madurez", "edad", "tiempo_madurez"]:
+            c[nombre][indices] = 0
+        c["expectativa_vida"][indices] = 100
+
+        adultos = indices[estado + 1 == ADULTO]
+        c["x_origen"][adultos] = c["x"][adultos]
+        c["y_origen"][adultos] = c["y"][adultos]
+        self.calcular_cantidad_alimentacion(adultos)
+
+    def procesar_dia(self, dia, periodo, logger=None):
+        """
+        Se encarga de simular un día completo para toda la población.
+
+        @type dia : Dia
+        @param dia: el objeto que contiene los datos climatologicos para
+            un dia.
+
+        @type periodo : Integer
+        @param periodo: El número de día de la simulación.
+
+        @type logger : EventLogger
+        @param logger: El log de eventos, None para no registrar eventos.
+        """
+        c = self.columnas
+        if len(self) == 0:
+            return
+
+        self.desarrollar(dia)
+        #~ Se verifica el estado del individuo
+        muertos = self.regular(dia.temperatura)
+        maduros = ~muertos & (c["estado"] < ADULTO) & (c["madurez"] >= 100)
+
+        ponen = numpy.flatnonzero(
+            ~muertos & (c["estado"] == ADULTO) & (c["sexo"] == HEMBRA) &
+            c["is_inseminada"] & c["se_alimenta"])
+        if dia.temperatura >= 15:
+            huevos = self.ovipostura(ponen, dia)
+        else:
+            huevos = numpy.zeros(len(self), dtype=numpy.int64)
+
+        if logger is not None:
+            self.registrar(logger, dia, periodo, huevos)
+
+        madres = numpy.flatnonzero(huevos > 0)
+        self.reset(madres)
+        self.cambiar_estado(numpy.flatnonzero(maduros))
+        # se genera la nueva población
+        nueva_poblacion = self.gen_sub_poblacion(
+            cantidad_larvas=huevos[madres], estado=HUEVO,
+            x=c["x"][madres], y=c["y"][madres],
+            id_padre=c["id"][madres], generacion=c["generacion"][madres] + 1)
+        self.total_huevos += int(huevos.sum())
+        self.compactar(~muertos)
+        self.extend(nueva_poblacion)
+
+    def registrar(self, logger, dia, periodo, huevos):
+        """
+        Se encarga de añadir al log el estado de todos los individuos, los
+        registros se construyen por columnas (ver EventLogger.add_columnas).
+        """
+        c = self.columnas
+        n = len(c["id"])
+        if n == 0:
+            return
+        adulto = c["estado"] == ADULTO
+        adultos = numpy.flatnonzero(adulto)
+        inmaduros = numpy.flatnonzero(~adulto)
+        #~ el bs de los adultos se calcula en su posición actual, el de los
+        #~ inmaduros es el de su colonia
+        bs = numpy.empty(n)
+        bs[adultos] = self.get_bs(adultos)
+        bs[inmaduros] = self.get_bs_colonias(c["colonia"][inmaduros])
+        tipo_zona = numpy.where(adulto, c["tipo_zona"], get_cod_zona(bs))
+        claves = numpy.array(self.colonias_clave, dtype=object)
+        columnas = {
+            'id_mosquito': c["id"],
+            'id_colonia': claves[c["colonia"]],
+            'id_mosquito_padre': c["id_padre"],
+            'sexo': NOMBRES_SEXO[c["sexo"]],
+            'expectativa_de_vida': c["expectativa_vida"],
+            'tiempo_madurez': c["tiempo_madurez"],
+            'tiempo_de_vida': 0,
+            'madurez': c["madurez"],
+            'temperatura': dia.temperatura,
+            'estado': NOMBRES_ESTADO[c["estado"]],
+            'edad': c["edad"],
+            'generacion': c["generacion"],
+            'x': c["x"],
+            'y': c["y"],
+            'dia': periodo,
+            'bs': bs,
+            'tipo_zona': NOMBRES_ZONA[tipo_zona]
+        }
+        #~ las columnas propias del adulto son nulas para los inmaduros
+        for nombre in ['ultima_oviposicion', 'ultimo_alimento',
+                       'distancia_recorrida', 'cantidad_oviposicion',
+                       'cantidad_alimentacion', 'ciclo_gonotrofico']:
+            columnas[nombre] = numpy.where(adulto, c[nombre], numpy.nan)
+        columnas['cantidad_huevos'] = numpy.where(adulto, huevos, numpy.nan)
+        se_reproduce = c["is_inseminada"] & (c["sexo"] == HEMBRA) & \
+            c["se_alimenta"] & (dia.temperatura >= 15)
+        for nombre, valor in [('is_inseminada', c["is_inseminada"]),
+                              ('se_alimenta', c["se_alimenta"]),
+                              ('se_reproduce', se_reproduce)]:
+            columnas[nombre] = numpy.where(adulto, valor, -1)
+        logger.add_columnas(columnas, n)
+
+    def get_resumen(self):
+        """
+        Se encarga de generar un resumen de la poblacion
+        """
+        resumen = {}
+        for i in range(len(ESTADOS)):
+            resumen[ESTADOS[i]] = {}
+            resumen[ESTADOS[i]]["total"] = int(self.cantidad[:, i].sum())
+            resumen[ESTADOS[i]]["muertas"] = int(self.killed[:, i].sum())
+
+        resumen["total_huevos"] = self.total_huevos
+        return resumen
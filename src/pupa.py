@@ -92,8 +92,7 @@ class Pupa(AeAegypti):
         k = temperatura + 273.15
         ef = 0.83
         mp = 0.01 + 0.9725 * math.exp(-(k - 278) / 2.7035)
-        coef = COEF_SH_DE.get_by(self.estado)
-        par = self.sharpe_demichele(temperatura, coef[0])
+        par = TASAS.get(self.estado, temperatura)
         p_ij = colonia[self.estado]["cantidad"]
         """
         Según [otero2008] la mortalidad de la pupa queda definida por la
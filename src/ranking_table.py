@@ -6,10 +6,51 @@ Este módulo contiene la definición de datos utilizados en el simulador.
 @autors Maximiliano Báez
 @contact mxbg.py@gmail.com
 """
+import math
+from collections import OrderedDict
+import numpy
 from datatype import *
+from config import *
 from db_manager import *
 
-DAO = PuntosControlModel()
+from models import IndiceEspacial, Point
+
+#~ capa de acceso a los puntos de control, se crea en el primer acceso
+#~ al índice, puede reemplazarse antes de cargar el índice.
+DAO = None
+#~ Códigos numéricos del tipo de zona, -1 indica que no fue rankeada.
+ZONAS = [Zonas.PESIMA, Zonas.MALA, Zonas.NORMAL, Zonas.BUENA, Zonas.OPTIMA]
+COD_ZONA = dict((zona, i) for i, zona in enumerate(ZONAS))
+# índice en memoria de los puntos de control, compartido por las tablas
+INDICE = None
+
+
+def get_cod_zona(pts):
+    """
+    Versión vectorial de RankingTable.get_tipo_zona, retorna los códigos
+    del tipo de zona de los puntajes, -1 para los puntajes que no
+    corresponden a ningún tipo de zona.
+    """
+    pts = numpy.asarray(pts)
+    return numpy.select(
+        [pts <= 19, (pts >= 20) & (pts <= 35), (pts >= 36) & (pts <= 51),
+         (pts >= 52) & (pts <= 69), pts >= 70],
+        [COD_ZONA[Zonas.PESIMA], COD_ZONA[Zonas.MALA],
+         COD_ZONA[Zonas.NORMAL], COD_ZONA[Zonas.BUENA],
+         COD_ZONA[Zonas.OPTIMA]], -1).astype(numpy.int8)
+
+
+def get_indice():
+    """
+    Retorna el índice espacial de los puntos de control, los puntos se
+    cargan de la base de datos en el primer acceso.
+    """
+    global INDICE, DAO
+    if INDICE is None:
+        if DAO is None:
+            DAO = PuntosControlModel()
+        INDICE = IndiceEspacial(DAO.get_all())
+    return INDICE
 
 
 class RankingTable:
@@ -17,6 +58,16 @@ class RankingTable:
     """
     Se encarga de guardar en memoria  el valor de todas las zonas que ya
     fueron rankeadas en algún momento para evitar calculos incecesarios.
+
+    Las posiciones se cuantizan a celdas de `celda` metros, todos los puntos
+    de una celda comparten el ranking calculado en el primer punto de la
+    celda que fue consultado. Las posiciones fijas (los inmaduros y las
+    colonias) se consultan de forma exacta, sin cuantizar.
+    La tabla tiene un tamaño máximo, al superarlo se descarta la zona
+    utilizada hace más tiempo (LRU).
+
+    Si la tabla tiene asociado un raster de zonas (ver raster_zonas), las
+    posiciones cubiertas por el raster se resuelven directamente con él.
     """
     @property
     def memory(self):
@@ -27,8 +78,28 @@ class RankingTable:
     def memory(self, value):
         self.__memory = value
 
-    def __init__(self):
-        self.__memory = {}
+    def __init__(self, indice=None, celda=RANKING_CELDA,
+                 tamanho_maximo=RANKING_MAX_ZONAS):
+        """
+        @type indice : IndiceEspacial
+        @param indice: El índice de los puntos de control, por defecto el
+            índice compartido cargado de la base de datos.
+
+        @type celda : Float
+        @param celda: El tamaño en metros de la celda, 0 para no cuantizar.
+
+        @type tamanho_maximo : Integer
+        @param tamanho_maximo: La cantidad máxima de zonas en memoria.
+        """
+        self.__memory = OrderedDict()
+        self.indice = indice
+        self.celda = celda
+        self.celda_unidades = Point({}).to_units(celda)
+        self.tamanho_maximo = tamanho_maximo
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.raster = None
 
     def get_tipo_zona(self, pts):
         """
@@ -55,11 +126,36 @@ class RankingTable:
         elif pts >= 70:
             return Zonas.OPTIMA
 
-    def gen_key(self, punto, distancia):
+    def gen_key(self, punto, distancia, exacto=False):
         """
-        Genera una clave única para el punto y la distancia.
+        Genera una clave única para la celda del punto y la distancia, o
+        para el punto si `exacto` es True.
         """
-        return str(punto.x) + "-" + str(punto.y) + "-" + str(distancia)
+        if exacto or self.celda <= 0:
+            return (True, punto.x, punto.y, distancia)
+        celda = self.celda_unidades
+        #~ se redondea como en gen_celdas
+        return (False,
+                int(math.copysign(math.floor(abs(punto.x / celda) + 0.5),
+                                  punto.x)),
+                int(math.copysign(math.floor(abs(punto.y / celda) + 0.5),
+                                  punto.y)),
+                distancia)
+
+    def gen_celdas(self, x, y):
+        """
+        Versión vectorial de gen_key, retorna la fila (columna x, columna y)
+        de la celda de cada posición. Las posiciones con la misma fila
+        comparten la clave de gen_key.
+
+        @rtype ndarray
+        """
+        if self.celda <= 0:
+            return numpy.column_stack((x, y))
+        celda = self.celda_unidades
+        cx = numpy.copysign(numpy.floor(numpy.abs(x / celda) + 0.5), x)
+        cy = numpy.copysign(numpy.floor(numpy.abs(y / celda) + 0.5), y)
+        return numpy.column_stack((cx, cy))
 
     def raking_zona(self, point, distancia):
         """
@@ -74,7 +170,9 @@ class RankingTable:
         #~ Se obtienen todos los puntos de riesgo que se encuentran en la zona
         #~ para analizar si el mosquito debe volar en busca de mejores
         #~ condiciones
-        zona_muestras = DAO.get_within(point, distancia)
+        if self.indice is None:
+            self.indice = get_indice()
+        zona_muestras = self.indice.get_within(point, distancia)
         if len(zona_muestras) == 0:
             return 0
 
@@ -101,6 +199,55 @@ class RankingTable:
 
         return rank_value
 
+    def raking_zonas(self, x, y, distancia):
+        """
+        Versión vectorial de raking_zona, retorna el puntaje de cada
+        posición. Las distancias a los puntos de control se calculan juntas
+        para todas las posiciones, por lo que conviene consultar posiciones
+        cercanas entre sí, por ejemplo una fila de un raster.
+        """
+        if self.indice is None:
+            self.indice = get_indice()
+        indice = self.indice
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+        rank_value = numpy.zeros(len(x))
+        if len(x) == 0 or len(indice) == 0:
+            return rank_value
+        #~ se descartan los puntos fuera de la extensión de las posiciones
+        #~ más el radio en grados, por exceso, como en get_within
+        delta_y = distancia / 110574.0
+        latitud = min(numpy.abs(y).max() + delta_y, 89.0)
+        delta_x = distancia / (111319.49 * math.cos(math.radians(latitud)))
+        candidatos = numpy.flatnonzero(
+            (indice.x >= x.min() - delta_x) & (indice.x <= x.max() + delta_x) &
+            (indice.y >= y.min() - delta_y) & (indice.y <= y.max() + delta_y))
+        if len(candidatos) == 0:
+            return rank_value
+
+        #~ matrices de posiciones x candidatos
+        px = numpy.repeat(x[:, None], len(candidatos), axis=1)
+        py = numpy.repeat(y[:, None], len(candidatos), axis=1)
+        cx = numpy.repeat(indice.x[candidatos][None, :], len(x), axis=0)
+        cy = numpy.repeat(indice.y[candidatos][None, :], len(x), axis=0)
+        _, _, dist = indice.geod.inv(px.ravel(), py.ravel(), cx.ravel(),
+                                     cy.ravel())
+        dentro = dist.reshape(px.shape) <= distancia
+        cantidad = numpy.array([indice.data[i]['cantidad']
+                                for i in candidatos], dtype=float)
+
+        #~ distancia plana en metros, como Point.distance_to
+        dx = Point({}).to_metter(numpy.hypot(cx - px, cy - py))
+        ponderados = dentro & (dx > 0)
+        wi = numpy.zeros(dx.shape)
+        wi[ponderados] = 1 / (dx[ponderados] ** 1.7)
+        sum_wi = wi.sum(axis=1)
+        total = dentro.sum(axis=1)
+        validos = sum_wi > 0
+        rank_value[validos] = (wi[validos] * cantidad).sum(axis=1) / \
+            sum_wi[validos] / total[validos]
+        return rank_value
+
     def lagrange_i(self, bs, i):
         """
         Los valores conocidos de las densidades $19$, $51$ y $70$ son $bs_{min}$, $bs_{med}$ y
@@ -127,6 +274,12 @@ class RankingTable:
         bs_max = 50
 
         Y = [bs_min, bs_min, bs_med, bs_max]
+        if numpy.ndim(cantidad) > 0:
+            #~ versión vectorial, utilizada por el raster de zonas
+            cantidad = numpy.asarray(cantidad, dtype=float)
+            p_x = sum(self.lagrange_i(cantidad, i) * Y[i]
+                      for i in range(0, len(Y)))
+            return numpy.where(cantidad >= 70, bs_max, p_x)
         if cantidad >= 70:
             return bs_max
         p_x = 0
@@ -134,15 +287,45 @@ class RankingTable:
             p_x += self.lagrange_i(cantidad, i) * Y[i]
         return p_x
 
-    def get_ranking(self, punto, distancia):
+    def get_ranking(self, punto, distancia, exacto=False):
         """
         Se ecarga de verificar si la zona ya fue rankeada, de ser así
         se retorna el valor de la tabla de zonas rankeadas. Si no fue
         rankeada se rankea la zona y se guarda en la tabla de ranking.
+
+        @type exacto : Boolean
+        @param exacto: True para rankear la posición exacta del punto, sin
+            cuantizar, utilizado para las posiciones que no se mueven.
         """
-        key = self.gen_key(punto, distancia)
-        if not self.memory.has_key(key):
-            rank_value = self.raking_zona(punto, distancia)
-            self.memory[key] = self.get_bs_ij(rank_value)
+        if self.raster is not None and self.raster.distancia == distancia:
+            bs_ij = self.raster.get_bs(punto.x, punto.y)
+            if bs_ij is not None:
+                return bs_ij
+
+        key = self.gen_key(punto, distancia, exacto)
+        if self.memory.has_key(key):
+            self.hits += 1
+            # se mueve la zona al final de la tabla (la más reciente)
+            bs_ij = self.memory.pop(key)
+            self.memory[key] = bs_ij
+            return bs_ij
+
+        self.misses += 1
+        rank_value = self.raking_zona(punto, distancia)
+        self.memory[key] = self.get_bs_ij(rank_value)
+        if len(self.memory) > self.tamanho_maximo:
+            self.memory.popitem(last=False)
+            self.evictions += 1
 
         return self.memory[key]
+
+    def get_estadisticas(self):
+        """
+        Retorna los contadores de uso de la tabla.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "zonas": len(self.memory)
+        }
@@ -0,0 +1,243 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene la definición del raster de capacidad (bs) de las
+zonas. El raster se calcula una única vez por muestra sobre una grilla
+regular que cubre la extensión de los puntos de control, de forma que la
+consulta del bs de una posición es un acceso a un array.
+
+El raster guardado en TMP_HOME se identifica con un hash de los puntos
+utilizados para calcularlo, y se vuelve a calcular si los puntos cambian.
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import os
+import math
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy
+from config import *
+from models import Grid, Point
+from ranking_table import *
+
+# rasters ya cargados en el proceso, por muestra, resolución y distancia
+RASTERS = {}
+
+
+class RasterZonas:
+
+    """
+    Grilla regular con el bs y el tipo de zona de cada celda. Las celdas
+    se indexan como [fila, columna], la fila corresponde al eje y.
+    """
+
+    def __init__(self, x_min, y_min, celda, bs, tipo, distancia=TAMANHO_ZONA,
+                 firma=None):
+        """
+        @type x_min, y_min : Float
+        @param x_min, y_min: El centro de la celda [0, 0].
+
+        @type celda : Float
+        @param celda: El tamaño de la celda en grados.
+
+        @type bs : ndarray
+        @param bs: La matriz con el bs de cada celda.
+
+        @type tipo : ndarray
+        @param tipo: La matriz con el código del tipo de zona (ver ZONAS).
+
+        @type distancia : Integer
+        @param distancia: El radio en metros utilizado para rankear.
+
+        @type firma : String
+        @param firma: El hash de los puntos del raster (ver get_firma).
+        """
+        self.firma = firma
+        self.x_min = x_min
+        self.y_min = y_min
+        self.celda = celda
+        self.bs = bs
+        self.tipo = tipo
+        self.distancia = distancia
+
+    def get_indices(self, x, y):
+        """
+        Retorna la fila y la columna de la celda de cada posición, junto con
+        una mascara de las posiciones que se encuentran dentro del raster.
+        """
+        col = numpy.rint((numpy.asarray(x) - self.x_min) / self.celda)
+        fila = numpy.rint((numpy.asarray(y) - self.y_min) / self.celda)
+        dentro = (col >= 0) & (col < self.bs.shape[1]) & \
+            (fila >= 0) & (fila < self.bs.shape[0])
+        col = numpy.where(dentro, col, 0).astype(int)
+        fila = numpy.where(dentro, fila, 0).astype(int)
+        return fila, col, dentro
+
+    def get_bs(self, x, y):
+        """
+        Retorna el bs de la posición, None si se encuentra fuera del raster.
+        """
+        fila, col, dentro = self.get_indices(x, y)
+        if not dentro:
+            return None
+        return float(self.bs[fila, col])
+
+    def get_tipo_zona(self, x, y):
+        """
+        Retorna el tipo de zona de la posición, None si se encuentra fuera
+        del raster.
+        """
+        fila, col, dentro = self.get_indices(x, y)
+        if not dentro or self.tipo[fila, col] < 0:
+            return None
+        return ZONAS[self.tipo[fila, col]]
+
+    def save(self, path):
+        """
+        Guarda el raster en el directorio `path`, las matrices se guardan en
+        formato .npy para poder ser mapeadas en memoria. El raster se
+        escribe en un directorio temporal que luego se renombra, por lo que
+        los demás procesos nunca leen un raster incompleto.
+        """
+        padre = os.path.dirname(path)
+        if not os.path.isdir(padre):
+            try:
+                os.makedirs(padre)
+            except OSError:
+                #~ otro proceso creó el directorio
+                pass
+        temporal = tempfile.mkdtemp(prefix=os.path.basename(path) + ".",
+                                    dir=padre)
+        numpy.save(os.path.join(temporal, "bs.npy"), self.bs)
+        numpy.save(os.path.join(temporal, "tipo.npy"), self.tipo)
+        meta = {
+            "x_min": self.x_min,
+            "y_min": self.y_min,
+            "celda": self.celda,
+            "distancia": self.distancia,
+            "firma": self.firma
+        }
+        with open(os.path.join(temporal, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        #~ el raster desactualizado se descarta, los procesos que lo tienen
+        #~ mapeado en memoria lo siguen utilizando
+        if os.path.isdir(path):
+            anterior = temporal + ".anterior"
+            try:
+                os.rename(path, anterior)
+                shutil.rmtree(anterior, True)
+            except OSError:
+                pass
+        try:
+            os.rename(temporal, path)
+        except OSError:
+            #~ otro proceso guardó el raster al mismo tiempo
+            shutil.rmtree(temporal, True)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """
+        Carga el raster guardado en el directorio `path`.
+
+        @type mmap : Boolean
+        @param mmap: True para mapear las matrices en memoria en lugar de
+            leerlas completamente.
+        """
+        modo = "r" if mmap else None
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        bs = numpy.load(os.path.join(path, "bs.npy"), mmap_mode=modo)
+        tipo = numpy.load(os.path.join(path, "tipo.npy"), mmap_mode=modo)
+        return RasterZonas(meta["x_min"], meta["y_min"], meta["celda"],
+                           bs, tipo, meta["distancia"], meta.get("firma"))
+
+
+def get_firma(data, ranking):
+    """
+    Retorna el hash de los puntos que determinan el raster: los puntos de
+    control de la muestra, que determinan su extensión, y los puntos del
+    índice utilizados para rankear cada celda.
+
+    @rtype String
+    """
+    if ranking.indice is None:
+        ranking.indice = get_indice()
+    firma = hashlib.sha1()
+    for puntos in [data, ranking.indice.data]:
+        valores = [(float(p['x']), float(p['y']),
+                    float(p.get('cantidad') or 0)) for p in puntos]
+        firma.update(json.dumps(valores))
+    return firma.hexdigest()
+
+
+def generar_raster(data, ranking, resolucion, distancia=TAMANHO_ZONA):
+    """
+    Calcula el raster de bs sobre la extensión de los puntos de control.
+
+    @type data : Dictionaries
+    @param data: Los puntos de control de la muestra.
+
+    @type ranking : RankingTable
+    @param ranking: La tabla utilizada para rankear cada celda.
+
+    @type resolucion : Float
+    @param resolucion: El tamaño de la celda en metros.
+    """
+    grid = Grid()
+    grid.parse(data)
+    bounds = grid.get_bounds()
+    celda = Point({}).to_units(resolucion)
+    cols = int(math.ceil((bounds.x_max - bounds.x_min) / celda)) + 1
+    rows = int(math.ceil((bounds.y_max - bounds.y_min) / celda)) + 1
+
+    bs = numpy.zeros((rows, cols))
+    x = bounds.x_min + numpy.arange(cols) * celda
+    #~ el puntaje se calcula por filas, las celdas de una fila comparten
+    #~ los puntos de control cercanos
+    for fila in range(rows):
+        y = numpy.empty(cols)
+        y.fill(bounds.y_min + fila * celda)
+        bs[fila] = ranking.get_bs_ij(ranking.raking_zonas(x, y, distancia))
+    tipo = get_cod_zona(bs)
+
+    return RasterZonas(bounds.x_min, bounds.y_min, celda, bs, tipo, distancia)
+
+
+def get_raster(id_muestras, data, ranking, resolucion=None, mmap=None,
+               distancia=TAMANHO_ZONA):
+    """
+    Retorna el raster de la muestra. El raster se reutiliza si ya fue
+    cargado en el proceso o si fue guardado en TMP_HOME por una ejecución
+    anterior con los mismos puntos, en caso contrario se lo calcula y se lo
+    guarda.
+    """
+    if resolucion is None:
+        resolucion = RASTER_ZONAS["resolucion"]
+    if mmap is None:
+        mmap = RASTER_ZONAS["mmap"]
+
+    key = "{0}-{1}-{2}".format(id_muestras, resolucion, distancia)
+    firma = get_firma(data, ranking)
+    if (key, firma) in RASTERS:
+        return RASTERS[(key, firma)]
+
+    path = os.path.join(TMP_HOME, "zonas", key)
+    raster = None
+    if os.path.exists(os.path.join(path, "meta.json")):
+        raster = RasterZonas.load(path, mmap)
+        if raster.firma != firma:
+            raster = None
+    if raster is None:
+        raster = generar_raster(data, ranking, resolucion, distancia)
+        raster.firma = firma
+        raster.save(path)
+        if mmap:
+            guardado = RasterZonas.load(path, mmap)
+            if guardado.firma == firma:
+                raster = guardado
+
+    RASTERS[(key, firma)] = raster
+    return raster
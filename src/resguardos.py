@@ -0,0 +1,124 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene los resguardos del estado de la simulación. Un
+resguardo contiene el estado completo del simulador al final de un día: la
+población (los individuos o las columnas y cohortes de los motores
+vectoriales, la tabla de colonias y el ranking de zonas), los flujos de
+números aleatorios, los contadores de ids y el número del siguiente día.
+
+Los resguardos se guardan con pickle en formato binario comprimido con
+gzip, un archivo por código de simulación. El archivo se escribe en un
+temporal que luego se renombra, por lo que una interrupción durante la
+escritura conserva el resguardo anterior.
+
+Uso :
+    python resguardos.py codigo
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import os
+import sys
+import gzip
+import cPickle
+from config import *
+from poblacion import Poblacion
+import aleatorio
+
+#~ Versión del formato de los resguardos, la versión 2 guarda los
+#~ parametros del modelo de la población
+VERSION = 2
+
+
+def get_path(codigo, directorio=None):
+    """
+    Retorna la ruta del resguardo de la simulación `codigo`.
+    """
+    directorio = directorio or RESGUARDOS["directorio"]
+    return os.path.join(directorio, (codigo or "simulacion") + ".resguardo")
+
+
+def guardar(simulador, directorio=None):
+    """
+    Guarda el estado del simulador.
+
+    @type simulador : Simulador
+    @param simulador: El simulador, el día del resguardo es el último día
+        simulado.
+
+    @rtype String
+    @return La ruta del resguardo.
+    """
+    path = get_path(simulador.codigo, directorio)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    estado = {
+        "version": VERSION,
+        "dia": simulador.dia_i,
+        "id": Poblacion.ID,
+        "paso_id": Poblacion.PASO_ID,
+        "flujo": aleatorio.FLUJO.__dict__,
+        "simulador": simulador
+    }
+    temporal = path + ".tmp"
+    archivo = gzip.open(temporal, "wb", RESGUARDOS["compresion"])
+    try:
+        cPickle.dump(estado, archivo, cPickle.HIGHEST_PROTOCOL)
+    finally:
+        archivo.close()
+    os.rename(temporal, path)
+    return path
+
+
+def cargar(codigo, directorio=None):
+    """
+    Restaura el simulador del resguardo de la simulación `codigo`, se
+    restauran también los contadores de ids y el flujo global.
+
+    @rtype Simulador
+    @return El simulador, listo para continuar con el día siguiente al
+        resguardo. None si la simulación no tiene resguardos.
+    """
+    path = get_path(codigo, directorio)
+    if not os.path.exists(path):
+        return None
+    archivo = gzip.open(path, "rb")
+    try:
+        estado = cPickle.load(archivo)
+    finally:
+        archivo.close()
+    if estado["version"] != VERSION:
+        raise ValueError("versión de resguardo no soportada : " +
+                         str(estado["version"]))
+    Poblacion.ID = estado["id"]
+    Poblacion.PASO_ID = estado["paso_id"]
+    aleatorio.FLUJO.__dict__.update(estado["flujo"])
+    simulador = estado["simulador"]
+    simulador.dia_i = estado["dia"]
+    return simulador
+
+
+def reanudar(codigo, directorio=None):
+    """
+    Continúa la simulación `codigo` desde su último resguardo. Los
+    registros del log escritos después del resguardo se descartan antes de
+    continuar, por lo que cada día queda registrado una única vez.
+
+    @rtype Simulador
+    @return El simulador al final de la simulación.
+    """
+    simulador = cargar(codigo, directorio)
+    if simulador is None:
+        raise ValueError("la simulación no tiene resguardos : " + str(codigo))
+    simulador.logger.descartar(simulador.dia_i)
+    simulador.start()
+    return simulador
+
+
+if __name__ == "__main__":
+    from fuentes_datos import get_fuente
+
+    #~ los coeficientes se cargan de la fuente de datos
+    get_fuente()
+    reanudar(sys.argv[1])
@@ -1,8 +1,9 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
-from flask import Flask, request, Response, jsonify
+from flask import Flask, request, Response, jsonify, abort
 from controller import *
 #import pdi
+import re
 import traceback
 
 """
@@ -33,6 +34,11 @@ def not_found(error):
     return "404 error", 404
 
 
+@app.errorhandler(400)
+def bad_request(error):
+    return "400 error", 400
+
+
 @app.route('/muestras', methods=['GET'])
 def get_lista_muestras():
     resp = controller.get_all_muestras()
@@ -54,8 +60,19 @@ def get_codigos(id_muestra):
 
 @app.route('/muestras/<id_muestra>/procesos/<codigo>', methods=['POST'])
 def crear_proceso(id_muestra, codigo):
-    resp = controller.new_proceso_evolutivo(id_muestra, codigo)
-    return jsonify(resp)
+    resp = controller.encolar_proceso(id_muestra, codigo)
+    return jsonify(resp), 202
+
+@app.route('/muestras/<id_muestra>/procesos/<codigo>/avanzar', methods=['POST'])
+def avanzar_proceso(id_muestra, codigo):
+    dias = request.values.get('dias', None)
+    if dias is not None:
+        #~ la cantidad de días se valida antes de encolar el trabajo
+        if not re.match(r"^\d+$", dias.strip()) or int(dias) <= 0:
+            abort(400)
+        dias = int(dias)
+    resp = controller.encolar_avance(id_muestra, codigo, dias)
+    return jsonify(resp), 202
 
 @app.route('/muestras/<id_muestra>/procesos/<codigo>/dias', methods=['GET'])
 def get_cantidad_dias(codigo):
@@ -68,6 +85,28 @@ def identificar_focos(id_muestra, codigo, dia):
     return jsonify(resp)
 
 
+@app.route('/trabajos/<int:id_trabajo>', methods=['GET'])
+def get_trabajo(id_trabajo):
+    resp = controller.get_trabajo(id_trabajo)
+    if resp is None:
+        abort(404)
+    return jsonify(resp)
+
+@app.route('/trabajos/<int:id_trabajo>/progreso', methods=['GET'])
+def get_progreso(id_trabajo):
+    resp = controller.get_progreso(id_trabajo)
+    if resp is None:
+        abort(404)
+    return jsonify(resp)
+
+@app.route('/trabajos/<int:id_trabajo>/cancelar', methods=['POST'])
+def cancelar_trabajo(id_trabajo):
+    resp = controller.cancelar_trabajo(id_trabajo)
+    if resp is None:
+        abort(404)
+    return jsonify(resp)
+
+
 @app.route('/logs/<codigo>/tasa-desarrollo', methods=['GET'])
 def get_tasa_desarrollo(codigo):
     resp = controller.get_tasa_desarrollo(codigo)
@@ -10,9 +10,34 @@ de control.
 """
 
 # Se impotan los modulos.
+import sys
+import traceback
 from poblacion import *
+from poblacion_vectorial import PoblacionVectorial
+from poblacion_cohortes import PoblacionCohortes
+from raster_zonas import get_raster
 # log de eventos
 from logger import EventLogger
+import particiones
+import resguardos
+
+#~ Motores que procesan el día de toda la población a la vez
+MOTORES = {
+    "vectorial": PoblacionVectorial,
+    "cohortes": PoblacionCohortes
+}
+
+
+def get_log_nivel(motor=MOTOR_SIMULACION, nivel=LOG_NIVEL):
+    """
+    Retorna el nivel del log de una simulación con el motor `motor`. El
+    motor "cohortes" registra a los inmaduros en la tabla evolucion_resumen
+    (ver EventLogger.add_cohorte), por lo que siempre utiliza el nivel
+    "resumen" y los reportes encuentran a toda la población en una tabla.
+    """
+    if motor == "cohortes":
+        return "resumen"
+    return nivel
 
 
 class Simulador:
@@ -38,129 +63,301 @@ class Simulador:
 
         @keyword poblacion: La población inicial.
         @keyword periodo: El periodo de simulación.
+        @keyword [motor]: "objetos", "vectorial" o "cohortes", por defecto
+            MOTOR_SIMULACION
+        @keyword [semilla]: La semilla del flujo de números aleatorios, la
+            misma semilla reproduce la simulación.
+        @keyword [parametros]: Los valores de los parametros del modelo que
+            reemplazan a los de config (ver get_parametros).
+        @keyword [compacto]: True para utilizar las variantes compactas de
+            los individuos, por defecto INDIVIDUOS_COMPACTOS.
+        @keyword [raster_zonas]: True para precalcular el bs de las zonas en
+            un raster, por defecto RASTER_ZONAS["activo"].
+        @keyword [log_nivel]: El nivel del log, por defecto LOG_NIVEL. El
+            motor "cohortes" utiliza siempre el nivel "resumen".
+        @keyword [traza]: Los individuos trazados en el nivel "resumen", por
+            defecto LOG_TRAZA.
+        @keyword [particiones]: La cantidad de franjas simuladas en
+            paralelo en el motor "objetos", por defecto PARTICIONES.
+        @keyword [resguardo]: Cada cuántos días se guarda un resguardo del
+            estado, 0 para no guardarlos. Por defecto
+            RESGUARDOS["intervalo"].
+        @keyword [progreso]: Función llamada con el simulador al iniciar la
+            simulación y al final de cada día, puede interrumpir la simulación lanzando una
+            excepción (ver trabajos).
         """
         self.zonas_table = RankingTable()
+        #~ los parametros del modelo se entregan a la población
+        parametros = get_parametros(kargs.get('parametros'))
+        kargs['parametros'] = parametros
+        #~ el raster de zonas se calcula una vez por muestra y se reutiliza
+        if kargs.get('raster_zonas', RASTER_ZONAS["activo"]) == True:
+            kargs['raster_zonas'] = get_raster(
+                kargs.get('id_muestra', 1), kargs.get('poblacion', []),
+                self.zonas_table, distancia=parametros["TAMANHO_ZONA"])
+        else:
+            kargs.pop('raster_zonas', None)
+        #~ se inicializa el motor de la simulación
+        self.motor = kargs.get('motor', MOTOR_SIMULACION)
+        self.semilla = kargs.get('semilla', None)
+        self.particiones = kargs.get('particiones', PARTICIONES)
+        #~ flujo de números aleatorios de la simulación
+        self.aleatorio = FlujoAleatorio(self.semilla)
+        kargs['aleatorio'] = self.aleatorio
         #~ se inicializa el atributo periodo
-        self.poblacion = Poblacion(kargs)
+        if self.motor in MOTORES:
+            self.poblacion = MOTORES[self.motor](kargs)
+        else:
+            self.poblacion = Poblacion(kargs)
         #~ se inicializa el atributo periodo
         self.historial_clima = []
         #~ se inicializa el atributo periodo
         self.periodo = kargs.get('periodo', [])
         # se inicializa la clase que hace log de los eventos
-        codigo = kargs.get('codigo', '')
-        id_muestra = kargs.get('id_muestra', 1)
-        self.logger = EventLogger(id_muestra, codigo)
+        self.codigo = kargs.get('codigo', '')
+        self.id_muestra = kargs.get('id_muestra', 1)
+        self.log_nivel = get_log_nivel(self.motor,
+                                       kargs.get('log_nivel', LOG_NIVEL))
+        self.traza = kargs.get('traza', LOG_TRAZA)
+        self.logger = self.crear_logger()
+        self.resguardo = kargs.get('resguardo', RESGUARDOS["intervalo"])
+        self.progreso = kargs.get('progreso', None)
+        #~ el número del siguiente día a simular
+        self.dia_i = 0
+
+    def __getstate__(self):
+        """
+        El estado del simulador utilizado en los resguardos, el log de
+        eventos y la función de progreso no forman parte del estado.
+        """
+        estado = dict(self.__dict__)
+        del estado['logger']
+        estado['progreso'] = None
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        #~ los resguardos anteriores a la función de progreso no la tienen
+        self.progreso = estado.get('progreso', None)
+        self.logger = self.crear_logger()
+
+    def crear_logger(self):
+        """
+        Crea el log de eventos de la simulación.
+        """
+        return EventLogger(self.id_muestra, self.codigo,
+                           nivel=self.log_nivel, traza=self.traza)
 
     def start(self):
         """
-        Se encarga de iniciar el simulador.
+        Se encarga de iniciar el simulador. Si el simulador fue restaurado
+        de un resguardo, la simulación continúa desde el día siguiente al
+        resguardo.
         """
         print self.poblacion
-        dia_i = 0
-        args = {}
-        HUEVOS = True
-        for dia in self.periodo.dias:
-            #~ se procesa cada individuo de la población
-            j = 0
-            total_huevos = 0
-            nueva_poblacion = []
-            print "=" * 5 + "Día Nro :" + str(dia_i) + " Temp : " + str(dia.temperatura) + " poblacion :" + str(len(self.poblacion.individuos)) + "=" * 5
-
-            for individuo in self.poblacion.individuos:
-                poner_huevos = False
-                cambio_estado = False
-                cantidad_huevos = 0
-                individuo.desarrollar(dia)
-
-                #~ Se verifica el estado del individuo
-                if self.poblacion.regular(individuo, dia, dia_i):
-                    """
-                    si el individuo esta muerto se lo remueve de la poblacion
-                    """
-                    self.poblacion.kill(individuo)
+        dias = self.periodo.dias
+        franjas = None
+        try:
+            self.notificar()
+            if self.motor not in MOTORES and self.particiones > 1 and \
+                    self.dia_i < len(dias):
+                #~ cada franja del área de estudio se simula en un proceso
+                franjas = particiones.Franjas(self, self.particiones)
+            while self.dia_i < len(dias):
+                dia_i = self.dia_i
+                dia = dias[dia_i]
 
-                elif individuo.esta_maduro() == True:
-                    """
-                    si el individuo esta maduro, se realiza el cambio de
-                    estado.
-                    """
-                    # se logea el individuo antes de su cambio de estado
-                    args = {}
-                    args['aedes'] = individuo
-                    args['dia'] = dia
-                    args['periodo'] = dia_i
-                    args['huevos'] = cantidad_huevos
-                    self.logger.add(args)
-
-                    individuo = self.poblacion.cambiar_estado(individuo)
-                    self.poblacion.individuos[j] = individuo
-                    cambio_estado = True
-
-                elif individuo.estado == Estado.ADULTO and HUEVOS:
-                    if individuo.se_reproduce(dia) == True:
-                        # se genera un nueva poblacion
-                        sub_poblacion, cantidad_huevos = self.poblacion.ovipostura(
-                            individuo, dia)
-                        """
-                        se extiende la poblacion unicamente si se puso
-                        huevos.
-                        """
-                        if len(sub_poblacion) > 0:
-                            cantidad_huevos = len(sub_poblacion)
-                            nueva_poblacion.extend(sub_poblacion)
-
-                if cambio_estado == False:
-                    args = {}
-                    args['aedes'] = individuo
-                    args['dia'] = dia
-                    args['periodo'] = dia_i
-                    args['huevos'] = cantidad_huevos
-                    self.logger.add(args)
-                    if cantidad_huevos > 0:
-                        individuo.reset()
-
-                j += 1
-
-                if (j%500) == 0 :
-                    self.logger.save()
-
-            if len(nueva_poblacion) > 0:
-                total_huevos += len(nueva_poblacion)
-                self.poblacion.extend(nueva_poblacion)
-
-            print str(self.poblacion)
-
-            self.logger.save()
-            dia_i += 1
+                if franjas is not None:
+                    franjas.procesar_dia(dia, dia_i)
+                else:
+                    print "=" * 5 + "Día Nro :" + str(dia_i) + " Temp : " + str(dia.temperatura) + " poblacion :" + str(len(self.poblacion)) + "=" * 5
+                    if self.motor in MOTORES:
+                        self.poblacion.procesar_dia(dia, dia_i, self.logger)
+                    else:
+                        self.procesar_dia(dia, dia_i)
+                    print str(self.poblacion)
 
+                self.logger.save()
+                self.dia_i += 1
+                #~ se guarda el estado cada `resguardo` días y al final del
+                #~ periodo, para poder avanzar la simulación con nuevos días
+                if self.resguardo > 0 and (self.dia_i % self.resguardo == 0 or
+                                           self.dia_i == len(dias)):
+                    if franjas is not None:
+                        franjas.reunir()
+                    self.guardar_resguardo()
+                self.notificar()
+            if franjas is not None:
+                franjas.reunir(fin=True)
+        except:
+            # se espera a que se escriba el log también si la simulación
+            # fue interrumpida, un error de escritura no reemplaza al error
+            # de la simulación
+            error = sys.exc_info()
+            try:
+                self.logger.close()
+            except Exception:
+                traceback.print_exc()
+            raise error[0], error[1], error[2]
+        finally:
+            if franjas is not None:
+                franjas.cerrar()
+        # se espera a que se escriba todo el log
+        self.logger.close()
         print 'Poblacion final'
         print str(self.poblacion)
+        print 'Ranking de zonas : ' + str(self.poblacion.zonas_table.get_estadisticas())
+        print 'Escritura del log : ' + str(self.logger.get_metricas())
         #return self.poblacion.to_grid()
 
+    def notificar(self):
+        """
+        Informa el progreso de la simulación a la función `progreso`.
+        """
+        if self.progreso is not None:
+            self.progreso(self)
+
+    def get_dias_nuevos(self, dias):
+        """
+        Retorna los días posteriores al último día simulado. Los días se
+        comparan por su fecha (Dia.dt), los días sin fecha se consideran
+        nuevos.
+
+        @type dias : List
+        @param dias: Los días disponibles, por ejemplo los del periodo
+            climático actualizado.
+        """
+        simulados = self.periodo.dias[:self.dia_i]
+        ultimo = getattr(simulados[-1], "dt", None) if simulados else None
+        if ultimo is None:
+            return list(dias)
+        return [d for d in dias if getattr(d, "dt", None) is None or
+                d.dt > ultimo]
+
+    def avanzar(self, dias):
+        """
+        Continúa la simulación con los días `dias` a partir del último día
+        simulado, los días del periodo que no fueron simulados se
+        reemplazan. Si los resguardos están activos, al final se guarda el
+        estado para el próximo avance.
+
+        @type dias : List
+        @param dias: Los días a simular.
+        """
+        del self.periodo.dias[self.dia_i:]
+        self.periodo.dias.extend(dias)
+        #~ start cierra el log al terminar
+        if self.logger.cerrado:
+            self.logger = self.crear_logger()
+        self.start()
+
+    def guardar_resguardo(self, directorio=None):
+        """
+        Guarda el estado del simulador al final del último día simulado. Se
+        espera a que se escriba el log de los días simulados, por lo que al
+        reanudar únicamente se descartan los registros posteriores.
+
+        @rtype String
+        @return La ruta del resguardo.
+        """
+        self.logger.flush()
+        return resguardos.guardar(self, directorio)
+
+    def procesar_dia(self, dia, dia_i):
+        """
+        Se encarga de procesar cada individuo de la población para el día
+        especificado.
+        """
+        HUEVOS = True
+        #~ los candidatos a eliminar de todos los grupos se sortean juntos
+        self.poblacion.sortear_candidatos(dia, dia_i)
+        #~ se procesa cada individuo de la población
+        j = 0
+        total_huevos = 0
+        nueva_poblacion = []
+
+        for individuo in self.poblacion.individuos:
+            poner_huevos = False
+            cambio_estado = False
+            cantidad_huevos = 0
+            individuo.desarrollar(dia)
+
+            #~ Se verifica el estado del individuo
+            if self.poblacion.regular(individuo, dia, dia_i):
+                """
+                si el individuo esta muerto se lo remueve de la poblacion
+                """
+                self.poblacion.kill(individuo)
+
+            elif individuo.esta_maduro() == True:
+                """
+                si el individuo esta maduro, se realiza el cambio de
+                estado.
+                """
+                # se logea el individuo antes de su cambio de estado
+                args = {}
+                args['aedes'] = individuo
+                args['dia'] = dia
+                args['periodo'] = dia_i
+                args['huevos'] = cantidad_huevos
+                self.logger.add(args)
+
+                self.poblacion.cambiar_estado(individuo)
+                cambio_estado = True
+
+            elif individuo.estado == Estado.ADULTO and HUEVOS:
+                if individuo.se_reproduce(dia) == True:
+                    # se genera un nueva poblacion
+                    sub_poblacion, cantidad_huevos = self.poblacion.ovipostura(
+                        individuo, dia)
+                    """
+                    se extiende la poblacion unicamente si se puso
+                    huevos.
+                    """
+                    if len(sub_poblacion) > 0:
+                        cantidad_huevos = len(sub_poblacion)
+                        nueva_poblacion.extend(sub_poblacion)
+
+            if cambio_estado == False:
+                args = {}
+                args['aedes'] = individuo
+                args['dia'] = dia
+                args['periodo'] = dia_i
+                args['huevos'] = cantidad_huevos
+                self.logger.add(args)
+                if cantidad_huevos > 0:
+                    individuo.reset()
+
+            j += 1
+
+        if len(nueva_poblacion) > 0:
+            total_huevos += len(nueva_poblacion)
+            self.poblacion.extend(nueva_poblacion)
+        # se eliminan los individuos muertos durante el día
+        self.poblacion.compactar()
+
 
 if __name__ == "__main__":
-    from db_manager import *
-    from models import *
-    from tutiempo import *
+    from fuentes_datos import get_fuente
 
     id_muestras = 4
+    fuente = get_fuente()
 
     #for temperatura in [15, 18, 20, 22, 24, 25, 26, 27, 30, 34]:
     for temperatura in [30]:
         print "=" * 10 + str(temperatura) + "=" * 10
         # se obtiene el historial climatico
         print "obteniendo los datos climaticos"
-        clima = TuTiempo("Asuncion")
-        periodo = clima.get_periodo(temperatura)
+        periodo = fuente.get_periodo(temperatura)
 
         print "obteniendo los datos de la bd"
-        dao = PuntosControlModel()
-        data = dao.get_by(id_muestras)
+        data = fuente.get_puntos(id_muestras)
         print "construyendo la grilla"
         #~ print data
         codigo = "m-" +str(id_muestras) + '-temp-' + str(temperatura)
         evol = Simulador(id_muestra=id_muestras,
-                         periodo=periodo, poblacion=data, codigo=codigo)
+                         periodo=periodo, poblacion=data, codigo=codigo,
+                         motor=MOTOR_SIMULACION)
 
         print "iniciando simulación"
         evol.start()
@@ -0,0 +1,499 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Este módulo contiene la cola de trabajos de simulación. Los servicios rest
+encolan el trabajo y responden inmediatamente con su id, los trabajos se
+ejecutan en un pool de procesos independiente del servidor web, por lo que
+una simulación larga no bloquea a los demás servicios.
+
+La cola se guarda en un archivo sqlite o en la tabla trabajos de postgres
+(ver db/trabajos.sql). Durante la simulación el trabajo registra el día
+actual y el tamaño de la población, y se interrumpe al final del día en el
+que se solicita su cancelación.
+
+Uso :
+    python trabajos.py [procesos]
+
+@autors Maximiliano Báez
+@contact mxbg.py@gmail.com
+"""
+import os
+import re
+import sys
+import json
+import time
+import signal
+import sqlite3
+import datetime
+import traceback
+import multiprocessing
+from contextlib import closing
+from config import *
+from db_manager import DBManager
+
+#~ Estados de los trabajos
+PENDIENTE = "pendiente"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+ERROR = "error"
+CANCELADO = "cancelado"
+#~ Tipos de trabajos, ver ejecutar
+TIPOS = ["proceso", "avanzar"]
+
+SQL_SQLITE = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id integer PRIMARY KEY AUTOINCREMENT,
+    tipo text,
+    id_muestra integer,
+    codigo text,
+    parametros text,
+    estado text,
+    dia integer,
+    dias integer,
+    poblacion integer,
+    resultado text,
+    error text,
+    pid integer,
+    cancelar integer DEFAULT 0,
+    creado text,
+    iniciado text,
+    actualizado text,
+    terminado text
+);
+CREATE INDEX IF NOT EXISTS trabajos_estado_idx ON trabajos (estado, id);
+"""
+
+
+class TrabajoCancelado(Exception):
+
+    """
+    Se lanza durante la simulación de un trabajo cuya cancelación fue
+    solicitada.
+    """
+    pass
+
+
+def ahora():
+    """
+    Retorna la fecha y hora actual de los registros de la cola.
+    """
+    return datetime.datetime.now().isoformat(" ")
+
+
+class ColaTrabajos:
+
+    """
+    Las operaciones de la cola, las subclases ejecutan las consultas en su
+    base de datos. Las consultas utilizan los parametros de psycopg2,
+    %(nombre)s.
+    """
+
+    def query(self, query_string, args={}):
+        """
+        Ejecuta la consulta.
+
+        @rtype List
+        @return Las filas de la consulta como diccionarios.
+        """
+        raise NotImplementedError()
+
+    def insertar(self, query_string, args={}):
+        """
+        Ejecuta la sentencia INSERT.
+
+        @rtype Integer
+        @return El id de la fila insertada.
+        """
+        raise NotImplementedError()
+
+    def tomar(self, pid):
+        """
+        Toma el trabajo pendiente más antiguo y lo marca como en ejecución
+        por el proceso `pid`. Dos procesos nunca toman el mismo trabajo.
+
+        @rtype Dictionaries
+        @return El trabajo, None si no hay trabajos pendientes.
+        """
+        raise NotImplementedError()
+
+    def to_trabajo(self, fila):
+        """
+        Decodifica los campos json de la fila.
+        """
+        trabajo = dict(fila)
+        for campo in ["parametros", "resultado"]:
+            if trabajo.get(campo) is not None:
+                trabajo[campo] = json.loads(trabajo[campo])
+        for campo in ["creado", "iniciado", "actualizado", "terminado"]:
+            if trabajo.get(campo) is not None:
+                trabajo[campo] = str(trabajo[campo])
+        trabajo["cancelar"] = bool(trabajo.get("cancelar"))
+        return trabajo
+
+    def encolar(self, tipo, id_muestra, codigo, parametros={}):
+        """
+        Añade un trabajo pendiente a la cola.
+
+        @type tipo : String
+        @param tipo: El tipo de trabajo, ver TIPOS.
+
+        @type parametros : Dictionaries
+        @param parametros: Los parametros adicionales del trabajo.
+
+        @rtype Dictionaries
+        @return El trabajo encolado.
+        """
+        if tipo not in TIPOS:
+            raise ValueError("tipo de trabajo desconocido : " + str(tipo))
+        args = {
+            "tipo": tipo,
+            "id_muestra": id_muestra,
+            "codigo": codigo,
+            "parametros": json.dumps(parametros),
+            "estado": PENDIENTE,
+            "creado": ahora()
+        }
+        id_trabajo = self.insertar("""
+            INSERT INTO trabajos (tipo, id_muestra, codigo, parametros,
+                estado, creado, actualizado)
+            VALUES (%(tipo)s, %(id_muestra)s, %(codigo)s, %(parametros)s,
+                %(estado)s, %(creado)s, %(creado)s)""", args)
+        return self.get(id_trabajo)
+
+    def get(self, id_trabajo):
+        """
+        @rtype Dictionaries
+        @return El trabajo, None si no existe.
+        """
+        filas = self.query("SELECT * FROM trabajos WHERE id = %(id)s",
+                           {"id": id_trabajo})
+        if len(filas) == 0:
+            return None
+        return self.to_trabajo(filas[0])
+
+    def actualizar(self, id_trabajo, **campos):
+        """
+        Actualiza los campos del trabajo.
+
+            cola.actualizar(1, estado=TERMINADO, resultado={...})
+        """
+        if "resultado" in campos:
+            campos["resultado"] = json.dumps(campos["resultado"])
+        campos["actualizado"] = ahora()
+        asignaciones = ", ".join(c + " = %(" + c + ")s"
+                                 for c in sorted(campos))
+        campos["id"] = id_trabajo
+        self.query("UPDATE trabajos SET " + asignaciones +
+                   " WHERE id = %(id)s", campos)
+
+    def progreso(self, id_trabajo, dia, dias, poblacion):
+        """
+        Registra el progreso de un trabajo en ejecución.
+
+        @rtype Boolean
+        @return True si se solicitó la cancelación del trabajo.
+        """
+        self.actualizar(id_trabajo, dia=dia, dias=dias, poblacion=poblacion)
+        trabajo = self.get(id_trabajo)
+        return trabajo is None or trabajo["cancelar"]
+
+    def cancelar(self, id_trabajo):
+        """
+        Solicita la cancelación del trabajo. Un trabajo pendiente se cancela
+        inmediatamente, uno en ejecución al final del día en curso.
+
+        @rtype Dictionaries
+        @return El trabajo, None si no existe.
+        """
+        self.query("""
+            UPDATE trabajos SET cancelar = 1,
+                estado = CASE WHEN estado = %(pendiente)s
+                    THEN %(cancelado)s ELSE estado END,
+                terminado = CASE WHEN estado = %(pendiente)s
+                    THEN %(ahora)s ELSE terminado END,
+                actualizado = %(ahora)s
+            WHERE id = %(id)s""", {
+            "id": id_trabajo,
+            "pendiente": PENDIENTE,
+            "cancelado": CANCELADO,
+            "ahora": ahora()
+        })
+        return self.get(id_trabajo)
+
+    def liberar(self, pid):
+        """
+        Libera los trabajos en ejecución del proceso `pid`, que terminó
+        durante el trabajo. Los trabajos cancelados se marcan como tales,
+        los demás se reencolan como avances una única vez, si el proceso que
+        los reanuda también termina se marcan como error.
+
+        @rtype Integer
+        @return La cantidad de trabajos liberados.
+        """
+        filas = self.query("""
+            SELECT id, cancelar, error FROM trabajos
+            WHERE estado = %(e)s AND pid = %(pid)s""",
+                           {"e": EJECUTANDO, "pid": pid})
+        error = u"el proceso %d terminó durante el trabajo" % pid
+        for fila in filas:
+            if fila["cancelar"]:
+                self.actualizar(fila["id"], estado=CANCELADO,
+                                terminado=ahora())
+            elif fila["error"] is not None:
+                self.actualizar(fila["id"], estado=ERROR, terminado=ahora(),
+                                error=error)
+            else:
+                self.actualizar(fila["id"], estado=PENDIENTE, tipo="avanzar",
+                                pid=None, error=error)
+        return len(filas)
+
+    def reencolar(self):
+        """
+        Devuelve a la cola los trabajos que quedaron en ejecución al
+        detenerse el pool. Los trabajos se reencolan como avances, que
+        continúan la simulación desde su último resguardo.
+
+        @rtype Integer
+        @return La cantidad de trabajos reencolados.
+        """
+        filas = self.query("SELECT id FROM trabajos WHERE estado = %(e)s",
+                           {"e": EJECUTANDO})
+        for fila in filas:
+            self.actualizar(fila["id"], estado=PENDIENTE, tipo="avanzar",
+                            pid=None)
+        return len(filas)
+
+
+class ColaSqlite(ColaTrabajos):
+
+    """
+    Cola guardada en un archivo sqlite local, compartido por el servidor
+    web y el pool. Cada operación abre su propia conexión, por lo que la
+    cola puede utilizarse desde varios procesos.
+    """
+
+    def __init__(self, path=TRABAJOS["sqlite"]):
+        self.path = path
+        self.__creada = False
+
+    def conectar(self):
+        """
+        Abre una conexión en modo autocommit, la tabla se crea en la
+        primera conexión.
+        """
+        directorio = os.path.dirname(self.path)
+        if directorio and not os.path.isdir(directorio):
+            os.makedirs(directorio)
+        conexion = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None)
+        conexion.row_factory = sqlite3.Row
+        if not self.__creada:
+            conexion.executescript(SQL_SQLITE)
+            self.__creada = True
+        return conexion
+
+    def ejecutar(self, conexion, query_string, args={}):
+        #~ los parametros de psycopg2 se traducen a los de sqlite
+        query_string = re.sub(r"%\((\w+)\)s", r":\1", query_string)
+        cursor = conexion.execute(query_string, args)
+        return [dict(fila) for fila in cursor.fetchall()]
+
+    def query(self, query_string, args={}):
+        with closing(self.conectar()) as conexion:
+            return self.ejecutar(conexion, query_string, args)
+
+    def insertar(self, query_string, args={}):
+        with closing(self.conectar()) as conexion:
+            query_string = re.sub(r"%\((\w+)\)s", r":\1", query_string)
+            return conexion.execute(query_string, args).lastrowid
+
+    def tomar(self, pid):
+        with closing(self.conectar()) as conexion:
+            #~ el bloqueo de escritura impide que otro proceso tome el
+            #~ mismo trabajo
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                filas = self.ejecutar(conexion, """
+                    SELECT id FROM trabajos WHERE estado = %(pendiente)s
+                    ORDER BY id LIMIT 1""", {"pendiente": PENDIENTE})
+                if len(filas) > 0:
+                    self.ejecutar(conexion, """
+                        UPDATE trabajos SET estado = %(estado)s,
+                            pid = %(pid)s, iniciado = %(ahora)s,
+                            actualizado = %(ahora)s
+                        WHERE id = %(id)s""", {
+                        "id": filas[0]["id"],
+                        "estado": EJECUTANDO,
+                        "pid": pid,
+                        "ahora": ahora()
+                    })
+                conexion.execute("COMMIT")
+            except:
+                conexion.execute("ROLLBACK")
+                raise
+        if len(filas) == 0:
+            return None
+        return self.get(filas[0]["id"])
+
+
+class ColaPostgres(ColaTrabajos):
+
+    """
+    Cola guardada en la tabla trabajos de la base de datos.
+    """
+
+    def __init__(self):
+        self.db = DBManager()
+
+    def query(self, query_string, args={}):
+        cursor = self.db.query(query_string, args)
+        if cursor.description is None:
+            cursor.close()
+            return []
+        return self.db.to_dict(cursor)
+
+    def insertar(self, query_string, args={}):
+        return self.query(query_string + " RETURNING id", args)[0]["id"]
+
+    def tomar(self, pid):
+        filas = self.query("""
+            UPDATE trabajos SET estado = %(estado)s, pid = %(pid)s,
+                iniciado = %(ahora)s, actualizado = %(ahora)s
+            WHERE id = (
+                SELECT id FROM trabajos WHERE estado = %(pendiente)s
+                ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED)
+            RETURNING *""", {
+            "estado": EJECUTANDO,
+            "pendiente": PENDIENTE,
+            "pid": pid,
+            "ahora": ahora()
+        })
+        if len(filas) == 0:
+            return None
+        return self.to_trabajo(filas[0])
+
+
+def get_cola(tipo=None):
+    """
+    Retorna la cola de trabajos configurada en TRABAJOS["cola"].
+
+    @rtype ColaTrabajos
+    """
+    tipo = tipo or TRABAJOS["cola"]
+    if tipo == "sqlite":
+        return ColaSqlite()
+    if tipo == "postgres":
+        return ColaPostgres()
+    raise ValueError("cola de trabajos desconocida : " + str(tipo))
+
+
+def ejecutar(cola, controller, trabajo):
+    """
+    Ejecuta la simulación del trabajo y registra su resultado. El progreso
+    se registra al final de cada día simulado.
+
+    @type controller : MainController
+    @param controller: El controlador que ejecuta la simulación.
+    """
+    id_trabajo = trabajo["id"]
+
+    def progreso(simulador):
+        if cola.progreso(id_trabajo, simulador.dia_i,
+                         len(simulador.periodo.dias),
+                         len(simulador.poblacion)):
+            raise TrabajoCancelado()
+
+    try:
+        if trabajo["tipo"] == "avanzar":
+            resp = controller.avanzar_proceso_evolutivo(
+                trabajo["id_muestra"], trabajo["codigo"],
+                trabajo["parametros"].get("dias"), progreso=progreso)
+        else:
+            resp = controller.new_proceso_evolutivo(
+                trabajo["id_muestra"], trabajo["codigo"], progreso=progreso)
+        cola.actualizar(id_trabajo, estado=TERMINADO, resultado=resp,
+                        terminado=ahora(), error=None)
+    except TrabajoCancelado:
+        cola.actualizar(id_trabajo, estado=CANCELADO, terminado=ahora())
+    except Exception:
+        traceback.print_exc()
+        cola.actualizar(id_trabajo, estado=ERROR, terminado=ahora(),
+                        error=traceback.format_exc())
+
+
+def trabajar(espera=TRABAJOS["espera"]):
+    """
+    Ciclo de un proceso del pool, toma y ejecuta los trabajos pendientes.
+    La cola se consulta cada `espera` segundos mientras no hay trabajos.
+    """
+    from controller import MainController
+
+    cola = get_cola()
+    controller = MainController()
+    while True:
+        trabajo = cola.tomar(os.getpid())
+        if trabajo is None:
+            time.sleep(espera)
+            continue
+        print "trabajo " + str(trabajo["id"]) + " : " + trabajo["tipo"] + \
+            " " + str(trabajo["codigo"])
+        ejecutar(cola, controller, trabajo)
+
+
+def detener(signum, frame):
+    """
+    Convierte la señal de terminación en SystemExit, por lo que el pool
+    termina sus procesos antes de salir.
+    """
+    sys.exit(0)
+
+
+def crear_proceso(espera):
+    """
+    Crea e inicia un proceso del pool.
+    """
+    proceso = multiprocessing.Process(target=trabajar, args=(espera,))
+    proceso.daemon = True
+    proceso.start()
+    return proceso
+
+
+def iniciar(procesos=None, espera=None):
+    """
+    Inicia el pool de procesos y espera hasta que se lo interrumpa (Ctrl+C o
+    SIGTERM). Los trabajos que quedaron en ejecución en una ejecución
+    anterior del pool se vuelven a encolar. Cada `espera` segundos se
+    reemplazan los procesos que terminaron y se liberan sus trabajos.
+
+    @type procesos : Integer
+    @param procesos: La cantidad de procesos, por defecto
+        TRABAJOS["procesos"].
+    """
+    procesos = procesos or TRABAJOS["procesos"]
+    espera = espera or TRABAJOS["espera"]
+    cola = get_cola()
+    print "trabajos reencolados : " + str(cola.reencolar())
+    pool = []
+    signal.signal(signal.SIGTERM, detener)
+    try:
+        for i in range(procesos):
+            pool.append(crear_proceso(espera))
+        while True:
+            time.sleep(espera)
+            for i, proceso in enumerate(pool):
+                if proceso.is_alive():
+                    continue
+                proceso.join()
+                print "proceso " + str(proceso.pid) + " terminado (" + \
+                    str(proceso.exitcode) + "), trabajos liberados : " + \
+                    str(cola.liberar(proceso.pid))
+                pool[i] = crear_proceso(espera)
+    finally:
+        for proceso in pool:
+            if proceso.is_alive():
+                proceso.terminate()
+                proceso.join()
+
+
+if __name__ == "__main__":
+    iniciar(int(sys.argv[1]) if len(sys.argv) > 1 else None)